@@ -0,0 +1,78 @@
+import asyncio
+from collections import defaultdict
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.bookings.dao import BookingDAO
+from app.config import settings
+from app.dao.database import async_session_maker
+
+
+class AdmissionCoordinator:
+    """
+    Очередь записи на тренировки внутри процесса.
+
+    Заявки на одну тренировку копятся window_ms миллисекунд (или до max_batch штук),
+    затем решаются одной транзакцией через BookingDAO.admit_batch. Каждый ожидающий
+    запрос получает свой результат (id записи | None, статус).
+    """
+
+    def __init__(self, window_ms: int, max_batch: int = 200,
+                 session_maker: async_sessionmaker = async_session_maker):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.session_maker = session_maker
+        self._pending: dict[int, list[tuple[int, asyncio.Future]]] = defaultdict(list)
+        self._timers: dict[int, asyncio.Task] = {}
+        self._flushes: set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def admit(self, user_id: int, training_id: int) -> tuple[int | None, str]:
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending[training_id]
+        batch.append((user_id, future))
+        if len(batch) >= self.max_batch:
+            self._start_flush(training_id)
+        elif training_id not in self._timers:
+            self._timers[training_id] = asyncio.create_task(self._flush_later(training_id))
+        # shield: отмена запроса не должна отменять общую пачку
+        return await asyncio.shield(future)
+
+    async def _flush_later(self, training_id: int):
+        await asyncio.sleep(self.window)
+        self._start_flush(training_id)
+
+    def _start_flush(self, training_id: int):
+        timer = self._timers.pop(training_id, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        batch = self._pending.pop(training_id, [])
+        if batch:
+            task = asyncio.create_task(self._flush(training_id, batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, training_id: int, batch: list[tuple[int, asyncio.Future]]):
+        try:
+            async with self.session_maker() as session:
+                results = await BookingDAO(session).admit_batch(training_id, [user_id for user_id, _ in batch])
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Ошибка обработки пачки записей на тренировку {training_id}: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+admission_coordinator = AdmissionCoordinator(
+    window_ms=settings.BOOKING_BATCH_WINDOW_MS,
+    max_batch=settings.BOOKING_BATCH_MAX_SIZE,
+)
@@ -1,12 +1,28 @@
 from app.dao.base import BaseDAO
-from app.bookings.models import Booking
-from app.trainings.models import Training
+from app.bookings.models import Booking, BookingArchive
+from app.trainings.models import Training, TrainingArchive
+from app.rooms.models import Room
+from app.rooms.schemas import SRoomInfo
+from app.trainings.schemas import STrainingShort
+from app.bookings.schemas import SBookingInfo
+from app.dao.json_render import json_document
+from app.dao.projection import load_fields
 
-from sqlalchemy import select
+from pydantic import BaseModel
+from sqlalchemy import select, literal
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import selectinload
 from loguru import logger
 
 
+class AdmissionStatus:
+    BOOKED = "booked"
+    FULL = "full"
+    DUPLICATE = "duplicate"
+    NOT_FOUND = "not_found"
+
+
 class BookingDAO(BaseDAO):
     model = Booking
 
@@ -26,4 +42,183 @@ class BookingDAO(BaseDAO):
             return bookings
         except Exception as e:
             logger.error(f"Ошибка при поиске бронирований для user_id={user_id}: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def find_by_user_page(self, user_id: int, limit: int | None = None, after: str | None = None,
+                                schema: type[BaseModel] = SBookingInfo):
+        return await self.find_page(
+            limit=limit,
+            after=after,
+            conditions=[self.model.user_id == user_id],
+            options=load_fields(self.model, schema)
+        )
+
+    async def find_by_user_page_json(self, user_id: int, limit: int | None = None, after: str | None = None,
+                                     schema: type[BaseModel] = SBookingInfo):
+        """Та же страница, что find_by_user_page, но в виде готового JSON по схеме schema."""
+        joins = []
+        if "training" in schema.model_fields:
+            joins += [(Training, Training.id == Booking.training_id), (Room, Room.id == Training.room_id)]
+        return await self.find_page_json(
+            document=json_document(
+                schema, Booking,
+                training=json_document(STrainingShort, Training, room=json_document(SRoomInfo, Room)),
+            ),
+            joins=joins,
+            limit=limit,
+            after=after,
+            conditions=[self.model.user_id == user_id],
+        )
+
+    async def find_user_history(self, user_id: int) -> list:
+        """
+        Вся история записей пользователя: текущие записи и перенесенные в bookings_archive.
+        Архивные объекты отдают те же поля, что и рабочие, поэтому подходят к SBookingInfo.
+
+        Returns:
+            list: Записи Booking и BookingArchive с тренировкой и помещением, новые тренировки первыми
+        """
+        logger.info(f"Поиск истории записей пользователя ID={user_id} вместе с архивом")
+        try:
+            records = []
+            for model, training_model in ((self.model, Training), (BookingArchive, TrainingArchive)):
+                query = (
+                    select(model)
+                    .options(selectinload(model.training).selectinload(training_model.room))
+                    .where(model.user_id == user_id)
+                )
+                records.extend((await self._session.execute(query)).scalars().all())
+            records.sort(key=lambda booking: (booking.training.date, booking.training.start_time), reverse=True)
+            logger.info(f"Найдено {len(records)} записей.")
+            return records
+        except Exception as e:
+            logger.error(f"Ошибка при поиске истории записей для user_id={user_id}: {e}")
+            raise
+
+    async def find_one_with_training(self, booking_id: int):
+        query = (
+            select(self.model)
+            .options(selectinload(self.model.training).selectinload(Training.room))
+            .where(self.model.id == booking_id)
+        )
+        return await self._session.scalar(query)
+
+    async def admit(self, user_id: int, training_id: int) -> tuple[int | None, str]:
+        """
+        Записывает клиента на тренировку одним условным INSERT ... SELECT:
+        строка тренировки блокируется (FOR UPDATE), запись вставляется только при
+        booking_count < capacity, повтор отсекается ON CONFLICT по uq_user_training.
+        Счетчик мест увеличивает триггер в той же транзакции, поэтому перебронирования нет.
+
+        Returns:
+            tuple: (id записи | None, статус из AdmissionStatus)
+        """
+        logger.info(f"Запись пользователя {user_id} на тренировку {training_id}")
+        try:
+            seat = (
+                select(literal(user_id), Training.id)
+                .join(Room, Room.id == Training.room_id)
+                .where(
+                    Training.id == training_id,
+                    Training.booking_count < Room.capacity
+                )
+                .with_for_update(of=Training)
+            )
+            insert_fn = postgresql_insert if self._dialect == "postgresql" else sqlite_insert
+            stmt = (
+                insert_fn(self.model)
+                .from_select(["user_id", "training_id"], seat)
+                .on_conflict_do_nothing(index_elements=["user_id", "training_id"])
+                .returning(self.model.id)
+            )
+            booking_id = await self._session.scalar(stmt)
+            if booking_id is not None:
+                await self._invalidate()
+                logger.info(f"Запись {booking_id} создана.")
+                return booking_id, AdmissionStatus.BOOKED
+
+            # Неуспешный путь: выясняем причину отказа отдельным запросом
+            query = select(
+                select(Training.id).where(Training.id == training_id).exists(),
+                select(self.model.id).where(
+                    self.model.user_id == user_id, self.model.training_id == training_id
+                ).exists()
+            )
+            training_exists, already_booked = (await self._session.execute(query)).one()
+            if not training_exists:
+                status = AdmissionStatus.NOT_FOUND
+            elif already_booked:
+                status = AdmissionStatus.DUPLICATE
+            else:
+                status = AdmissionStatus.FULL
+            logger.info(f"Запись не создана: {status}")
+            return None, status
+        except Exception as e:
+            logger.error(f"Ошибка при записи пользователя {user_id} на тренировку {training_id}: {e}")
+            raise
+
+    async def admit_batch(self, training_id: int, user_ids: list[int]) -> list[tuple[int | None, str]]:
+        """
+        Решает пачку заявок на одну тренировку за одну блокировку ее строки.
+        Места раздаются в порядке заявок, записи вставляются одним INSERT.
+
+        Returns:
+            list: (id записи | None, статус из AdmissionStatus) для каждой заявки по порядку
+        """
+        logger.info(f"Пачка из {len(user_ids)} заявок на тренировку {training_id}")
+        try:
+            query = (
+                select(Training.booking_count, Room.capacity)
+                .join(Room, Room.id == Training.room_id)
+                .where(Training.id == training_id)
+                .with_for_update(of=Training)
+            )
+            seats = (await self._session.execute(query)).one_or_none()
+            if seats is None:
+                return [(None, AdmissionStatus.NOT_FOUND) for _ in user_ids]
+
+            booked = set(await self._session.scalars(
+                select(self.model.user_id).where(
+                    self.model.training_id == training_id, self.model.user_id.in_(user_ids)
+                )
+            ))
+            free = max(seats.capacity - seats.booking_count, 0)
+            statuses = []
+            admitted = []
+            for user_id in user_ids:
+                if user_id in booked:
+                    statuses.append(AdmissionStatus.DUPLICATE)
+                elif len(admitted) < free:
+                    admitted.append(user_id)
+                    booked.add(user_id)
+                    statuses.append(AdmissionStatus.BOOKED)
+                else:
+                    statuses.append(AdmissionStatus.FULL)
+
+            inserted = {}
+
+            if admitted:
+                insert_fn = postgresql_insert if self._dialect == "postgresql" else sqlite_insert
+                stmt = (
+                    insert_fn(self.model)
+                    .values([{"user_id": user_id, "training_id": training_id} for user_id in admitted])
+                    .on_conflict_do_nothing(index_elements=["user_id", "training_id"])
+                    .returning(self.model.id, self.model.user_id)
+                )
+                inserted = {row.user_id: row.id for row in await self._session.execute(stmt)}
+                await self._invalidate()
+
+            results = []
+            for user_id, status in zip(user_ids, statuses):
+                if status != AdmissionStatus.BOOKED:
+                    results.append((None, status))
+                elif user_id in inserted:
+                    results.append((inserted[user_id], status))
+                else:
+                    # Запись мимо очереди могла появиться после проверки - это повтор
+                    results.append((None, AdmissionStatus.DUPLICATE))
+            logger.info(f"Записано {len(inserted)} из {len(user_ids)} заявок.")
+            return results
+        except Exception as e:
+            logger.error(f"Ошибка при пакетной записи на тренировку {training_id}: {e}")
+            raise
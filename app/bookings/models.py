@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey, UniqueConstraint
+from sqlalchemy import DDL, ForeignKey, UniqueConstraint, Index, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.dao.database import Base
 
@@ -10,7 +10,10 @@ class Booking(Base):
     training_id: Mapped[int] = mapped_column(ForeignKey("trainings.id", ondelete="CASCADE"))
 
     __table_args__ = (
+        # Покрывает и поиск записей пользователя: user_id - первая колонка
         UniqueConstraint("user_id", "training_id", name="uq_user_training"),
+        # Подсчет занятых мест на тренировке
+        Index("ix_bookings_training_id", "training_id"),
     )
 
     user: Mapped["User"] = relationship(back_populates="bookings") # type: ignore
@@ -18,4 +21,56 @@ class Booking(Base):
 
     def __repr__(self):
         return (f"{self.__class__.__name__}(id={self.id}, training_id={self.training_id}, "
-                f"user_id={self.user_id})")
\ No newline at end of file
+                f"user_id={self.user_id})")
+
+
+# Счетчик trainings.booking_count поддерживается в той же транзакции, что и запись в bookings.
+# Те же объекты создает миграция 7b2a9c4e3f10; здесь они нужны для create_all (тесты, бенчмарки)
+event.listen(Booking.__table__, "after_create", DDL("""
+CREATE FUNCTION bookings_seat_counter() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE trainings SET booking_count = booking_count + 1, revision = revision + 1, updated_at = now() WHERE id = NEW.training_id;
+        RETURN NEW;
+    END IF;
+    UPDATE trainings SET booking_count = booking_count - 1, revision = revision + 1, updated_at = now() WHERE id = OLD.training_id;
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+""").execute_if(dialect="postgresql"))
+event.listen(Booking.__table__, "after_create", DDL("""
+CREATE TRIGGER trg_bookings_seat_counter AFTER INSERT OR DELETE ON bookings
+FOR EACH ROW EXECUTE FUNCTION bookings_seat_counter()
+""").execute_if(dialect="postgresql"))
+event.listen(Booking.__table__, "after_create", DDL("""
+CREATE TRIGGER trg_bookings_seat_take AFTER INSERT ON bookings
+BEGIN
+    UPDATE trainings SET booking_count = booking_count + 1, revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE id = NEW.training_id;
+END
+""").execute_if(dialect="sqlite"))
+event.listen(Booking.__table__, "after_create", DDL("""
+CREATE TRIGGER trg_bookings_seat_release AFTER DELETE ON bookings
+BEGIN
+    UPDATE trainings SET booking_count = booking_count - 1, revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE id = OLD.training_id;
+END
+""").execute_if(dialect="sqlite"))
+
+
+class BookingArchive(Base):
+    """Записи на тренировки, перенесенные в trainings_archive. Счетчик мест там уже не меняется, триггеров нет."""
+    __tablename__ = "bookings_archive"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    training_id: Mapped[int] = mapped_column(ForeignKey("trainings_archive.id", ondelete="CASCADE"))
+
+    __table_args__ = (
+        # История пользователя
+        Index("ix_bookings_archive_user_id", "user_id"),
+        Index("ix_bookings_archive_training_id", "training_id"),
+    )
+
+    training: Mapped["TrainingArchive"] = relationship() # type: ignore
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(id={self.id}, training_id={self.training_id}, "
+                f"user_id={self.user_id})")
@@ -1,15 +1,17 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from sqlalchemy import select, func
 
-from app.bookings.dao import BookingDAO
+from app.bookings.dao import BookingDAO, AdmissionStatus
+from app.bookings.admission import admission_coordinator
 from app.bookings.schemas import SBookingAdd, SBookingInfo, SBookingAddFull
-from app.users.models import User
+from app.users.schemas import SPrincipal
 from app.dependencies.auth_dep import get_current_user
-from app.dependencies.dao_dep import get_session_with_commit, get_session_without_commit
-from app.trainings.dao import TrainingDAO
-from app.bookings.models import Booking
+from app.dependencies.dao_dep import get_session
+from app.dependencies.pagination_dep import get_page_params
+from app.dependencies.fields_dep import get_fields_schema
+from app.dao.pagination import SPageParams, NEXT_CURSOR_HEADER
+from app.responses import json_response, raw_json_response
+from app.config import settings
 from app.exceptions import BookingExist, BookingOnlyClient, TrainingNotFound, BookingNotFound, TrainingFullException
 
 
@@ -17,59 +19,67 @@ router = APIRouter(prefix="/bookings", tags=["Bookings"])
 
 @router.post("/", summary="Записаться на тренировку", response_model=SBookingInfo)
 async def create_booking(booking_data: SBookingAdd,
-                         user_data: User = Depends(get_current_user),
-                         session: AsyncSession = Depends(get_session_with_commit)):
+                         user_data: SPrincipal = Depends(get_current_user),
+                         session: AsyncSession = Depends(get_session)):
     """
     Запись на тренировку.
     Доступ только для клиента.
     """
     booking_dao = BookingDAO(session)
-    training_dao = TrainingDAO(session)
-    
+
     # Проверка роли пользователя
     if user_data.role.name != "client":
         raise BookingOnlyClient
-    # Проверка существования тренировки
-    training = await training_dao.find_one_or_none_by_id(booking_data.training_id)
-    if not training:
+    # Проверка мест, повторной записи и сама запись - одним запросом,
+    # либо пачкой вместе с другими заявками на ту же тренировку
+    if admission_coordinator.enabled:
+        booking_id, admission = await admission_coordinator.admit(user_id=user_data.id,
+                                                                  training_id=booking_data.training_id)
+    else:
+        booking_id, admission = await booking_dao.admit(user_id=user_data.id, training_id=booking_data.training_id)
+    if admission == AdmissionStatus.NOT_FOUND:
         raise TrainingNotFound
-    # Проверка, что пользователь не записан на тренировку
-    existing = await booking_dao.find_by_user(user_data.id)
-    if any(b.training_id == booking_data.training_id for b in existing):
+    if admission == AdmissionStatus.DUPLICATE:
         raise BookingExist
-    # Проверка вместимости помещения
-    booking_count = await session.scalar(
-        select(func.count(Booking.id)).where(Booking.training_id == booking_data.training_id)
-    )
-    if booking_count >= training.room.capacity:
+    if admission == AdmissionStatus.FULL:
         raise TrainingFullException
-    # Создание записи на тренировку
-    booking = await booking_dao.add(SBookingAddFull(training_id=booking_data.training_id, 
-                                                   user_id=user_data.id))
-    # Делаем повторный SELECT c selectinload, чтобы подтянуть training
-    booking_with_training = await session.scalar(
-        select(Booking)
-        .options(selectinload(Booking.training))
-        .where(Booking.id == booking.id)
-    )
-    return booking_with_training
+    # Подтягиваем тренировку с помещением для ответа
+    return await booking_dao.find_one_with_training(booking_id)
 
 @router.get("/", summary="Мои записи", response_model=list[SBookingInfo])
-async def get_user_bookings(user_data: User = Depends(get_current_user),
-                            session: AsyncSession = Depends(get_session_without_commit)):
+async def get_user_bookings(response: Response,
+                            page: SPageParams = Depends(get_page_params),
+                            schema: type[SBookingInfo] = Depends(get_fields_schema(SBookingInfo)),
+                            user_data: SPrincipal = Depends(get_current_user),
+                            session: AsyncSession = Depends(get_session)) -> Response:
     bookind_dao = BookingDAO(session)
-    return await bookind_dao.find_by_user(user_data.id)
+    if settings.DB_JSON_RENDERING:
+        body, next_cursor = await bookind_dao.find_by_user_page_json(user_data.id, limit=page.limit, after=page.after,
+                                                                     schema=schema)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return raw_json_response(body, response)
+    bookings, next_cursor = await bookind_dao.find_by_user_page(user_data.id, limit=page.limit, after=page.after,
+                                                                schema=schema)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return json_response(bookings, list[schema], response)
+
+@router.get("/history/", summary="Вся история записей", response_model=list[SBookingInfo])
+async def get_user_bookings_history(response: Response,
+                                    user_data: SPrincipal = Depends(get_current_user),
+                                    session: AsyncSession = Depends(get_session)) -> Response:
+    """Все записи пользователя, включая записи на тренировки, перенесенные в архив."""
+    bookings = await BookingDAO(session).find_user_history(user_data.id)
+    return json_response(bookings, list[SBookingInfo], response)
 
 @router.delete("/", summary="Отменить запись", status_code=204)
 async def cancel_booking(booking_data: SBookingAdd,
-                         user_data: User = Depends(get_current_user),
-                         session: AsyncSession = Depends(get_session_with_commit)):
+                         user_data: SPrincipal = Depends(get_current_user),
+                         session: AsyncSession = Depends(get_session)):
     booking_dao = BookingDAO(session)
-    # Проверка существования записи на тренировку
+    # Удаление записи на тренировку одним DELETE ... RETURNING, без предварительного поиска
     filters = SBookingAddFull(user_id=user_data.id, training_id=booking_data.training_id)
-    booking = await booking_dao.find_one_or_none(filters)
-    if not booking:
+    if not await booking_dao.delete_returning(filters):
         raise BookingNotFound
-    # Удаление записи на тренировку
-    await booking_dao.delete(filters)
     return None
\ No newline at end of file
@@ -9,6 +9,35 @@ class Settings(BaseSettings):
     DB_PASSWORD: str
     SECRET_KEY: str
     ALGORITHM: str
+    # Окно сбора заявок на одну тренировку в очереди записи, мс. 0 - без очереди
+    BOOKING_BATCH_WINDOW_MS: int = 0
+    BOOKING_BATCH_MAX_SIZE: int = 200
+    # Фоновая деактивация истекших абонементов: период запуска, с (0 - выключена) и размер пачки
+    MEMBERSHIP_EXPIRY_INTERVAL_S: int = 3600
+    MEMBERSHIP_EXPIRY_BATCH_SIZE: int = 1000
+    # Перенос прошедших тренировок и записей в архивные таблицы: старше скольких дней,
+    # период запуска, с (0 - выключен) и тренировок за одну транзакцию
+    TRAINING_ARCHIVE_AFTER_DAYS: int = 90
+    TRAINING_ARCHIVE_INTERVAL_S: int = 86400
+    TRAINING_ARCHIVE_BATCH_SIZE: int = 1000
+    # Кэш результатов чтения DAO: none | memory
+    QUERY_CACHE_BACKEND: str = "none"
+    QUERY_CACHE_TTL_S: int = 30
+    QUERY_CACHE_MAX_ENTRIES: int = 1024
+    # Кэш пользователей для авторизации без запроса к БД (0 - выключен)
+    PRINCIPAL_CACHE_TTL_S: int = 300
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    # Кэш проверенных JWT (0 - подпись проверяется на каждый запрос)
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    # Пул для bcrypt: thread | process, число воркеров и предел очереди (сверх него - 503)
+    PASSWORD_HASH_POOL: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Массовый импорт пользователей: размер пачки и процессы для bcrypt (0 - по числу ядер)
+    USER_IMPORT_BATCH_SIZE: int = 500
+    USER_IMPORT_HASH_WORKERS: int = 0
+    # Списки тренировок и записей собирает в JSON сама БД, минуя ORM и pydantic
+    DB_JSON_RENDERING: bool = False
 
     @property
     def get_db_url(self):
@@ -1,27 +1,101 @@
-from typing import List, TypeVar, Generic, Type
+from typing import List, TypeVar, Generic, Type, Sequence, AsyncIterator
 from pydantic import BaseModel
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.future import select
-from sqlalchemy import update as sqlalchemy_update, delete as sqlalchemy_delete, func
+from sqlalchemy import (update as sqlalchemy_update, delete as sqlalchemy_delete, insert as sqlalchemy_insert,
+                        func, tuple_, case, literal)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.loading import merge_frozen_result
+from app.dao import cache as dao_cache
 from app.dao.database import Base
+from app.dao.pagination import encode_cursor, decode_cursor
 
 T = TypeVar("T", bound=Base)
 
 
 class BaseDAO(Generic[T]):
     model: Type[T] = None
+    # Теги (таблицы), от которых зависят результаты чтения. Пусто - чтения модели не кэшируются
+    cache_tags: tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        dao_cache.watch_query_tags(cls.cache_tags)
 
     def __init__(self, session: AsyncSession):
         self._session = session
         if self.model is None:
             raise ValueError("Модель должна быть указана в дочернем классе")
 
+    @property
+    def _dialect(self) -> str:
+        """Имя диалекта БД текущей сессии: postgresql в работе, sqlite в тестах."""
+        return self._session.bind.dialect.name
+
+    def _sync_identity_map(self, rows: list[dict]):
+        """Переносит значения из массовых Core-запросов в уже загруженные в сессию объекты."""
+        for row in rows:
+            instance = self._session.identity_map.get(identity_key(self.model, row["id"]))
+            if instance is None:
+                continue
+            for key, value in row.items():
+                set_committed_value(instance, key, value)
+
+    def _cache_key(self, query) -> str | None:
+        cache_key = query._generate_cache_key()
+        if cache_key is None:
+            return None
+        values = [param.effective_value for param in cache_key.bindparams]
+        return (f"{self.model.__tablename__}:{dao_cache.statement_digest(cache_key.key)}:"
+                f"{dao_cache.params_digest(values)}")
+
+    async def _execute(self, query):
+        """
+        Выполняет SELECT через кэш запросов, если модель кэшируется (cache_tags).
+        Результат хранится как FrozenResult и вливается в текущую сессию без обращения к БД.
+        Сессия, которая уже писала, читает мимо кэша: ее данные еще не закоммичены.
+        """
+        if not self.cache_tags or not dao_cache.query_cache.enabled or self._session.info.get("has_writes"):
+            return await self._session.execute(query)
+        key = self._cache_key(query)
+        if key is None:
+            return await self._session.execute(query)
+        frozen = dao_cache.query_cache.get(key)
+        if frozen is None:
+            frozen = (await self._session.execute(query)).freeze()
+            dao_cache.query_cache.set(key, frozen, self.cache_tags)
+            return frozen()
+        merged = await self._session.run_sync(
+            lambda session: merge_frozen_result(session, query, frozen, load=False)
+        )
+        return merged()
+
+    async def _invalidate(self, extra_tags: Sequence[str] = ()):
+        """
+        Вызывается до записи: отмечает, что сессия пишет в таблицу модели, и сбрасывает кэш по ее тегу,
+        пока закэшированные объекты этой сессии еще не изменены. Затем сброс повторяется
+        после коммита, а в других воркерах - через одно NOTIFY перед коммитом (см. app/dao/cache.py).
+        Теги, которые не читает ни один кэш, пропускаются - запись не делает лишних запросов.
+
+        Args:
+            extra_tags: Другие таблицы, которые меняет та же запись
+        """
+        self._session.info["has_writes"] = True
+        tags = dao_cache.watched_tags().intersection([self.model.__tablename__, *extra_tags])
+        if not tags:
+            return
+        self._session.info.setdefault("cache_tags", set()).update(tags)
+        dao_cache.invalidate(tags)
+
     async def find_one_or_none_by_id(self, data_id: int):
         try:
             query = select(self.model).filter_by(id=data_id)
-            result = await self._session.execute(query)
+            result = await self._execute(query)
             record = result.scalar_one_or_none()
             log_message = f"Запись {self.model.__name__} с ID {data_id} {'найдена' if record else 'не найдена'}."
             logger.info(log_message)
@@ -35,7 +109,7 @@ class BaseDAO(Generic[T]):
         logger.info(f"Поиск одной записи {self.model.__name__} по фильтрам: {filter_dict}")
         try:
             query = select(self.model).filter_by(**filter_dict)
-            result = await self._session.execute(query)
+            result = await self._execute(query)
             record = result.scalar_one_or_none()
             log_message = f"Запись {'найдена' if record else 'не найдена'} по фильтрам: {filter_dict}"
             logger.info(log_message)
@@ -49,7 +123,7 @@ class BaseDAO(Generic[T]):
         logger.info(f"Поиск всех записей {self.model.__name__} по фильтрам: {filter_dict}")
         try:
             query = select(self.model).filter_by(**filter_dict)
-            result = await self._session.execute(query)
+            result = await self._execute(query)
             records = result.scalars().all()
             logger.info(f"Найдено {len(records)} записей.")
             return records
@@ -57,10 +131,140 @@ class BaseDAO(Generic[T]):
             logger.error(f"Ошибка при поиске всех записей по фильтрам {filter_dict}: {e}")
             raise
 
+    async def stream_all(
+            self,
+            filters: BaseModel | None = None,
+            options: Sequence = (),
+            chunk_size: int = 500
+    ) -> AsyncIterator[T]:
+        """
+        Построчно отдает записи через серверный курсор, подгружая их пачками по chunk_size.
+        В памяти одновременно находится не больше одной пачки.
+        """
+        filter_dict = filters.model_dump(exclude_unset=True) if filters else {}
+        logger.info(f"Потоковое чтение записей {self.model.__name__} по фильтрам: {filter_dict}")
+        try:
+            query = (
+                select(self.model)
+                .filter_by(**filter_dict)
+                .options(*options)
+                .order_by(self.model.id)
+                .execution_options(yield_per=chunk_size)
+            )
+            result = await self._session.stream(query)
+            count = 0
+            async for record in result.scalars():
+                count += 1
+                yield record
+            logger.info(f"Передано {count} записей.")
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при потоковом чтении по фильтрам {filter_dict}: {e}")
+            raise
+
+    async def find_page(
+            self,
+            filters: BaseModel | None = None,
+            limit: int | None = None,
+            after: str | None = None,
+            order_by: Sequence[str] = ("id",),
+            conditions: Sequence = (),
+            options: Sequence = ()
+    ) -> tuple[list[T], str | None]:
+        """
+        Keyset-пагинация по колонкам order_by (последняя должна быть уникальной, обычно id).
+
+        Args:
+            filters: Фильтры равенства, как в find_all
+            limit: Размер страницы. None - вернуть все записи без курсора
+            after: Курсор из предыдущей страницы
+            order_by: Имена колонок ключа сортировки
+            conditions: Дополнительные условия WHERE
+            options: Опции загрузки связей (selectinload и т.п.)
+
+        Returns:
+            tuple: (записи страницы, курсор следующей страницы или None)
+        """
+        filter_dict = filters.model_dump(exclude_unset=True) if filters else {}
+        logger.info(f"Поиск страницы {self.model.__name__} по фильтрам: {filter_dict}, limit={limit}")
+        key_columns = [getattr(self.model, name) for name in order_by]
+        try:
+            query = (
+                select(self.model)
+                .filter_by(**filter_dict)
+                .where(*conditions)
+                .options(*options)
+            )
+            result = await self._execute(self._keyset_query(query, key_columns, limit, after))
+            records, next_cursor = self._cut_page(list(result.scalars().all()), limit, order_by)
+            logger.info(f"Найдено {len(records)} записей, есть следующая страница: {next_cursor is not None}.")
+            return records, next_cursor
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при постраничном поиске по фильтрам {filter_dict}: {e}")
+            raise
+
+    async def find_page_json(
+            self,
+            document,
+            joins: Sequence = (),
+            limit: int | None = None,
+            after: str | None = None,
+            order_by: Sequence[str] = ("id",),
+            conditions: Sequence = ()
+    ) -> tuple[bytes, str | None]:
+        """
+        Та же keyset-страница, что find_page, но ответ собирает БД: каждая строка - готовый
+        JSON-документ (см. app/dao/json_render.py), приложение только склеивает их в массив.
+        ORM-объекты и pydantic-модели не создаются.
+
+        Args:
+            document: Выражение json_document(...) в форме схемы ответа
+            joins: Пары (модель, условие соединения) для вложенных документов
+            limit, after, order_by, conditions: Как в find_page
+
+        Returns:
+            tuple: (JSON-массив страницы в байтах, курсор следующей страницы или None)
+        """
+        logger.info(f"Поиск страницы {self.model.__name__} в виде JSON, limit={limit}")
+        key_columns = [getattr(self.model, name) for name in order_by]
+        try:
+            query = select(document.label("document"), *key_columns).select_from(self.model)
+            for target, onclause in joins:
+                query = query.join(target, onclause)
+            query = query.where(*conditions)
+            result = await self._execute(self._keyset_query(query, key_columns, limit, after))
+            rows, next_cursor = self._cut_page(list(result.all()), limit, order_by)
+            logger.info(f"Найдено {len(rows)} записей, есть следующая страница: {next_cursor is not None}.")
+            return f"[{','.join(row.document for row in rows)}]".encode(), next_cursor
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при постраничном поиске {self.model.__name__} в виде JSON: {e}")
+            raise
+
+    @staticmethod
+    def _keyset_query(query, key_columns: list, limit: int | None, after: str | None):
+        query = query.order_by(*key_columns)
+        if after:
+            values = decode_cursor(after, key_columns)
+            if len(key_columns) == 1:
+                query = query.where(key_columns[0] > values[0])
+            else:
+                query = query.where(tuple_(*key_columns) > tuple_(*values))
+        if limit is not None:
+            # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+            query = query.limit(limit + 1)
+        return query
+
+    @staticmethod
+    def _cut_page(records: list, limit: int | None, order_by: Sequence[str]) -> tuple[list, str | None]:
+        if limit is not None and len(records) > limit:
+            records = records[:limit]
+            return records, encode_cursor(records[-1], order_by)
+        return records, None
+
     async def add(self, values: BaseModel):
         values_dict = values.model_dump(exclude_unset=True)
         logger.info(f"Добавление записи {self.model.__name__} с параметрами: {values_dict}")
         try:
+            await self._invalidate()
             new_instance = self.model(**values_dict)
             self._session.add(new_instance)
             logger.info(f"Запись {self.model.__name__} успешно добавлена.")
@@ -70,10 +274,28 @@ class BaseDAO(Generic[T]):
             logger.error(f"Ошибка при добавлении записи: {e}")
             raise
 
+    async def add_returning(self, values: BaseModel, options: Sequence = ()) -> T:
+        """
+        Добавляет запись одним INSERT ... RETURNING и возвращает ее со значениями по умолчанию из БД
+        и связями, загруженными по options, без повторного чтения по id.
+        """
+        values_dict = values.model_dump(exclude_unset=True)
+        logger.info(f"Добавление записи {self.model.__name__} с возвратом, параметры: {values_dict}")
+        try:
+            await self._invalidate()
+            query = sqlalchemy_insert(self.model).values(**values_dict).returning(self.model).options(*options)
+            new_instance = (await self._session.execute(query)).scalar_one()
+            logger.info(f"Запись {self.model.__name__} успешно добавлена.")
+            return new_instance
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при добавлении записи: {e}")
+            raise
+
     async def add_many(self, instances: List[BaseModel]):
         values_list = [item.model_dump(exclude_unset=True) for item in instances]
         logger.info(f"Добавление нескольких записей {self.model.__name__}. Количество: {len(values_list)}")
         try:
+            await self._invalidate()
             new_instances = [self.model(**values) for values in values_list]
             self._session.add_all(new_instances)
             logger.info(f"Успешно добавлено {len(new_instances)} записей.")
@@ -89,6 +311,7 @@ class BaseDAO(Generic[T]):
         logger.info(
             f"Обновление записей {self.model.__name__} по фильтру: {filter_dict} с параметрами: {values_dict}")
         try:
+            await self._invalidate()
             query = (
                 sqlalchemy_update(self.model)
                 .where(*[getattr(self.model, k) == v for k, v in filter_dict.items()])
@@ -103,6 +326,78 @@ class BaseDAO(Generic[T]):
             logger.error(f"Ошибка при обновлении записей: {e}")
             raise
 
+    async def update_returning(self, filters: BaseModel, values: BaseModel, conditions: Sequence = (),
+                               options: Sequence = ()) -> list[T]:
+        """
+        Обновляет записи одним UPDATE ... RETURNING и возвращает их уже измененными:
+        без предварительного поиска, SELECT для синхронизации сессии и повторного чтения.
+
+        Args:
+            filters: Фильтр по равенству полей
+            values: Новые значения полей
+            conditions: Дополнительные условия WHERE, например проверка владельца записи
+            options: Опции загрузки связей возвращаемых объектов
+
+        Returns:
+            list: Обновленные объекты; пустой список, если под условия ничего не попало
+        """
+        filter_dict = filters.model_dump(exclude_unset=True)
+        values_dict = values.model_dump(exclude_unset=True)
+        logger.info(
+            f"Обновление с возвратом записей {self.model.__name__} по фильтру: {filter_dict} "
+            f"с параметрами: {values_dict}")
+        try:
+            await self._invalidate()
+            query = (
+                sqlalchemy_update(self.model)
+                .where(*[getattr(self.model, k) == v for k, v in filter_dict.items()], *conditions)
+                .values(**values_dict)
+                .returning(self.model)
+                .options(*options)
+                # Объекты из RETURNING перезаписывают уже загруженные в сессию
+                .execution_options(synchronize_session=False, populate_existing=True)
+            )
+            records = list((await self._session.execute(query)).scalars().all())
+            logger.info(f"Обновлено {len(records)} записей.")
+            return records
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при обновлении записей: {e}")
+            raise
+
+    async def delete_returning(self, filters: BaseModel, conditions: Sequence = ()) -> list[T]:
+        """
+        Удаляет записи одним DELETE ... RETURNING и возвращает удаленные строки,
+        чтобы не искать их перед удалением.
+
+        Args:
+            filters: Фильтр по равенству полей, хотя бы одно поле обязательно
+            conditions: Дополнительные условия WHERE, например проверка владельца записи
+
+        Returns:
+            list: Удаленные объекты (уже отсоединенные от сессии)
+        """
+        filter_dict = filters.model_dump(exclude_unset=True)
+        logger.info(f"Удаление с возвратом записей {self.model.__name__} по фильтру: {filter_dict}")
+        if not filter_dict:
+            logger.error("Нужен хотя бы один фильтр для удаления.")
+            raise ValueError("Нужен хотя бы один фильтр для удаления.")
+        try:
+            await self._invalidate()
+            query = (
+                sqlalchemy_delete(self.model)
+                .filter_by(**filter_dict)
+                .where(*conditions)
+                .returning(self.model)
+                # При поддержке RETURNING "fetch" не делает лишнего SELECT, а только убирает объекты из сессии
+                .execution_options(synchronize_session="fetch")
+            )
+            records = list((await self._session.execute(query)).scalars().all())
+            logger.info(f"Удалено {len(records)} записей.")
+            return records
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при удалении записей: {e}")
+            raise
+
     async def delete(self, filters: BaseModel):
         filter_dict = filters.model_dump(exclude_unset=True)
         logger.info(f"Удаление записей {self.model.__name__} по фильтру: {filter_dict}")
@@ -110,6 +405,7 @@ class BaseDAO(Generic[T]):
             logger.error("Нужен хотя бы один фильтр для удаления.")
             raise ValueError("Нужен хотя бы один фильтр для удаления.")
         try:
+            await self._invalidate()
             query = sqlalchemy_delete(self.model).filter_by(**filter_dict)
             result = await self._session.execute(query)
             logger.info(f"Удалено {result.rowcount} записей.")
@@ -124,7 +420,7 @@ class BaseDAO(Generic[T]):
         logger.info(f"Подсчет количества записей {self.model.__name__} по фильтру: {filter_dict}")
         try:
             query = select(func.count(self.model.id)).filter_by(**filter_dict)
-            result = await self._session.execute(query)
+            result = await self._execute(query)
             count = result.scalar()
             logger.info(f"Найдено {count} записей.")
             return count
@@ -132,27 +428,162 @@ class BaseDAO(Generic[T]):
             logger.error(f"Ошибка при подсчете записей: {e}")
             raise
 
+    async def version_stamp(self, conditions: Sequence = (), related: Sequence[Type[Base]] = ()) -> str:
+        """
+        Версия коллекции: количество строк, max(id) и sum(revision) одним агрегатным запросом,
+        без загрузки и сериализации самих записей. Любой UPDATE увеличивает revision строки,
+        поэтому сумма растет независимо от порядка коммитов (max(updated_at) мог не измениться,
+        если позже коммитится транзакция, начатая раньше). Вставки и удаления меняют количество и max(id).
+
+        Args:
+            conditions: Условия WHERE, ограничивающие коллекцию
+            related: Модели, чьи данные тоже попадают в ответ (например, помещения у тренировок)
+        """
+        logger.info(f"Расчет версии коллекции {self.model.__name__}")
+        try:
+            columns = []
+            for model, where in [(self.model, conditions), *((model, ()) for model in related)]:
+                for aggregate in (func.count(model.id), func.max(model.id), func.sum(model.revision)):
+                    columns.append(select(aggregate).where(*where).scalar_subquery())
+            row = (await self._execute(select(*columns))).one()
+            return ":".join(str(value) for value in row)
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при расчете версии коллекции {self.model.__name__}: {e}")
+            raise
+
     async def bulk_update(self, records: List[BaseModel]):
+        """
+        Массовое обновление записей по id.
+        Записи с одинаковым набором полей обновляются одним UPDATE ... RETURNING id: значения
+        подставляются через CASE по id, а строки блокируются подзапросом FOR UPDATE в порядке id,
+        чтобы параллельные пачки брали блокировки в одном порядке. Возвращает число реально
+        обновленных строк - отсутствующие id не учитываются.
+        """
         logger.info(f"Массовое обновление записей {self.model.__name__}")
         try:
-            updated_count = 0
+            await self._invalidate()
+            groups: dict[tuple[str, ...], dict[int, dict]] = {}
             for record in records:
                 record_dict = record.model_dump(exclude_unset=True)
                 if 'id' not in record_dict:
                     continue
+                fields = tuple(sorted(k for k in record_dict if k != 'id'))
+                if not fields:
+                    continue
+                groups.setdefault(fields, {})[record_dict['id']] = record_dict
 
-                update_data = {k: v for k, v in record_dict.items() if k != 'id'}
+            table = self.model.__table__
+            updated_count = 0
+            for fields, rows in groups.items():
+                locked = (
+                    select(table.c.id)
+                    .where(table.c.id.in_(sorted(rows)))
+                    .order_by(table.c.id)
+                    .with_for_update()
+                )
+                # Типизированные literal: asyncpg рендерит их как $n::TYPE, иначе CASE получил бы тип text
                 stmt = (
-                    sqlalchemy_update(self.model)
-                    .filter_by(id=record_dict['id'])
-                    .values(**update_data)
+                    sqlalchemy_update(table)
+                    .where(table.c.id.in_(locked.scalar_subquery()))
+                    .values({
+                        field: case(
+                            {row_id: literal(row[field], table.c[field].type) for row_id, row in rows.items()},
+                            value=table.c.id,
+                        )
+                        for field in fields
+                    })
+                    .returning(table.c.id)
                 )
-                result = await self._session.execute(stmt)
-                updated_count += result.rowcount
+                updated_ids = (await self._session.execute(stmt)).scalars().all()
+                updated_count += len(updated_ids)
+                self._sync_identity_map([rows[row_id] for row_id in updated_ids])
 
             logger.info(f"Обновлено {updated_count} записей")
             await self._session.flush()
             return updated_count
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при массовом обновлении: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def add_many_skip_conflicts(self, instances: List[BaseModel], returning: Sequence[str] = ("id",)) -> list:
+        """
+        Вставляет записи одним INSERT ... ON CONFLICT DO NOTHING: строки, нарушающие любое
+        уникальное ограничение (например, занятые параллельной транзакцией), пропускаются,
+        а не прерывают всю пачку.
+
+        Returns:
+            list: Строки RETURNING с колонками returning для реально вставленных записей
+        """
+        values_list = [item.model_dump(exclude_unset=True) for item in instances]
+        logger.info(f"Добавление записей {self.model.__name__} с пропуском конфликтов. Количество: {len(values_list)}")
+        if not values_list:
+            return []
+        try:
+            await self._invalidate()
+            insert_fn = postgresql_insert if self._dialect == "postgresql" else sqlite_insert
+            table = self.model.__table__
+            stmt = (
+                insert_fn(table)
+                .values(values_list)
+                .on_conflict_do_nothing()
+                .returning(*[table.c[name] for name in returning])
+            )
+            rows = (await self._session.execute(stmt)).all()
+            logger.info(f"Добавлено {len(rows)} из {len(values_list)} записей.")
+            return rows
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при добавлении записей с пропуском конфликтов: {e}")
+            raise
+
+    async def upsert_many(self, instances: List[BaseModel], conflict_columns: Sequence[str] = ("id",)) -> list[int]:
+        """
+        Вставляет записи одним INSERT ... ON CONFLICT DO UPDATE.
+
+        Args:
+            instances: Записи для вставки или обновления
+            conflict_columns: Колонки уникального ограничения, по которому определяется конфликт
+
+        Returns:
+            list[int]: id вставленных и обновленных записей
+        """
+        values_list = [item.model_dump(exclude_unset=True) for item in instances]
+        logger.info(f"Upsert записей {self.model.__name__}. Количество: {len(values_list)}")
+        if not values_list:
+            return []
+        try:
+            await self._invalidate()
+            keyed_rows: dict[tuple, dict] = {}
+            keyless_rows: list[dict] = []
+            for row in values_list:
+                key = tuple(row.get(c) for c in conflict_columns)
+                if None in key:
+                    # Без ключа конфликта строка только вставляется: NULL ни с чем не конфликтует
+                    keyless_rows.append(row)
+                else:
+                    # Повтор ключа в одной пачке Postgres не допускает - оставляем последнее значение
+                    keyed_rows[key] = row
+            # Одинаковый порядок ключей конфликта защищает параллельные пачки от взаимоблокировок
+            values_list = [keyed_rows[key] for key in sorted(keyed_rows)] + keyless_rows
+            # В одном многострочном INSERT у всех строк должен быть одинаковый набор колонок
+            groups: dict[tuple[str, ...], list[dict]] = {}
+            for row in values_list:
+                groups.setdefault(tuple(sorted(row)), []).append(row)
+
+            insert_fn = postgresql_insert if self._dialect == "postgresql" else sqlite_insert
+            ids = []
+            for columns, rows in groups.items():
+                stmt = insert_fn(self.model.__table__).values(rows)
+                set_ = {key: getattr(stmt.excluded, key) for key in columns if key not in conflict_columns}
+                set_["updated_at"] = func.now()
+                # onupdate колонок не действует на ON CONFLICT DO UPDATE
+                set_["revision"] = self.model.__table__.c.revision + 1
+                stmt = stmt.on_conflict_do_update(index_elements=list(conflict_columns), set_=set_)
+                result = await self._session.execute(stmt.returning(self.model.__table__.c.id))
+                ids.extend(result.scalars().all())
+            self._sync_identity_map([row for row in values_list if "id" in row])
+            logger.info(f"Вставлено или обновлено {len(ids)} записей.")
+            await self._session.flush()
+            return ids
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при upsert записей: {e}")
+            raise
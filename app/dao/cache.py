@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from enum import Enum
+from functools import lru_cache
+from typing import Iterable
+
+from loguru import logger
+from sqlalchemy import Table, event, select, func
+from sqlalchemy.engine import FrozenResult
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session, Mapper
+
+from app.config import settings
+
+
+# Канал PostgreSQL, через который воркеры сообщают друг другу об измененных таблицах
+INVALIDATION_CHANNEL = "dao_cache_invalidate"
+
+
+class CacheBackend:
+    """
+    Хранилище результатов запросов DAO. Каждая запись помечена тегами - именами таблиц,
+    из которых она собрана; запись в любую из этих таблиц сбрасывает запись кэша.
+    """
+
+    enabled = True
+
+    def get(self, key: str) -> FrozenResult | None:
+        raise NotImplementedError
+
+    def set(self, key: str, value: FrozenResult, tags: Iterable[str]):
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class NullCacheBackend(CacheBackend):
+    """Кэш выключен: все чтения идут в БД."""
+
+    enabled = False
+
+    def get(self, key: str) -> FrozenResult | None:
+        return None
+
+    def set(self, key: str, value: FrozenResult, tags: Iterable[str]):
+        pass
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """LRU-кэш в памяти процесса с ограничением по количеству записей и времени жизни."""
+
+    def __init__(self, max_entries: int = 1024, ttl_s: float = 30):
+        self.max_entries = max_entries
+        self.ttl = ttl_s
+        self._entries: OrderedDict[str, tuple[float, FrozenResult, frozenset[str]]] = OrderedDict()
+        self._keys_by_tag: dict[str, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> FrozenResult | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: FrozenResult, tags: Iterable[str]):
+        tags = frozenset(tags)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        for tag in tags:
+            for key in self._keys_by_tag.pop(tag, set()):
+                self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_tag.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+def create_cache_backend(name: str) -> CacheBackend:
+    if name == "memory":
+        return MemoryCacheBackend(max_entries=settings.QUERY_CACHE_MAX_ENTRIES, ttl_s=settings.QUERY_CACHE_TTL_S)
+    if name == "none":
+        return NullCacheBackend()
+    raise ValueError(f"Неизвестный бэкенд кэша запросов: {name}")
+
+
+query_cache: CacheBackend = create_cache_backend(settings.QUERY_CACHE_BACKEND)
+
+# Теги, по которым кэшируются чтения DAO (cache_tags всех DAO-классов)
+_query_tags: set[str] = set()
+# Другие кэши процесса, которые сбрасываются по тем же тегам (например, кэш пользователей авторизации)
+_subscribed_caches: list[tuple[CacheBackend, frozenset[str]]] = []
+
+
+def watch_query_tags(tags: Iterable[str]):
+    """Регистрирует теги, от которых зависят закэшированные чтения DAO."""
+    _query_tags.update(tags)
+
+
+def subscribe(cache: CacheBackend, tags: Iterable[str]):
+    """Подписывает кэш на сброс по тегам при записи через DAO, в том числе из других воркеров."""
+    _subscribed_caches.append((cache, frozenset(tags)))
+
+
+def _caches() -> list[CacheBackend]:
+    return [query_cache, *(cache for cache, _ in _subscribed_caches)]
+
+
+def watched_tags() -> set[str]:
+    """Теги, которые читает хоть один включенный кэш. Запись в остальные таблицы сбрасывать некому."""
+    tags = set(_query_tags) if query_cache.enabled else set()
+    for cache, cache_tags in _subscribed_caches:
+        if cache.enabled:
+            tags.update(cache_tags)
+    return tags
+
+
+def invalidation_enabled() -> bool:
+    """Есть ли хоть один включенный кэш, которому нужны сбросы."""
+    return bool(watched_tags())
+
+
+def invalidate(tags: Iterable[str]):
+    """Сбрасывает записи кэшей текущего процесса с указанными тегами."""
+    tags = list(tags)
+    for cache in _caches():
+        cache.invalidate_tags(tags)
+
+
+def clear_all():
+    for cache in _caches():
+        cache.clear()
+
+
+def _stable_repr(value) -> str:
+    """Представление элемента структурного ключа SQLAlchemy без адресов объектов и hash()."""
+    if isinstance(value, tuple):
+        return f"({','.join(_stable_repr(item) for item in value)})"
+    if isinstance(value, (str, int, float, bool, Enum)) or value is None:
+        return repr(value)
+    if isinstance(value, Mapper):
+        value = value.class_
+    if isinstance(value, Table):
+        return f"table:{value.fullname}"
+    if hasattr(value, "__qualname__"):
+        return f"{getattr(value, '__module__', '')}.{value.__qualname__}"
+    return f"{type(value).__module__}.{type(value).__qualname__}:{value!r}"
+
+
+@lru_cache(maxsize=1024)
+def statement_digest(structure: tuple) -> str:
+    """
+    sha256 структурного ключа запроса (CacheKey.key): одинаков во всех воркерах и после перезапуска,
+    в отличие от hash(), и учитывает опции загрузки. Считается один раз на форму запроса.
+    """
+    return hashlib.sha256(_stable_repr(structure).encode()).hexdigest()
+
+
+def params_digest(values: list) -> str:
+    return hashlib.sha256(repr(values).encode()).hexdigest()
+
+
+# Одно NOTIFY на транзакцию со всеми тегами через запятую. Postgres доставит его только после коммита
+@event.listens_for(Session, "before_commit")
+def _notify_before_commit(session: Session):
+    tags = session.info.get("cache_tags")
+    if tags and session.get_bind().dialect.name == "postgresql":
+        session.execute(select(func.pg_notify(INVALIDATION_CHANNEL, ",".join(sorted(tags)))))
+
+
+# Повторный сброс после коммита: пока транзакция писала, другой запрос этого процесса
+# мог успеть положить в кэш старые данные
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    tags = session.info.pop("cache_tags", None)
+    if tags:
+        invalidate(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session):
+    session.info.pop("cache_tags", None)
+
+
+class CacheInvalidationListener:
+    """
+    Слушает канал INVALIDATION_CHANNEL (LISTEN) и сбрасывает локальный кэш по тегам,
+    присланным другими воркерами. NOTIFY отправляется в транзакции записи и доставляется
+    только после ее коммита. При обрыве соединения переподключается.
+    """
+
+    def __init__(self, engine: AsyncEngine, reconnect_delay_s: float = 5):
+        self.engine = engine
+        self.reconnect_delay = reconnect_delay_s
+        self._task: asyncio.Task | None = None
+
+    @staticmethod
+    def _on_notify(connection, pid, channel, payload: str):
+        invalidate(payload.split(","))
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self.engine.connect() as conn:
+                    raw = (await conn.get_raw_connection()).driver_connection
+                    await raw.add_listener(INVALIDATION_CHANNEL, self._on_notify)
+                    logger.info(f"Подписка на канал {INVALIDATION_CHANNEL}")
+                    # Пока не было подписки, сообщения могли быть пропущены
+                    clear_all()
+                    try:
+                        while not raw.is_closed():
+                            await asyncio.sleep(self.reconnect_delay)
+                    finally:
+                        if not raw.is_closed():
+                            await raw.remove_listener(INVALIDATION_CHANNEL, self._on_notify)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка подписки на канал {INVALIDATION_CHANNEL}: {e}")
+            clear_all()
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self):
+        if invalidation_enabled() and self.engine.dialect.name == "postgresql" and self._task is None:
+            self._task = asyncio.create_task(self._listen(), name="cache_invalidation_listener")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -5,7 +5,7 @@ from decimal import Decimal
 
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncAttrs
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase
-from sqlalchemy import func, Integer, inspect
+from sqlalchemy import func, Integer, inspect, text
 
 from app.config import settings
 
@@ -14,6 +14,10 @@ engine = create_async_engine(
     url=settings.get_db_url,
 )
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+# Сессии для запросов без записи: в PostgreSQL транзакции READ ONLY, пул общий с engine
+read_only_session_maker = async_sessionmaker(
+    engine.execution_options(postgresql_readonly=True), expire_on_commit=False
+)
 
 created_at = Annotated[datetime, mapped_column(server_default=func.now())]
 updated_at = Annotated[datetime, mapped_column(server_default=func.now(), onupdate=datetime.now)]
@@ -25,6 +29,9 @@ class Base(AsyncAttrs, DeclarativeBase):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     created_at: Mapped[created_at]
     updated_at: Mapped[updated_at]
+    # Счетчик изменений строки: +1 при каждом UPDATE (ORM и Core - через onupdate, триггеры - явно).
+    # В отличие от updated_at не зависит от времени начала и порядка коммита транзакций
+    revision: Mapped[int] = mapped_column(default=1, server_default=text("1"), onupdate=text("revision + 1"))
 
     def to_dict(self, exclude_none: bool = False):
         """
@@ -0,0 +1,80 @@
+from datetime import datetime, time
+from typing import Type
+
+from pydantic import BaseModel
+from sqlalchemy import String, literal_column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement, FunctionElement
+
+
+class json_object(FunctionElement):
+    """JSON-объект из пар ключ-значение: json_build_object в PostgreSQL, json_object в SQLite."""
+    # Текст документа отдается клиенту как есть, без разбора на стороне приложения
+    type = String()
+    inherit_cache = True
+
+
+@compiles(json_object, "postgresql")
+def _json_object_postgresql(element, compiler, **kw):
+    return f"json_build_object({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_object)
+def _json_object_default(element, compiler, **kw):
+    return f"json_object({compiler.process(element.clauses, **kw)})"
+
+
+class json_temporal(FunctionElement):
+    """
+    Дата/время в том же текстовом виде, что дает pydantic. PostgreSQL сам пишет ISO 8601
+    в json_build_object; SQLite хранит текст с пробелом и микросекундами, поэтому там
+    значение форматируется strftime (доли секунды отбрасываются).
+    """
+    type = String()
+    inherit_cache = True
+    # Формат - атрибут класса: отдельный класс на формат попадает в ключ кэша компиляции
+    fmt: str
+
+
+class json_datetime(json_temporal):
+    inherit_cache = True
+    fmt = "%Y-%m-%dT%H:%M:%S"
+
+
+class json_time(json_temporal):
+    inherit_cache = True
+    fmt = "%H:%M:%S"
+
+
+@compiles(json_temporal)
+def _json_temporal_default(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(json_temporal, "sqlite")
+def _json_temporal_sqlite(element, compiler, **kw):
+    return f"strftime('{element.fmt}', {compiler.process(element.clauses, **kw)})"
+
+
+def json_value(column) -> ColumnElement:
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return json_datetime(column)
+    if python_type is time:
+        return json_time(column)
+    return column
+
+
+def json_document(schema: Type[BaseModel], source, **nested: ColumnElement) -> json_object:
+    """
+    JSON-документ в форме схемы ответа: ключи - поля schema в том же порядке,
+    значения - одноименные колонки модели source. Вложенные схемы передаются
+    готовыми документами через nested.
+
+    Пример: json_document(STrainingInfo, Training, room=json_document(SRoomInfo, Room), ...)
+    """
+    pairs = []
+    for name in schema.model_fields:
+        value = nested[name] if name in nested else json_value(getattr(source, name))
+        pairs += [literal_column(f"'{name}'"), value]
+    return json_object(*pairs)
@@ -0,0 +1,51 @@
+import base64
+import json
+from datetime import date, datetime, time
+from typing import Sequence
+
+from pydantic import BaseModel, Field
+
+from app.exceptions import InvalidCursorException
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class SPageParams(BaseModel):
+    limit: int | None = Field(default=None, description="Размер страницы. Без него возвращается весь список")
+    after: str | None = Field(default=None, description="Курсор, полученный в заголовке X-Next-Cursor")
+
+
+def encode_cursor(record, key_names: Sequence[str]) -> str:
+    """Упаковывает значения ключа сортировки последней записи в непрозрачный курсор."""
+    values = []
+    for name in key_names:
+        value = getattr(record, name)
+        if isinstance(value, (date, datetime, time)):
+            value = value.isoformat()
+        values.append(value)
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_columns: Sequence) -> list:
+    """
+    Распаковывает курсор и приводит значения к типам колонок ключа сортировки.
+    При любом несоответствии выбрасывает InvalidCursorException.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(key_columns):
+            raise ValueError("Неверная длина курсора")
+        result = []
+        for column, value in zip(key_columns, values):
+            python_type = column.type.python_type
+            if python_type in (date, datetime, time):
+                value = python_type.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                raise ValueError(f"Неверный тип значения курсора: {value!r}")
+            result.append(value)
+        return result
+    except (ValueError, TypeError, json.JSONDecodeError, UnicodeDecodeError):
+        raise InvalidCursorException
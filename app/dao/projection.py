@@ -0,0 +1,66 @@
+from functools import lru_cache
+from typing import Sequence, Type, get_args, get_origin
+
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+
+from app.exceptions import InvalidFieldsException
+
+
+def partial_schema(schema: Type[BaseModel], fields: str | None) -> Type[BaseModel]:
+    """
+    Схема ответа только с перечисленными полями верхнего уровня (fields=id,title,date).
+    Без fields возвращается исходная схема. Неизвестное поле - InvalidFieldsException.
+    """
+    if not fields:
+        return schema
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested or not requested <= schema.model_fields.keys():
+        raise InvalidFieldsException
+    # Порядок полей - как в исходной схеме, чтобы одинаковые наборы давали одну схему
+    return _build_partial_schema(schema, tuple(name for name in schema.model_fields if name in requested))
+
+
+@lru_cache(maxsize=256)
+def _build_partial_schema(schema: Type[BaseModel], names: tuple[str, ...]) -> Type[BaseModel]:
+    if len(names) == len(schema.model_fields):
+        return schema
+    definitions = {name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in names}
+    return create_model(f"{schema.__name__}Fields", __config__=ConfigDict(from_attributes=True), **definitions)
+
+
+def _nested_schema(annotation) -> Type[BaseModel] | None:
+    if get_origin(annotation) is list:
+        annotation = get_args(annotation)[0]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    return None
+
+
+def load_fields(model, schema: Type[BaseModel], include: Sequence[str] = ()) -> list:
+    """
+    Опции загрузки, читающие из БД только колонки, нужные схеме ответа: load_only для полей
+    модели и selectinload с такой же проекцией для вложенных схем (связей).
+
+    Args:
+        model: ORM-модель
+        schema: Схема ответа (полная или из partial_schema)
+        include: Колонки, нужные помимо схемы, например ключ сортировки для курсора
+    """
+    mapper = inspect(model)
+    columns = set(include)
+    options = []
+    for name, field in schema.model_fields.items():
+        if name in mapper.relationships:
+            relationship = mapper.relationships[name]
+            # Внешний ключ нужен, чтобы selectinload нашел связанные строки
+            columns.update(mapper.get_property_by_column(column).key for column in relationship.local_columns)
+            nested = _nested_schema(field.annotation)
+            loader = selectinload(getattr(model, name))
+            if nested is not None:
+                loader = loader.options(*load_fields(relationship.mapper.class_, nested))
+            options.append(loader)
+        elif name in mapper.column_attrs:
+            columns.add(name)
+    return [load_only(*(getattr(model, column) for column in sorted(columns))), *options]
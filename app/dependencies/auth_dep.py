@@ -1,17 +1,30 @@
-from datetime import datetime, timezone
-from fastapi import Request, Depends
-from jose import jwt, JWTError, ExpiredSignatureError
+from fastapi import Request, Depends, Response
+from jose import JWTError, ExpiredSignatureError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.users.dao import UsersDAO
 from app.users.models import User
+from app.users.schemas import SPrincipal
+from app.users.auth import set_tokens, token_cache
 from app.config import settings
-from app.dependencies.dao_dep import get_session_without_commit
+from app.dao import cache as dao_cache
+from app.dao.cache import MemoryCacheBackend, NullCacheBackend
+from app.dependencies.dao_dep import get_session
 from app.exceptions import (
     TokenNoFound, NoJwtException, TokenExpiredException, NoUserIdException, ForbiddenException, UserNotFoundException
 )
 
 
+# Кэш авторизованных пользователей: user_id -> SPrincipal.
+# Сбрасывается при записи в users и roles через DAO, в том числе в других воркерах
+PRINCIPAL_TAGS = ("users", "roles")
+principal_cache = (
+    MemoryCacheBackend(max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES, ttl_s=settings.PRINCIPAL_CACHE_TTL_S)
+    if settings.PRINCIPAL_CACHE_TTL_S > 0 else NullCacheBackend()
+)
+dao_cache.subscribe(principal_cache, PRINCIPAL_TAGS)
+
+
 def get_access_token(request: Request) -> str:
     """Извлекаем access_token из кук."""
     token = request.cookies.get('user_access_token')
@@ -30,15 +43,11 @@ def get_refresh_token(request: Request) -> str:
 
 async def check_refresh_token(
         token: str = Depends(get_refresh_token),
-        session: AsyncSession = Depends(get_session_without_commit)
+        session: AsyncSession = Depends(get_session)
 ) -> User:
     """ Проверяем refresh_token и возвращаем пользователя."""
     try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
-        )
+        payload = token_cache.decode(token)
         user_id = payload.get("sub")
         if not user_id:
             raise NoJwtException
@@ -53,48 +62,56 @@ async def check_refresh_token(
 
 
 async def get_current_user(
+        response: Response,
         token: str = Depends(get_access_token),
-        session: AsyncSession = Depends(get_session_without_commit)
-) -> User:
-    """Проверяем access_token и возвращаем пользователя."""
+        session: AsyncSession = Depends(get_session)
+) -> SPrincipal:
+    """
+    Проверяем access_token и возвращаем пользователя (id и роль).
+    Пользователь берется из кэша; к БД обращаемся только при промахе - одним запросом по ключу.
+    """
     try:
-        # Декодируем токен
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        # Декодируем токен; повторный токен берется из кэша без проверки подписи.
+        # Срок действия (exp, обязательный) проверяется и при декодировании, и при попадании в кэш
+        payload = token_cache.decode(token)
     except ExpiredSignatureError:
         raise TokenExpiredException
     except JWTError:
         # Общая ошибка для токенов
         raise NoJwtException
 
-    expire: str = payload.get('exp')
-    expire_time = datetime.fromtimestamp(int(expire), tz=timezone.utc)
-    if (not expire) or (expire_time < datetime.now(timezone.utc)):
-        raise TokenExpiredException
-
     user_id: str = payload.get('sub')
     if not user_id:
         raise NoUserIdException
 
-    user = await UsersDAO(session).find_one_or_none_by_id(data_id=int(user_id))
-    if not user:
-        raise UserNotFoundException
-    return user
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        principal = await UsersDAO(session).find_principal(int(user_id))
+        if not principal:
+            raise UserNotFoundException
+        principal_cache.set(user_id, principal, PRINCIPAL_TAGS)
 
+    # Токен выпущен до изменения пользователя (например, смены роли):
+    # права проверяются по актуальной роли, а токены перевыпускаются
+    if payload.get('ver') != principal.version:
+        set_tokens(response, principal)
+    return principal
 
-async def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
+
+async def get_current_admin_user(current_user: SPrincipal = Depends(get_current_user)) -> SPrincipal:
     """Проверяем права пользователя как администратора."""
     if current_user.role.id in [3]:
         return current_user
     raise ForbiddenException
 
-async def get_current_trainer_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_trainer_user(current_user: SPrincipal = Depends(get_current_user)) -> SPrincipal:
     """Проверяем права пользователя как тренера."""
     if current_user.role.id in [2]:
         return current_user
     raise ForbiddenException
 
-async def get_current_trainer_admin_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_trainer_admin_user(current_user: SPrincipal = Depends(get_current_user)) -> SPrincipal:
     """Проверяем права пользователя как трененра и администратора."""
     if current_user.role.id in [2, 3]:
         return current_user
-    raise ForbiddenException
\ No newline at end of file
+    raise ForbiddenException
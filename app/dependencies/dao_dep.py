@@ -1,28 +1,29 @@
 from typing import AsyncGenerator
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.dao.database import async_session_maker
+from app.dao.database import async_session_maker, read_only_session_maker
 
 
-async def get_session_with_commit() -> AsyncGenerator[AsyncSession, None]:
-    """Асинхронная сессия с автоматическим коммитом."""
-    async with async_session_maker() as session:
-        try:
-            yield session
-            await session.commit()
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
+# Запросы с этими методами ничего не пишут: их транзакции открываются только для чтения
+READ_ONLY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
 
+async def get_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Единая сессия запроса. FastAPI кэширует зависимость в пределах запроса, поэтому
+    авторизация и обработчик работают в одной сессии, одном соединении и одной транзакции.
 
-async def get_session_without_commit() -> AsyncGenerator[AsyncSession, None]:
-    """Асинхронная сессия без автоматического коммита."""
-    async with async_session_maker() as session:
+    GET/HEAD/OPTIONS получают транзакцию только для чтения, она просто закрывается. В остальных
+    запросах коммитится любая открытая транзакция: запись через DAO, прямой session.execute
+    или session.add в обработчике - решение не зависит от того, через какой код шла запись.
+    """
+    writable = request.method not in READ_ONLY_METHODS
+    maker = async_session_maker if writable else read_only_session_maker
+    async with maker() as session:
         try:
             yield session
+            if writable and session.in_transaction():
+                await session.commit()
         except Exception:
             await session.rollback()
             raise
-        finally:
-            await session.close()
\ No newline at end of file
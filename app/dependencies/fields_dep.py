@@ -0,0 +1,16 @@
+from typing import Callable, Type
+
+from fastapi import Query
+from pydantic import BaseModel
+
+from app.dao.projection import partial_schema
+
+
+def get_fields_schema(schema: Type[BaseModel]) -> Callable[..., Type[BaseModel]]:
+    """Зависимость: схема ответа, урезанная до полей из параметра fields."""
+    def dependency(
+            fields: str | None = Query(default=None, description=f"Поля ответа через запятую: "
+                                                                 f"{', '.join(schema.model_fields)}")
+    ) -> Type[BaseModel]:
+        return partial_schema(schema, fields)
+    return dependency
@@ -0,0 +1,14 @@
+from fastapi import Query
+
+from app.dao.pagination import SPageParams
+
+
+MAX_PAGE_LIMIT = 500
+
+
+def get_page_params(
+        limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_LIMIT, description="Размер страницы"),
+        after: str | None = Query(default=None, description="Курсор следующей страницы из X-Next-Cursor")
+) -> SPageParams:
+    """Параметры keyset-пагинации из query-строки."""
+    return SPageParams(limit=limit, after=after)
@@ -0,0 +1,29 @@
+from datetime import date, time
+
+from fastapi import Query
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from app.trainings.schemas import STrainingSearch
+
+
+def get_training_search(
+        q: str | None = Query(default=None, min_length=3, max_length=100,
+                              description="Подстрока в названии, описании или имени тренера, от 3 символов"),
+        date_from: date | None = Query(default=None, description="С какой даты, по умолчанию - с сегодняшней"),
+        date_to: date | None = Query(default=None, description="По какую дату включительно"),
+        room_id: int | None = Query(default=None, description="ID помещения"),
+        trainer_id: int | None = Query(default=None, description="ID тренера"),
+        time_from: time | None = Query(default=None, description="Начало не раньше"),
+        time_to: time | None = Query(default=None, description="Окончание не позже"),
+        has_free_spots: bool | None = Query(default=None, description="true - только со свободными местами, "
+                                                                      "false - только заполненные")
+) -> STrainingSearch:
+    """Фильтры поиска тренировок из query-строки; несогласованные диапазоны - 422, как и прочие ошибки параметров."""
+    try:
+        return STrainingSearch(q=q, date_from=date_from, date_to=date_to, room_id=room_id, trainer_id=trainer_id,
+                               time_from=time_from, time_to=time_to, has_free_spots=has_free_spots)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("query", *error["loc"])} for error in e.errors(include_url=False, include_context=False)]
+        )
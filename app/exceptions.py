@@ -83,3 +83,17 @@ RoomTimeConflictException = HTTPException(status_code=status.HTTP_409_CONFLICT,
 
 TrainerTimeConflictException = HTTPException(status_code=status.HTTP_409_CONFLICT,
                                             detail="Тренер уже ведет другую тренировку в это время")
+
+TrainingTimeOrderException = HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                           detail="Время окончания должно быть позже времени начала")
+
+
+InvalidCursorException = HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                       detail="Некорректный курсор пагинации")
+
+InvalidFieldsException = HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                       detail="Неизвестное поле в параметре fields")
+
+PasswordHashBusyException = HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                          detail="Сервер перегружен, повторите попытку позже",
+                                          headers={"Retry-After": "1"})
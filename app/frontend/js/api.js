@@ -91,6 +91,12 @@ class ApiClient {
         return this.request('/trainings/');
     }
 
+    // Фильтры выполняются на сервере: {q, date_from, date_to, room_id, trainer_id, time_from, time_to, has_free_spots}
+    async searchTrainings(filters) {
+        const params = new URLSearchParams(filters);
+        return this.request(`/trainings/search/?${params}`);
+    }
+
     async createTraining(data) {
         return this.request('/trainings/', {
             method: 'POST',
@@ -66,7 +66,14 @@ function handleTrainingSearch() {
     handleTrainingFilter();
 }
 
-function handleTrainingFilter() {
+// Дата в формате YYYY-MM-DD по локальному времени
+function toISODate(date) {
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    return `${date.getFullYear()}-${month}-${day}`;
+}
+
+async function handleTrainingFilter() {
     if (!window.allTrainings || !window.renderTrainings) return;
 
     const searchInput = document.getElementById('trainingSearch');
@@ -77,59 +84,52 @@ function handleTrainingFilter() {
     const dateValue = dateFilter?.value || 'all';
     const availabilityValue = availabilityFilter?.value || 'all';
 
-    let filtered = window.allTrainings;
+    // Фильтры отправляются на сервер, клиент получает только подходящие тренировки
+    const filters = {};
 
-    // Поиск по названию или тренеру
-    if (searchQuery) {
-        const query = searchQuery.toLowerCase();
-        filtered = filtered.filter(training => {
-            const title = training.title?.toLowerCase() || '';
-            const trainerName = `${training.trainer?.first_name || ''} ${training.trainer?.last_name || ''}`.toLowerCase();
-            return title.includes(query) || trainerName.includes(query);
-        });
+    // Поиск по названию, описанию или тренеру: сервер ищет от 3 символов (триграммы),
+    // более короткий запрос фильтруется здесь, как раньше, по названию и имени тренера
+    const query = searchQuery.trim();
+    if (query.length >= 3) {
+        filters.q = query;
     }
 
     // Фильтр по дате
     if (dateValue !== 'all') {
         const now = new Date();
-        now.setHours(0, 0, 0, 0);
-
-        filtered = filtered.filter(training => {
-            const trainingDate = new Date(training.date);
-            trainingDate.setHours(0, 0, 0, 0);
-
-            if (dateValue === 'today') {
-                return trainingDate.getTime() === now.getTime();
-            } else if (dateValue === 'week') {
-                const weekEnd = new Date(now);
-                weekEnd.setDate(weekEnd.getDate() + 7);
-                return trainingDate >= now && trainingDate <= weekEnd;
-            } else if (dateValue === 'month') {
-                const monthEnd = new Date(now.getFullYear(), now.getMonth() + 1, 0);
-                return trainingDate >= now && trainingDate <= monthEnd;
-            }
-            return true;
-        });
+        let end = now;
+        if (dateValue === 'week') {
+            end = new Date(now);
+            end.setDate(end.getDate() + 7);
+        } else if (dateValue === 'month') {
+            end = new Date(now.getFullYear(), now.getMonth() + 1, 0);
+        }
+        filters.date_from = toISODate(now);
+        filters.date_to = toISODate(end);
     }
 
     // Фильтр по доступности мест
     if (availabilityValue !== 'all') {
-        filtered = filtered.filter(training => {
-            const bookingCount = training.booking_count || 0;
-            const capacity = training.room?.capacity || 0;
-            const isFull = bookingCount >= capacity;
-
-            if (availabilityValue === 'available') {
-                return !isFull;
-            } else if (availabilityValue === 'full') {
-                return isFull;
-            }
-            return true;
-        });
+        filters.has_free_spots = availabilityValue === 'available';
     }
 
-    // Перерисовываем с сохранением значений фильтров
-    window.renderTrainings(filtered, searchQuery, dateValue, availabilityValue);
+    try {
+        let filtered = Object.keys(filters).length
+            ? await api.searchTrainings(filters)
+            : window.allTrainings;
+        if (query && query.length < 3) {
+            const needle = query.toLowerCase();
+            filtered = filtered.filter(training => {
+                const title = training.title?.toLowerCase() || '';
+                const trainerName = `${training.trainer?.first_name || ''} ${training.trainer?.last_name || ''}`.toLowerCase();
+                return title.includes(needle) || trainerName.includes(needle);
+            });
+        }
+        // Перерисовываем с сохранением значений фильтров
+        window.renderTrainings(filtered, searchQuery, dateValue, availabilityValue);
+    } catch (error) {
+        utils.showNotification('Ошибка поиска: ' + error.message, 'error');
+    }
 }
 
 function resetTrainingFilters() {
@@ -300,7 +300,7 @@ const pages = {
                                         <input type="text"
                                                id="trainingSearch"
                                                class="form-input"
-                                               placeholder="Название или тренер..."
+                                               placeholder="Название, описание или тренер..."
                                                value="${searchQuery}"
                                                onkeypress="if(event.key === 'Enter') handleTrainingSearch()">
                                         <button class="btn btn-primary search-btn" onclick="handleTrainingSearch()">
@@ -1,6 +1,5 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
@@ -10,9 +9,37 @@ from app.bookings.router import router as router_bookings
 from app.rooms.router import router as router_rooms
 from app.subscriptions.router import router as router_subscriptions
 from app.memberships.router import router as router_memberships
+from app.memberships.jobs import membership_expiry_job
+from app.trainings.jobs import training_archive_job
+from app.dao.cache import CacheInvalidationListener
+from app.dao.database import engine
+from app.users.auth import password_pool
+from app.users.importer import import_hash_pool
+from app.static_assets import StaticAssets
 
 
-app = FastAPI()
+cache_listener = CacheInvalidationListener(engine)
+frontend_dir = os.path.join(os.path.dirname(__file__), "frontend")
+static_assets = StaticAssets(frontend_dir, prefix="/static")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Фронтенд читается с диска, получает отпечатки и сжимается один раз
+    static_assets.build()
+    # Фоновые задачи: в каждом воркере свой цикл, выполняет тот, кто взял аренду
+    membership_expiry_job.start()
+    training_archive_job.start()
+    cache_listener.start()
+    yield
+    await cache_listener.stop()
+    await membership_expiry_job.stop()
+    await training_archive_job.stop()
+    password_pool.shutdown()
+    import_hash_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,17 +61,14 @@ app.include_router(router_bookings)
 app.include_router(router_subscriptions)
 app.include_router(router_memberships)
 
-frontend_dir = os.path.join(os.path.dirname(__file__), "frontend")
-app.mount("/static", StaticFiles(directory=frontend_dir), name="static")
+@app.get("/static/{path:path}", include_in_schema=False)
+async def serve_static(path: str, request: Request):
+    return static_assets.asset_response(request, path)
 
 @app.get("/")
-async def serve_root():
-    index_file = os.path.join(frontend_dir, "index.html")
-    return FileResponse(index_file)
+async def serve_root(request: Request):
+    return static_assets.index_response(request) or {"msg": "Not found"}
 
 @app.get("/{full_path:path}")
-async def serve_spa(full_path: str):
-    index_file = os.path.join(frontend_dir, "index.html")
-    if os.path.exists(index_file):
-        return FileResponse(index_file)
-    return {"msg": "Not found"}
+async def serve_spa(full_path: str, request: Request):
+    return static_assets.index_response(request) or {"msg": "Not found"}
@@ -28,27 +28,62 @@ class MembershipDAO(BaseDAO):
             logger.error(f"Ошибка при поиске действующих абонементов: {e}")
             raise
 
-    async def deactivate_expired_memberships(self) -> int:
+    def stream_memberships_with_data(self, chunk_size: int = 500):
+        return self.stream_all(
+            options=[selectinload(self.model.user), selectinload(self.model.subscription)],
+            chunk_size=chunk_size
+        )
+
+    async def find_memberships_page(self, limit: int | None = None, after: str | None = None):
+        return await self.find_page(
+            limit=limit,
+            after=after,
+            options=[selectinload(self.model.user), selectinload(self.model.subscription)]
+        )
+
+    async def find_active_by_user(self, user_id: int):
+        """Действующий абонемент клиента. Истекший по дате не возвращается, даже если статус еще active."""
+        logger.info(f"Поиск действующего абонемента пользователя ID={user_id}")
+        try:
+            query = select(self.model).where(self.model.user_id == user_id, self.model.is_active)
+            record = await self._session.scalar(query)
+            logger.info(f"Действующий абонемент {'найден' if record else 'не найден'}.")
+            return record
+        except Exception as e:
+            logger.error(f"Ошибка при поиске абонемента пользователя {user_id}: {e}")
+            raise
+
+    async def deactivate_expired_memberships(self, batch_size: int = 1000) -> int:
         """
-        Деактивирует все абонементы, срок действия которых истек.
+        Деактивирует очередную пачку абонементов, срок действия которых истек.
+        Строки, заблокированные другими транзакциями, пропускаются (SKIP LOCKED).
         Возвращает количество деактивированных абонементов.
         """
         logger.info("Проверка и деактивация истекших абонементов")
         try:
             today = date.today()
 
-            # Находим все активные абонементы с истекшим сроком
-            query = (
-                update(self.model)
+            # Очередная пачка активных абонементов с истекшим сроком
+            expired_ids = (
+                select(self.model.id)
                 .where(
                     and_(
                         self.model.status == "active",
                         self.model.end_date < today
                     )
                 )
+                .order_by(self.model.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            query = (
+                update(self.model)
+                .where(self.model.id.in_(expired_ids.scalar_subquery()))
                 .values(status="expired")
+                .execution_options(synchronize_session=False)
             )
 
+            await self._invalidate()
             result = await self._session.execute(query)
             count = result.rowcount
 
@@ -82,3 +117,10 @@ class SubRequestDAO(BaseDAO):
         except Exception as e:
             logger.error(f"Ошибка при поиске заявок: {e}")
             raise
+
+    async def find_requests_page(self, limit: int | None = None, after: str | None = None):
+        return await self.find_page(
+            limit=limit,
+            after=after,
+            options=[selectinload(self.model.user), selectinload(self.model.subscription)]
+        )
@@ -0,0 +1,32 @@
+from loguru import logger
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import settings
+from app.dao.database import async_session_maker
+from app.memberships.dao import MembershipDAO
+from app.scheduler import PeriodicJob
+
+
+async def expire_memberships(session_maker: async_sessionmaker = async_session_maker,
+                             batch_size: int = settings.MEMBERSHIP_EXPIRY_BATCH_SIZE) -> int:
+    """
+    Переводит истекшие абонементы в статус expired пачками, каждая в своей короткой транзакции.
+    Возвращает общее количество деактивированных абонементов.
+    """
+    total = 0
+    while True:
+        async with session_maker() as session:
+            count = await MembershipDAO(session).deactivate_expired_memberships(batch_size=batch_size)
+            await session.commit()
+        total += count
+        if count < batch_size:
+            break
+    logger.info(f"Всего деактивировано {total} истекших абонементов")
+    return total
+
+
+membership_expiry_job = PeriodicJob(
+    name="expire_memberships",
+    interval_s=settings.MEMBERSHIP_EXPIRY_INTERVAL_S,
+    func=expire_memberships,
+)
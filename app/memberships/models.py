@@ -1,4 +1,5 @@
-from sqlalchemy import ForeignKey, text
+from sqlalchemy import ForeignKey, Index, text, and_
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import date
 from app.dao.database import Base
@@ -13,8 +14,27 @@ class Membership(Base):
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), unique=True)
     subscription_id: Mapped[int] = mapped_column(ForeignKey("subscriptions.id", ondelete="CASCADE"))
 
+    __table_args__ = (
+        # Поиск истекших активных абонементов; неактивные в индекс не попадают
+        Index(
+            "ix_memberships_active_end_date", "end_date",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+    )
+
     user: Mapped["User"] = relationship(back_populates="membership") # type: ignore
     subscription: Mapped["Subscription"] = relationship(back_populates="memberships") # type: ignore
+
+    @hybrid_property
+    def is_active(self) -> bool:
+        """Фактическая активность: по дате окончания, не дожидаясь фоновой смены статуса."""
+        return self.status == "active" and self.end_date >= date.today()
+
+    @is_active.inplace.expression
+    @classmethod
+    def _is_active_expression(cls):
+        return and_(cls.status == "active", cls.end_date >= date.today())
     
     def __repr__(self):
         return (f"{self.__class__.__name__}(id={self.id}, user_id={self.user_id}, start_date={self.start_date}, "
@@ -27,6 +47,10 @@ class SubRequest(Base):
     subscription_id: Mapped[int] = mapped_column(ForeignKey("subscriptions.id", ondelete="CASCADE"))
     status: Mapped[str] = mapped_column(default="pending", server_default=text("'pending'"))
 
+    __table_args__ = (
+        Index("ix_sub_requests_user_id_status", "user_id", "status"),
+    )
+
     user: Mapped["User"] = relationship(back_populates="sub_requests") # type: ignore
     subscription: Mapped["Subscription"] = relationship(back_populates="sub_requests") # type: ignore
 
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, timedelta
 
-from app.dependencies.dao_dep import get_session_with_commit, get_session_without_commit
+from app.dependencies.dao_dep import get_session
 from app.dependencies.auth_dep import get_current_user, get_current_admin_user
-from app.users.models import User
+from app.dependencies.pagination_dep import get_page_params
+from app.dao.pagination import SPageParams, NEXT_CURSOR_HEADER
+from app.responses import StreamFormat, stream_response
+from app.users.schemas import SPrincipal
 from app.subscriptions.dao import SubscriptionDAO
 from app.memberships.dao import MembershipDAO, SubRequestDAO
 from app.memberships.schemas import (SMembershipCreate, SSubReqUpdate, SSubReqInfo, SMembershipInfo,
@@ -19,8 +22,8 @@ router = APIRouter(prefix="/memberships", tags=["Memberships"])
 
 @router.post("/request/", response_model=SSubReqInfo, status_code=201, summary="Создать заявку на абонемент")
 async def create_sub_request(data: SSubReqCreate,
-                             session: AsyncSession = Depends(get_session_with_commit),
-                             user_data: User = Depends(get_current_user)):
+                             session: AsyncSession = Depends(get_session),
+                             user_data: SPrincipal = Depends(get_current_user)):
     """
     Клиент создает заявку на одобрение абонемента.
     Доступ у клиента.
@@ -36,12 +39,9 @@ async def create_sub_request(data: SSubReqCreate,
     if not subscription:
         raise SubNotFound
 
-    # Деактивируем истекшие абонементы перед проверкой активных
-    await membership_dao.deactivate_expired_memberships()
-
-    # Если есть активный абонемент, то подать новую заявку нельзя
-    filters = SFilter(user_id=user_data.id, status="active")
-    active_membership = await membership_dao.find_one_or_none(filters=filters)
+    # Если есть действующий абонемент, то подать новую заявку нельзя.
+    # Истекшие по дате не учитываются, их статус меняет фоновая задача
+    active_membership = await membership_dao.find_active_by_user(user_data.id)
     if active_membership:
         raise MembershipIsActive
     # Если есть активная заявка, то подать новую заявку нельзя
@@ -57,8 +57,8 @@ async def create_sub_request(data: SSubReqCreate,
 @router.patch("/request/{request_id}/", summary="Изменить статус заявки на абонемент")
 async def update_sub_request_status(request_id: int,
                                     data: SSubReqUpdate,
-                                    session: AsyncSession = Depends(get_session_with_commit),
-                                    user_data: User = Depends(get_current_admin_user)
+                                    session: AsyncSession = Depends(get_session),
+                                    user_data: SPrincipal = Depends(get_current_admin_user)
                                     ) -> SSubReqInfo | dict:
     """
     Админ изменяет статус заявки клиента на абонемент.
@@ -67,13 +67,21 @@ async def update_sub_request_status(request_id: int,
     sr_dao = SubRequestDAO(session)
     sub_dao = SubscriptionDAO(session)
     membership_dao = MembershipDAO(session)
-    # Проверка существования заявки
-    request = await sr_dao.find_one_or_none_by_id(request_id)
-    if not request:
+    if data.status not in ("approved", "rejected"):
+        raise RequestBadStatus
+    # Изменение статуса одним UPDATE ... RETURNING; условие на pending не дает
+    # двум админам одновременно обработать одну заявку
+    updated = await sr_dao.update_returning(
+        filters=SSubReqFilter(id=request_id),
+        values=data,
+        conditions=[sr_dao.model.status == "pending"]
+    )
+    if not updated:
+        # Повторный запрос нужен только для выбора ошибки
+        if await sr_dao.find_one_or_none_by_id(request_id):
+            raise RequestAlreadyAccept
         raise RequestNotFound
-    if request.status != "pending":
-        raise RequestAlreadyAccept
-    # Изменение статуса заявки
+    request = updated[0]
     if data.status == "approved":
         subscription = await sub_dao.find_one_or_none_by_id(request.subscription_id)
 
@@ -90,34 +98,25 @@ async def update_sub_request_status(request_id: int,
         new_membership = await membership_dao.add(values=values)
         if not new_membership:
             return {"message": "Ошибка при создании membership"}
-    elif data.status == "rejected":
-        pass
-    else:
-        raise RequestBadStatus
-    # Изменение статуса заявки
-    filters = SSubReqFilter(id=request_id)
-    updated_count = await sr_dao.update(
-        filters=filters,
-        values=data
-    )
-    if updated_count == 0:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Обновление не выполнено")
-
-    updated_request = await sr_dao.find_one_or_none_by_id(request_id)
-    return SSubReqInfo.model_validate(updated_request)
+    return SSubReqInfo.model_validate(request)
 
 @router.get("/request/", response_model=list[SSubReqInfoFull], summary="Получить список всех заявок")
-async def get_all_requests(session: AsyncSession = Depends(get_session_without_commit),
-                           user_data: User = Depends(get_current_admin_user)):
+async def get_all_requests(response: Response,
+                           page: SPageParams = Depends(get_page_params),
+                           session: AsyncSession = Depends(get_session),
+                           user_data: SPrincipal = Depends(get_current_admin_user)):
     """
     Возвращает список всех существующих заявок.
     Доступ только у админа.
     """
-    return await SubRequestDAO(session).find_requests_with_data()
+    requests, next_cursor = await SubRequestDAO(session).find_requests_page(limit=page.limit, after=page.after)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return requests
 
 @router.get("/my/", response_model=SMembershipInfo, summary="Получить информацию о своем абонементе")
-async def get_my_membership(session: AsyncSession = Depends(get_session_with_commit),
-                            user_data: User = Depends(get_current_user)):
+async def get_my_membership(session: AsyncSession = Depends(get_session),
+                            user_data: SPrincipal = Depends(get_current_user)):
     """
     Клиент получает информацию о своем активном абонементе.
     Доступ у клиента.
@@ -127,24 +126,30 @@ async def get_my_membership(session: AsyncSession = Depends(get_session_with_com
     if user_data.role.name != "client":
         raise OnlyForClient
 
-    # Деактивируем истекшие абонементы перед поиском
-    await membership_dao.deactivate_expired_memberships()
-
-    # Поиск активного абонемента
-    filters = SFilter(user_id=user_data.id, status="active")
-    membership = await membership_dao.find_one_or_none(filters=filters)
+    # Поиск действующего абонемента
+    membership = await membership_dao.find_active_by_user(user_data.id)
     if not membership:
         raise ActiveMembershipNofFound
     return membership
 
 @router.get("/all/", response_model=list[SMembershipInfoFull], summary="Получить список всех абонементов")
-async def get_all_memberships(session: AsyncSession = Depends(get_session_without_commit),
-                              user_data: User = Depends(get_current_admin_user)):
+async def get_all_memberships(response: Response,
+                              page: SPageParams = Depends(get_page_params),
+                              stream: StreamFormat | None = Query(default=None, description="Потоковая выдача"),
+                              session: AsyncSession = Depends(get_session),
+                              user_data: SPrincipal = Depends(get_current_admin_user)):
     """
     Админ получает список всех абонементов клиентов.
+    С параметром stream=json|ndjson список отдается потоком без загрузки всей таблицы в память.
     Доступ только у админа.
     """
+    if stream:
+        return stream_response(
+            lambda s: MembershipDAO(s).stream_memberships_with_data(), SMembershipInfoFull, stream
+        )
     membership_dao = MembershipDAO(session)
-    # Получение всех абонементов с полной информацией (пользователь + подписка)
-    memberships = await membership_dao.find_memberships_with_data()
+    # Получение абонементов с полной информацией (пользователь + подписка)
+    memberships, next_cursor = await membership_dao.find_memberships_page(limit=page.limit, after=page.after)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return memberships
@@ -0,0 +1,55 @@
+"""hot query indexes
+
+Revision ID: 3c9d2e7f1a4b
+Revises: 8a1bfa4b8549
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d2e7f1a4b'
+down_revision: Union[str, Sequence[str], None] = '8a1bfa4b8549'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции,
+    # зато он не блокирует запись в таблицы на работающей базе
+    with op.get_context().autocommit_block():
+        op.create_index('ix_trainings_date_start_time', 'trainings', ['date', 'start_time', 'id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_trainings_room_id_date', 'trainings', ['room_id', 'date'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_trainings_trainer_id_date', 'trainings', ['trainer_id', 'date'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_bookings_training_id', 'bookings', ['training_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_memberships_active_end_date', 'memberships', ['end_date'],
+                        postgresql_where=sa.text("status = 'active'"),
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_sub_requests_user_id_status', 'sub_requests', ['user_id', 'status'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_sub_requests_user_id_status', table_name='sub_requests',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_memberships_active_end_date', table_name='memberships',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_bookings_training_id', table_name='bookings',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_trainings_trainer_id_date', table_name='trainings',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_trainings_room_id_date', table_name='trainings',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_trainings_date_start_time', table_name='trainings',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,50 @@
+"""training exclusion constraints
+
+Revision ID: 5e1f0b8c2d6a
+Revises: 3c9d2e7f1a4b
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1f0b8c2d6a'
+down_revision: Union[str, Sequence[str], None] = '3c9d2e7f1a4b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # btree_gist нужен для оператора "=" по integer внутри GiST-индекса
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    # На перевернутом интервале tsrange падает с ошибкой данных, пустой ни с чем не пересекается.
+    # Такие строки не исправить автоматически - миграция останавливается со списком id
+    bad_ids = op.get_bind().execute(
+        sa.text("SELECT id FROM trainings WHERE start_time >= end_time ORDER BY id")
+    ).scalars().all()
+    if bad_ids:
+        raise RuntimeError(
+            f"Тренировки с временем окончания не позже начала: {bad_ids}. Исправьте время и повторите миграцию"
+        )
+    op.create_check_constraint('ck_trainings_time_order', 'trainings', 'start_time < end_time')
+    # Если в базе уже есть пересекающиеся тренировки, миграция упадет - их нужно развести вручную
+    op.execute(
+        "ALTER TABLE trainings ADD CONSTRAINT ex_trainings_room_period "
+        "EXCLUDE USING gist (room_id WITH =, tsrange(date + start_time, date + end_time) WITH &&)"
+    )
+    op.execute(
+        "ALTER TABLE trainings ADD CONSTRAINT ex_trainings_trainer_period "
+        "EXCLUDE USING gist (trainer_id WITH =, tsrange(date + start_time, date + end_time) WITH &&)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('ex_trainings_trainer_period', 'trainings')
+    op.drop_constraint('ex_trainings_room_period', 'trainings')
+    op.drop_constraint('ck_trainings_time_order', 'trainings')
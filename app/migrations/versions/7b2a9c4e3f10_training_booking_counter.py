@@ -0,0 +1,51 @@
+"""training booking counter
+
+Revision ID: 7b2a9c4e3f10
+Revises: 5e1f0b8c2d6a
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2a9c4e3f10'
+down_revision: Union[str, Sequence[str], None] = '5e1f0b8c2d6a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('trainings', sa.Column('booking_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.execute("""
+        UPDATE trainings SET booking_count = counts.n
+        FROM (SELECT training_id, count(*) AS n FROM bookings GROUP BY training_id) AS counts
+        WHERE trainings.id = counts.training_id
+    """)
+    op.execute("""
+        CREATE FUNCTION bookings_seat_counter() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE trainings SET booking_count = booking_count + 1, updated_at = now() WHERE id = NEW.training_id;
+                RETURN NEW;
+            END IF;
+            UPDATE trainings SET booking_count = booking_count - 1, updated_at = now() WHERE id = OLD.training_id;
+            RETURN OLD;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_bookings_seat_counter AFTER INSERT OR DELETE ON bookings
+        FOR EACH ROW EXECUTE FUNCTION bookings_seat_counter()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_bookings_seat_counter ON bookings")
+    op.execute("DROP FUNCTION IF EXISTS bookings_seat_counter()")
+    op.drop_column('trainings', 'booking_count')
@@ -0,0 +1,80 @@
+"""training archive
+
+Revision ID: 9d4c1e6b2a70
+Revises: 7b2a9c4e3f10
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4c1e6b2a70'
+down_revision: Union[str, Sequence[str], None] = '7b2a9c4e3f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Вместо декларативного секционирования по дате - архивные таблицы, куда фоновая задача
+    # переносит прошедшие тренировки: ограничения-исключения trainings и внешний ключ
+    # bookings.training_id несовместимы с секционированием по date
+    op.create_table('trainings_archive',
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=False),
+    sa.Column('end_time', sa.Time(), nullable=False),
+    sa.Column('trainer_id', sa.Integer(), nullable=False),
+    sa.Column('room_id', sa.Integer(), nullable=False),
+    sa.Column('booking_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['room_id'], ['rooms.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['trainer_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_trainings_archive_trainer_id_date', 'trainings_archive', ['trainer_id', 'date'])
+    op.create_index('ix_trainings_archive_date', 'trainings_archive', ['date'])
+    op.create_table('bookings_archive',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('training_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['training_id'], ['trainings_archive.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_bookings_archive_user_id', 'bookings_archive', ['user_id'])
+    op.create_index('ix_bookings_archive_training_id', 'bookings_archive', ['training_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Архивные строки возвращаются в рабочие таблицы, иначе откат потерял бы историю.
+    # Счетчик мест переносится как есть: триггер на bookings увеличил бы его повторно
+    op.execute("ALTER TABLE bookings DISABLE TRIGGER trg_bookings_seat_counter")
+    op.execute("""
+        INSERT INTO trainings (id, title, description, date, start_time, end_time, trainer_id, room_id,
+                               booking_count, created_at, updated_at)
+        SELECT id, title, description, date, start_time, end_time, trainer_id, room_id,
+               booking_count, created_at, updated_at
+        FROM trainings_archive
+    """)
+    op.execute("""
+        INSERT INTO bookings (id, user_id, training_id, created_at, updated_at)
+        SELECT id, user_id, training_id, created_at, updated_at FROM bookings_archive
+    """)
+    op.execute("ALTER TABLE bookings ENABLE TRIGGER trg_bookings_seat_counter")
+    op.drop_index('ix_bookings_archive_training_id', table_name='bookings_archive')
+    op.drop_index('ix_bookings_archive_user_id', table_name='bookings_archive')
+    op.drop_table('bookings_archive')
+    op.drop_index('ix_trainings_archive_date', table_name='trainings_archive')
+    op.drop_index('ix_trainings_archive_trainer_id_date', table_name='trainings_archive')
+    op.drop_table('trainings_archive')
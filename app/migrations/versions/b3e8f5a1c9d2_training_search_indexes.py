@@ -0,0 +1,39 @@
+"""training search indexes
+
+Revision ID: b3e8f5a1c9d2
+Revises: 9d4c1e6b2a70
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8f5a1c9d2'
+down_revision: Union[str, Sequence[str], None] = '9d4c1e6b2a70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # pg_trgm дает классы операторов для GIN-индексов под ILIKE '%подстрока%'
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        op.create_index('ix_trainings_title_trgm', 'trainings', ['title'],
+                        postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'},
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_trainings_description_trgm', 'trainings', ['description'],
+                        postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'},
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_trainings_description_trgm', table_name='trainings',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_trainings_title_trgm', table_name='trainings',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,57 @@
+"""row revision
+
+Revision ID: c7d2e9f4a1b3
+Revises: b3e8f5a1c9d2
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e9f4a1b3'
+down_revision: Union[str, Sequence[str], None] = 'b3e8f5a1c9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = (
+    'roles', 'users', 'rooms', 'trainings', 'bookings', 'subscriptions', 'memberships', 'sub_requests',
+    'trainings_archive', 'bookings_archive',
+)
+
+
+def _seat_counter_function(revision_sql: str) -> str:
+    return f"""
+        CREATE OR REPLACE FUNCTION bookings_seat_counter() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE trainings SET booking_count = booking_count + 1, {revision_sql}updated_at = now()
+                WHERE id = NEW.training_id;
+                RETURN NEW;
+            END IF;
+            UPDATE trainings SET booking_count = booking_count - 1, {revision_sql}updated_at = now()
+            WHERE id = OLD.training_id;
+            RETURN OLD;
+        END
+        $$ LANGUAGE plpgsql
+    """
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Счетчик изменений строки для версии коллекций (ETag): в отличие от max(updated_at)
+    # не зависит от порядка коммита транзакций
+    for table in TABLES:
+        op.add_column(table, sa.Column('revision', sa.Integer(), server_default=sa.text('1'), nullable=False))
+    op.execute(_seat_counter_function("revision = revision + 1, "))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(_seat_counter_function(""))
+    for table in TABLES:
+        op.drop_column(table, 'revision')
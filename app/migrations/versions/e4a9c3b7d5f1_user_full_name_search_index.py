@@ -0,0 +1,34 @@
+"""user full name search index
+
+Revision ID: e4a9c3b7d5f1
+Revises: c7d2e9f4a1b3
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9c3b7d5f1'
+down_revision: Union[str, Sequence[str], None] = 'c7d2e9f4a1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Поиск тренировок по имени тренера: выражение совпадает с app.users.models.user_full_name
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_full_name_trgm ON users "
+            "USING gin ((first_name || ' ' || last_name) gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_full_name_trgm")
@@ -0,0 +1,138 @@
+import hashlib
+from enum import Enum
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Type
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.dao.database import read_only_session_maker
+
+
+# Размер буфера, после которого накопленные строки отправляются клиенту
+STREAM_FLUSH_BYTES = 64 * 1024
+
+# Публичные справочники: кэшировать можно, но каждый раз сверять ETag с сервером
+CATALOG_CACHE_CONTROL = "public, no-cache"
+
+
+class StreamFormat(str, Enum):
+    JSON = "json"
+    NDJSON = "ndjson"
+
+
+async def _serialize_rows(
+        fetch: Callable[[AsyncSession], AsyncIterator],
+        schema: Type[BaseModel],
+        fmt: StreamFormat,
+        session_maker: async_sessionmaker
+) -> AsyncIterator[bytes]:
+    # Сессия живет внутри генератора: зависимости FastAPI закрывают свои сессии
+    # до того, как тело StreamingResponse начинает отправляться
+    if fmt == StreamFormat.JSON:
+        yield b"["
+    separator = b"\n" if fmt == StreamFormat.NDJSON else b","
+    buffer = bytearray()
+    first = True
+    async with session_maker() as session:
+        async for row in fetch(session):
+            if fmt == StreamFormat.JSON and not first:
+                buffer += separator
+            buffer += schema.model_validate(row).model_dump_json().encode()
+            if fmt == StreamFormat.NDJSON:
+                buffer += separator
+            first = False
+            if len(buffer) >= STREAM_FLUSH_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+    if fmt == StreamFormat.JSON:
+        buffer += b"]"
+    if buffer:
+        yield bytes(buffer)
+
+
+def stream_response(
+        fetch: Callable[[AsyncSession], AsyncIterator],
+        schema: Type[BaseModel],
+        fmt: StreamFormat,
+        session_maker: async_sessionmaker = read_only_session_maker
+) -> StreamingResponse:
+    """
+    Потоковый ответ: строки читаются из БД пачками и сериализуются по мере поступления.
+
+    Args:
+        fetch: Функция, получающая сессию и возвращающая асинхронный итератор ORM-объектов
+        schema: Pydantic-схема одной строки ответа
+        fmt: JSON-массив или NDJSON (по объекту на строку)
+        session_maker: Фабрика сессий для чтения
+    """
+    media_type = "application/x-ndjson" if fmt == StreamFormat.NDJSON else "application/json"
+    return StreamingResponse(_serialize_rows(fetch, schema, fmt, session_maker), media_type=media_type)
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из версии коллекции и параметров запроса."""
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Response | None:
+    """
+    Проставляет ETag и Cache-Control в ответ. Если клиент прислал совпадающий If-None-Match,
+    возвращает готовый 304 - запрос данных и сериализация не выполняются.
+    """
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    response.headers.update(headers)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=304, headers=headers)
+    return None
+
+
+@lru_cache(maxsize=None)
+def type_adapter(schema_type: Any) -> TypeAdapter:
+    """TypeAdapter на тип ответа строится один раз: сборка валидатора и сериализатора дорогая."""
+    return TypeAdapter(schema_type)
+
+
+class RawJSONResponse(Response):
+    """JSON-ответ из готовых байтов: FastAPI не валидирует и не перекодирует тело повторно."""
+    media_type = "application/json"
+
+
+def dump_json(data: Any, schema_type: Any) -> bytes:
+    """Одна валидация ORM-объектов по схеме и сериализация сразу в JSON-байты (pydantic-core)."""
+    adapter = type_adapter(schema_type)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+def json_response(data: Any, schema_type: Any, response: Response | None = None,
+                  status_code: int = 200) -> RawJSONResponse:
+    """
+    Ответ для эндпоинтов, отдающих ORM-объекты. Схема в декораторе (response_model) остается
+    для документации, но возвращенный Response FastAPI отдает как есть.
+
+    Args:
+        data: ORM-объект или список объектов
+        schema_type: Тип ответа, например list[SRoomInfo]
+        response: Response из параметров эндпоинта - его заголовки (ETag, курсор, cookie) переносятся в ответ
+        status_code: Код ответа
+    """
+    return raw_json_response(dump_json(data, schema_type), response, status_code)
+
+
+def raw_json_response(body: bytes, response: Response | None = None, status_code: int = 200) -> RawJSONResponse:
+    """
+    Ответ из уже готового JSON (например, собранного БД) с заголовками из Response эндпоинта.
+    Заголовки переносятся списком как есть: повторяющиеся Set-Cookie (access и refresh токены) не схлопываются.
+    """
+    result = RawJSONResponse(body, status_code=status_code)
+    if response is not None:
+        result.raw_headers.extend(
+            (key, value) for key, value in response.raw_headers if key not in (b"content-length", b"content-type")
+        )
+    return result
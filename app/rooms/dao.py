@@ -3,4 +3,5 @@ from app.rooms.models import Room
 
 
 class RoomDAO(BaseDAO):
-    model = Room
\ No newline at end of file
+    model = Room
+    cache_tags = ("rooms",)
@@ -1,28 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.rooms.schemas import SRoomInfo, SRoomFilter, SRoomUpd, SRoomAdd
 from app.rooms.dao import RoomDAO
-from app.dependencies.dao_dep import get_session_with_commit, get_session_without_commit
+from app.dependencies.dao_dep import get_session
 from app.dependencies.auth_dep import get_current_admin_user
+from app.dependencies.pagination_dep import get_page_params
+from app.dependencies.fields_dep import get_fields_schema
+from app.dao.projection import load_fields
+from app.dao.pagination import SPageParams, NEXT_CURSOR_HEADER
+from app.responses import make_etag, not_modified, json_response
 from app.exceptions import RoomNotFound
-from app.users.models import User
+from app.users.schemas import SPrincipal
 
 
 router = APIRouter(prefix="/rooms", tags=["Rooms"])
 
-@router.get("/", summary="Получить все помещения")
-async def get_all_rooms(session: AsyncSession = Depends(get_session_without_commit)) -> list[SRoomInfo]:
+@router.get("/", summary="Получить все помещения", response_model=list[SRoomInfo])
+async def get_all_rooms(request: Request,
+                        response: Response,
+                        page: SPageParams = Depends(get_page_params),
+                        schema: type[SRoomInfo] = Depends(get_fields_schema(SRoomInfo)),
+                        session: AsyncSession = Depends(get_session)) -> Response:
     """
     Возвращает список всех существующих помещений
     Доступ для всех пользователей
+    Поддерживает выбор полей: fields=id,title
+    Поддерживает условный GET: ETag и If-None-Match -> 304
     """
-    return await RoomDAO(session).find_all()
+    room_dao = RoomDAO(session)
+    etag = make_etag(await room_dao.version_stamp(), request.url.query)
+    if cached := not_modified(request, response, etag):
+        return cached
+    rooms, next_cursor = await room_dao.find_page(limit=page.limit, after=page.after,
+                                                  options=load_fields(room_dao.model, schema))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return json_response(rooms, list[schema], response)
 
 @router.post("/", summary="Создать помещение")
 async def create_room(room_data: SRoomAdd,
-                      session: AsyncSession = Depends(get_session_with_commit),
-                      user_data: User = Depends(get_current_admin_user)
+                      session: AsyncSession = Depends(get_session),
+                      user_data: SPrincipal = Depends(get_current_admin_user)
                       ) -> SRoomInfo | dict:
     """
     Создает новое помещение.
@@ -35,56 +54,46 @@ async def create_room(room_data: SRoomAdd,
 
 @router.delete("/{room_id}/", summary="Удалить помешение")
 async def delete_room(room_id: int,
-                      session: AsyncSession = Depends(get_session_with_commit),
-                      user_data: User = Depends(get_current_admin_user)
+                      session: AsyncSession = Depends(get_session),
+                      user_data: SPrincipal = Depends(get_current_admin_user)
                       ) -> dict:
     """
     Удаление конкретного помещения по ID.
     Доступ только у администратора
     """
     room_dao = RoomDAO(session)
-    # Проверка существования помещения
-    room = await room_dao.find_one_or_none_by_id(room_id)
-    if not room:
+    # Удаление одним DELETE ... RETURNING, без предварительного поиска
+    deleted = await room_dao.delete_returning(SRoomFilter(id=room_id))
+    if not deleted:
         raise RoomNotFound
-    # Удаление помещения
-    filters = SRoomFilter(id=room_id)
-    deleted_count = await room_dao.delete(filters=filters)
-    if deleted_count:
-        return {
-            "message": f"Помещение [{room.title}] успешно удалено",
-            "deleted_count": deleted_count,
-            "deleted_room": {
-                "id": room.id,
-                "title": room.title,
-                "capacity": room.capacity
-            }
+    room = deleted[0]
+    return {
+        "message": f"Помещение [{room.title}] успешно удалено",
+        "deleted_count": len(deleted),
+        "deleted_room": {
+            "id": room.id,
+            "title": room.title,
+            "capacity": room.capacity
         }
-    return {"message": "Ошибка при удалении помещения"}
+    }
 
 @router.patch("/{room_id}/", summary="Изменить помещение")
 async def update_room(room_id: int,
                       data: SRoomUpd,
-                      session: AsyncSession = Depends(get_session_with_commit),
-                      user_data: User = Depends(get_current_admin_user)
+                      session: AsyncSession = Depends(get_session),
+                      user_data: SPrincipal = Depends(get_current_admin_user)
                       ) -> SRoomInfo:
     """
     Изменение информации о помещении по ID.
     Доступ только у администратора
     """
     room_dao = RoomDAO(session)
-    # Проверка существования помещения
-    room = await room_dao.find_one_or_none_by_id(room_id)
-    if not room:
-        raise RoomNotFound
-    # Обновление информации о помещении
-    filters = SRoomFilter(id=room_id)
+    # Обновление одним UPDATE ... RETURNING, без поиска до и после
     update_values = SRoomUpd(**data.model_dump(exclude_unset=True))
-    updated_count = await room_dao.update(
-        filters=filters,
+    updated = await room_dao.update_returning(
+        filters=SRoomFilter(id=room_id),
         values=update_values
     )
-    if updated_count == 0:
-        raise HTTPException(status_code=400, detail="Обновление не выполнено")
-    updated = await room_dao.find_one_or_none_by_id(room_id)
-    return SRoomInfo.model_validate(updated)
\ No newline at end of file
+    if not updated:
+        raise RoomNotFound
+    return SRoomInfo.model_validate(updated[0])
\ No newline at end of file
@@ -0,0 +1,71 @@
+import asyncio
+import zlib
+from typing import Awaitable, Callable
+
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.dao.database import engine as default_engine
+
+
+class PeriodicJob:
+    """
+    Периодическая фоновая задача, запускаемая из lifespan приложения.
+
+    Перед каждым запуском задача берет аренду - advisory lock PostgreSQL с ключом
+    от своего имени. Если аренда у другого процесса uvicorn, запуск пропускается,
+    поэтому при нескольких воркерах задача выполняется только в одном из них.
+    Lock сессионный: при падении воркера он освобождается вместе с соединением.
+    """
+
+    def __init__(self, name: str, interval_s: float, func: Callable[[], Awaitable[int]],
+                 engine: AsyncEngine = default_engine):
+        self.name = name
+        self.interval = interval_s
+        self.func = func
+        self.engine = engine
+        self.lock_key = zlib.crc32(name.encode())
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self) -> int | None:
+        """Один запуск под арендой. Возвращает результат задачи или None, если аренда занята."""
+        async with self.engine.connect() as conn:
+            if conn.dialect.name != "postgresql":
+                return await self.func()
+            acquired = await conn.scalar(select(func.pg_try_advisory_lock(self.lock_key)))
+            await conn.commit()
+            if not acquired:
+                logger.info(f"Задача {self.name} уже выполняется в другом процессе")
+                return None
+            try:
+                return await self.func()
+            finally:
+                await conn.execute(select(func.pg_advisory_unlock(self.lock_key)))
+                await conn.commit()
+
+    async def _loop(self):
+        while True:
+            try:
+                result = await self.run_once()
+                if result is not None:
+                    logger.info(f"Задача {self.name} выполнена: {result}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка фоновой задачи {self.name}: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop(), name=self.name)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,154 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+
+from fastapi import Request, Response
+from loguru import logger
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него отдаются gzip и несжатые файлы
+    brotli = None
+
+
+# Файлы с хешем в имени не меняются никогда: браузер не перепроверяет их год
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# index.html и файлы по исходным именам: хранить можно, но каждый раз сверять ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# Отпечатки ставятся только этим файлам: на них ссылается index.html
+FINGERPRINT_SUFFIXES = (".js", ".css")
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+@dataclass
+class Asset:
+    media_type: str
+    digest: str
+    # Кодировка ("identity", "gzip", "br") -> тело
+    variants: dict[str, bytes] = field(default_factory=dict)
+
+
+def _compress(content: bytes, media_type: str) -> dict[str, bytes]:
+    variants = {"identity": content}
+    if not media_type.startswith(COMPRESSIBLE_TYPES):
+        return variants
+    compressed = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed["br"] = brotli.compress(content, quality=11)
+    # Сжатая версия нужна, только если она действительно меньше
+    variants.update({name: body for name, body in compressed.items() if len(body) < len(content)})
+    return variants
+
+
+def _make_asset(content: bytes, media_type: str) -> Asset:
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    return Asset(media_type=media_type, digest=digest, variants=_compress(content, media_type))
+
+
+def _accepted_encodings(request: Request) -> set[str]:
+    header = request.headers.get("accept-encoding", "")
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class StaticAssets:
+    """
+    Фронтенд целиком в памяти. При старте приложения build():
+    - JS/CSS получают имена с хешем содержимого (js/main.3f2a1b9c0d4e.js), ссылки в index.html
+      переписываются на них, такие файлы отдаются с immutable-кэшированием;
+    - текстовые файлы заранее сжимаются gzip и brotli, вариант выбирается по Accept-Encoding;
+    - index.html хранится готовым с ETag, повторная загрузка страницы - 304 без тела.
+    После сборки запросы не обращаются к файловой системе.
+    """
+
+    def __init__(self, directory: str, prefix: str = "/static"):
+        self.directory = directory
+        self.prefix = prefix
+        self._assets: dict[str, Asset] = {}
+        # Исходный путь -> путь с хешем
+        self.manifest: dict[str, str] = {}
+        self._fingerprinted: set[str] = set()
+        self.index: Asset | None = None
+        self._built = False
+
+    def build(self):
+        assets, manifest = {}, {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                if path == "index.html":
+                    continue
+                with open(full_path, "rb") as file:
+                    content = file.read()
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                asset = _make_asset(content, media_type)
+                assets[path] = asset
+                base, ext = os.path.splitext(path)
+                if ext in FINGERPRINT_SUFFIXES:
+                    hashed = f"{base}.{asset.digest[:12]}{ext}"
+                    assets[hashed] = asset
+                    manifest[path] = hashed
+        self._assets, self.manifest = assets, manifest
+        self._fingerprinted = set(manifest.values())
+
+        index_path = os.path.join(self.directory, "index.html")
+        self.index = None
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as file:
+                html = file.read()
+            self.index = _make_asset(self._rewrite_links(html).encode(), "text/html; charset=utf-8")
+        self._built = True
+        logger.info(f"Статика собрана: {len(assets) - len(manifest)} файлов, {len(manifest)} с отпечатком, "
+                    f"brotli: {brotli is not None}")
+
+    def _rewrite_links(self, html: str) -> str:
+        prefix = re.escape(self.prefix.rstrip("/") + "/")
+
+        def replace(match: re.Match) -> str:
+            path = match.group(1)
+            return f"{self.prefix.rstrip('/')}/{self.manifest.get(path, path)}"
+
+        return re.sub(rf"{prefix}([\w./-]+)", replace, html)
+
+    def _ensure_built(self):
+        # Без lifespan (например, в тестах через ASGITransport) сборка выполняется при первом запросе
+        if not self._built:
+            self.build()
+
+    @staticmethod
+    def _respond(request: Request, asset: Asset, cache_control: str) -> Response:
+        accepted = _accepted_encodings(request)
+        encoding = next((name for name in ("br", "gzip") if name in asset.variants and name in accepted), "identity")
+        # У каждой кодировки свое тело, значит и свой ETag
+        etag = f'"{asset.digest}"' if encoding == "identity" else f'"{asset.digest}-{encoding}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(asset.variants[encoding], media_type=asset.media_type, headers=headers)
+
+    def asset_response(self, request: Request, path: str) -> Response:
+        """Файл из каталога фронтенда: по имени с хешем - навсегда, по исходному имени - с проверкой ETag."""
+        self._ensure_built()
+        asset = self._assets.get(path)
+        if asset is None:
+            return Response(status_code=404)
+        immutable = path in self._fingerprinted
+        return self._respond(request, asset, IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL)
+
+    def index_response(self, request: Request) -> Response | None:
+        """index.html из памяти; None, если фронтенда нет."""
+        self._ensure_built()
+        if self.index is None:
+            return None
+        return self._respond(request, self.index, REVALIDATE_CACHE_CONTROL)
@@ -3,4 +3,5 @@ from app.subscriptions.models import Subscription
 
 
 class SubscriptionDAO(BaseDAO):
-    model = Subscription
\ No newline at end of file
+    model = Subscription
+    cache_tags = ("subscriptions",)
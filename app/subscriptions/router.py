@@ -1,29 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.subscriptions.dao import SubscriptionDAO
 from app.subscriptions.schemas import SSubInfo, SSubFilter, SSubUpd, SSubAdd
-from app.dependencies.dao_dep import get_session_with_commit, get_session_without_commit
+from app.dependencies.dao_dep import get_session
 from app.dependencies.auth_dep import get_current_admin_user
+from app.dependencies.pagination_dep import get_page_params
+from app.dependencies.fields_dep import get_fields_schema
+from app.dao.projection import load_fields
+from app.dao.pagination import SPageParams, NEXT_CURSOR_HEADER
+from app.responses import make_etag, not_modified, json_response
 from app.exceptions import SubNotFound
-from app.users.models import User
+from app.users.schemas import SPrincipal
 
 
 router = APIRouter(prefix="/subscriptions", tags=["Subscriptions"])
 
-@router.get("/", summary="Получить все абонементы")
-async def get_all_subscriptions(session: AsyncSession = Depends(get_session_without_commit)
-                                ) -> list[SSubInfo]:
+@router.get("/", summary="Получить все абонементы", response_model=list[SSubInfo])
+async def get_all_subscriptions(request: Request,
+                                response: Response,
+                                page: SPageParams = Depends(get_page_params),
+                                schema: type[SSubInfo] = Depends(get_fields_schema(SSubInfo)),
+                                session: AsyncSession = Depends(get_session)
+                                ) -> Response:
     """
     Возвращает список всех существующих абонементов.
     Доступ у всех
+    Поддерживает выбор полей: fields=id,title
+    Поддерживает условный GET: ETag и If-None-Match -> 304
     """
-    return await SubscriptionDAO(session).find_all()
+    sub_dao = SubscriptionDAO(session)
+    etag = make_etag(await sub_dao.version_stamp(), request.url.query)
+    if cached := not_modified(request, response, etag):
+        return cached
+    subs, next_cursor = await sub_dao.find_page(limit=page.limit, after=page.after,
+                                                options=load_fields(sub_dao.model, schema))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return json_response(subs, list[schema], response)
 
 @router.post("/", summary="Создать абонемент")
 async def create_subscription(sub_data: SSubAdd,
-                              session: AsyncSession = Depends(get_session_with_commit),
-                              user_data: User = Depends(get_current_admin_user)
+                              session: AsyncSession = Depends(get_session),
+                              user_data: SPrincipal = Depends(get_current_admin_user)
                               ) -> SSubInfo | dict:
     """
     Создает новый абонемент.
@@ -36,57 +55,47 @@ async def create_subscription(sub_data: SSubAdd,
 
 @router.delete("/{sub_id}/", summary="Удалить абонемент по ID")
 async def delete_sub(sub_id: int,
-                      session: AsyncSession = Depends(get_session_with_commit),
-                      user_data: User = Depends(get_current_admin_user)
+                      session: AsyncSession = Depends(get_session),
+                      user_data: SPrincipal = Depends(get_current_admin_user)
                       ) -> dict:
     """
     Удаление конкретного абонемента по ID.
     Доступ только у администратора
     """
     sub_dao = SubscriptionDAO(session)
-    # Проверка существования абонемента
-    sub = await sub_dao.find_one_or_none_by_id(sub_id)
-    if not sub:
+    # Удаление одним DELETE ... RETURNING, без предварительного поиска
+    deleted = await sub_dao.delete_returning(SSubFilter(id=sub_id))
+    if not deleted:
         raise SubNotFound
-    # Удаление абонемента
-    filters = SSubFilter(id=sub_id)
-    deleted_count = await sub_dao.delete(filters=filters)
-    if deleted_count:
-        return {
-            "message": f"Абонемент [{sub.title}] успешно удален",
-            "deleted_count": deleted_count,
-            "deleted_sub": {
-                "id": sub.id,
-                "title": sub.title,
-                "price": sub.price,
-                "duration_days": sub.duration_days,
-            }
+    sub = deleted[0]
+    return {
+        "message": f"Абонемент [{sub.title}] успешно удален",
+        "deleted_count": len(deleted),
+        "deleted_sub": {
+            "id": sub.id,
+            "title": sub.title,
+            "price": sub.price,
+            "duration_days": sub.duration_days,
         }
-    return {"message": "Ошибка при удалении абонемента"}
+    }
 
 @router.patch("/{sub_id}/", summary="Изменить абонемент по ID")
 async def update_sub(sub_id: int,
                       data: SSubUpd,
-                      session: AsyncSession = Depends(get_session_with_commit),
-                      user_data: User = Depends(get_current_admin_user)
+                      session: AsyncSession = Depends(get_session),
+                      user_data: SPrincipal = Depends(get_current_admin_user)
                       ) -> SSubInfo:
     """
     Изменение информации об абонемента по ID.
     Доступ только у администратора
     """
     sub_dao = SubscriptionDAO(session)
-    # Проверка существования абонемента
-    sub = await sub_dao.find_one_or_none_by_id(sub_id)
-    if not sub:
-        raise SubNotFound
-    # Обновление информации об абонементе
-    filters = SSubFilter(id=sub_id)
+    # Обновление одним UPDATE ... RETURNING, без поиска до и после
     update_values = SSubUpd(**data.model_dump(exclude_unset=True))
-    updated_count = await sub_dao.update(
-        filters=filters,
+    updated = await sub_dao.update_returning(
+        filters=SSubFilter(id=sub_id),
         values=update_values
     )
-    if updated_count == 0:
-        raise HTTPException(status_code=400, detail="Обновление не выполнено")
-    updated = await sub_dao.find_one_or_none_by_id(sub_id)
-    return SSubInfo.model_validate(updated)
\ No newline at end of file
+    if not updated:
+        raise SubNotFound
+    return SSubInfo.model_validate(updated[0])
\ No newline at end of file
@@ -1,15 +1,41 @@
 from app.dao.base import BaseDAO
-from app.trainings.models import Training
-from app.bookings.models import Booking
+from app.trainings.models import (Training, TrainingArchive, ROOM_PERIOD_CONSTRAINT, TRAINER_PERIOD_CONSTRAINT,
+                                  TIME_ORDER_CONSTRAINT)
+from app.trainings.schemas import (STrainingFilter, STrainingSeriesAdd, STrainingOccurrence, STrainingInfo,
+                                   STrainingSearch)
+from app.rooms.schemas import SRoomInfo
+from app.users.schemas import SUserShort
+from app.dao.json_render import json_document
+from app.dao.projection import load_fields
+from app.bookings.models import Booking, BookingArchive
+from app.rooms.models import Room
+from app.users.models import User, Role, user_full_name
 
-from sqlalchemy import select, and_, or_
+from pydantic import BaseModel
+from sqlalchemy import select, insert, delete, or_, exists, case, literal, null
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 from loguru import logger
 from datetime import date, time
+from typing import Sequence
+
+
+class ScheduleConflict:
+    NOT_FOUND = "not_found"
+    TRAINER_NOT_FOUND = "trainer_not_found"
+    ROOM_NOT_FOUND = "room_not_found"
+    ROOM = "room"
+    TRAINER = "trainer"
+    TIME_ORDER = "time_order"
+
+
+SCHEDULE_FIELDS = ("date", "start_time", "end_time", "room_id", "trainer_id")
 
 
 class TrainingDAO(BaseDAO):
     model = Training
+    # В ответы входят помещения, тренеры и счетчик записей, который меняет триггер на bookings
+    cache_tags = ("trainings", "rooms", "users", "bookings")
 
     async def find_all(self, **filter_by):
         """Переопределяем find_all для загрузки room, trainer и bookings relationships"""
@@ -24,7 +50,7 @@ class TrainingDAO(BaseDAO):
                     selectinload(self.model.bookings)
                 )
             )
-            result = await self._session.execute(query)
+            result = await self._execute(query)
             records = result.scalars().all()
             logger.info(f"Найдено {len(records)} записей.")
             return records
@@ -32,6 +58,88 @@ class TrainingDAO(BaseDAO):
             logger.error(f"Ошибка при поиске всех записей {self.model.__name__}: {e}")
             raise
 
+    async def find_upcoming_page(self, limit: int | None = None, after: str | None = None,
+                                 schema: type[BaseModel] = STrainingInfo):
+        """
+        Страница предстоящих тренировок (начиная с сегодняшней) в порядке даты и времени начала.
+        Фильтр по дате выполняется в SQL, количество записей берется из счетчика booking_count.
+        Из БД читаются только колонки полей schema (см. partial_schema), у тренера - без пароля.
+        """
+        order_by = ("date", "start_time", "id")
+        return await self.find_page(
+            limit=limit,
+            after=after,
+            order_by=order_by,
+            conditions=[self.model.date >= date.today()],
+            options=load_fields(self.model, schema, include=order_by)
+        )
+
+    async def search_page(self, search: STrainingSearch, limit: int | None = None, after: str | None = None,
+                          schema: type[BaseModel] = STrainingInfo):
+        """
+        Страница тренировок по фильтрам поиска в том же порядке и с тем же курсором, что find_upcoming_page.
+        Каждый фильтр - условие SQL на индексе: период и время дня - ix_trainings_date_start_time,
+        помещение и тренер - (room_id, date) и (trainer_id, date), текст - триграммные GIN-индексы
+        по названию, описанию и полному имени тренера (тренеры с подходящим именем - подзапрос по users).
+        Свободные места сравниваются со вместимостью помещения уже на отобранных строках.
+        """
+        conditions = [self.model.date >= (search.date_from or date.today())]
+        if search.date_to:
+            conditions.append(self.model.date <= search.date_to)
+        if search.room_id is not None:
+            conditions.append(self.model.room_id == search.room_id)
+        if search.trainer_id is not None:
+            conditions.append(self.model.trainer_id == search.trainer_id)
+        if search.time_from:
+            conditions.append(self.model.start_time >= search.time_from)
+        if search.time_to:
+            conditions.append(self.model.end_time <= search.time_to)
+        if search.has_free_spots is not None:
+            capacity = select(Room.capacity).where(Room.id == self.model.room_id).scalar_subquery()
+            conditions.append(
+                self.model.booking_count < capacity if search.has_free_spots else self.model.booking_count >= capacity)
+        if search.q:
+            # ILIKE в Postgres, lower() LIKE в SQLite; % и _ в запросе экранируются
+            trainers = select(User.id).where(user_full_name.icontains(search.q, autoescape=True))
+            conditions.append(or_(self.model.title.icontains(search.q, autoescape=True),
+                                  self.model.description.icontains(search.q, autoescape=True),
+                                  self.model.trainer_id.in_(trainers)))
+        logger.info(f"Поиск тренировок: {search.model_dump(exclude_none=True)}")
+        order_by = ("date", "start_time", "id")
+        return await self.find_page(
+            limit=limit,
+            after=after,
+            order_by=order_by,
+            conditions=conditions,
+            options=load_fields(self.model, schema, include=order_by)
+        )
+
+    async def find_upcoming_page_json(self, limit: int | None = None, after: str | None = None,
+                                      schema: type[BaseModel] = STrainingInfo):
+        """Та же страница, что find_upcoming_page, но в виде готового JSON по схеме schema."""
+        joins = []
+        if "room" in schema.model_fields:
+            joins.append((Room, Room.id == Training.room_id))
+        if "trainer" in schema.model_fields:
+            joins.append((User, User.id == Training.trainer_id))
+        return await self.find_page_json(
+            document=json_document(
+                schema, Training,
+                room=json_document(SRoomInfo, Room),
+                trainer=json_document(SUserShort, User),
+            ),
+            joins=joins,
+            limit=limit,
+            after=after,
+            order_by=("date", "start_time", "id"),
+            conditions=[self.model.date >= date.today()],
+        )
+
+    async def upcoming_version_stamp(self) -> str:
+        """Версия списка предстоящих тренировок: сами тренировки, их помещения и тренеры."""
+        stamp = await self.version_stamp(conditions=[self.model.date >= date.today()], related=[Room, User])
+        return f"{date.today()}:{stamp}"
+
     async def find_one_or_none_by_id(self, data_id: int):
         """Переопределяем find_one_or_none_by_id для загрузки room, trainer и bookings relationships"""
         logger.info(f"Поиск записи {self.model.__name__} по ID: {data_id}")
@@ -45,7 +153,7 @@ class TrainingDAO(BaseDAO):
                     selectinload(self.model.bookings)
                 )
             )
-            result = await self._session.execute(query)
+            result = await self._execute(query)
             record = result.scalar_one_or_none()
             if record:
                 logger.info(f"Запись {self.model.__name__} с ID {data_id} найдена.")
@@ -67,7 +175,7 @@ class TrainingDAO(BaseDAO):
                     selectinload(self.model.room)
                 )
             )
-            result = await self._session.execute(query)
+            result = await self._execute(query)
             trainings = result.scalars().all()
             logger.info(f"Найдено {len(trainings)} тренировок для тренера {trainer_id}")
             return trainings
@@ -75,94 +183,276 @@ class TrainingDAO(BaseDAO):
             logger.error(f"Ошибка при поиске тренировок тренера {trainer_id}: {e}")
             raise
 
-    async def check_time_conflicts(
+    async def validate_schedule(self, values: dict, training_id: int | None = None,
+                                conditions: Sequence = ()) -> str | None:
+        """
+        Проверяет расписание одним запросом: тренер существует и имеет роль trainer, помещение
+        существует, время не пересекается с другими тренировками помещения и тренера.
+        Проверяются только переданные в values поля; пересечения - при обновлении любого
+        из полей расписания или при создании с датой и временем.
+
+        При обновлении (training_id) недостающие значения берутся из текущей строки
+        в CTE current_training, без отдельного чтения тренировки. Строка, не прошедшая conditions
+        (например, чужая для тренера), считается ненайденной.
+
+        Returns:
+            str | None: Код ScheduleConflict первой найденной проблемы в порядке
+            not_found, time_order, trainer_not_found, room_not_found, room, trainer; None - можно записывать
+        """
+        checked = {field: values[field] for field in SCHEDULE_FIELDS if field in values}
+        if not checked:
+            return None
+        logger.info(f"Проверка расписания тренировки {training_id or 'новой'}: {checked}")
+        try:
+            current = None
+            if training_id is not None:
+                current = (
+                    select(*[self.model.__table__.c[field] for field in SCHEDULE_FIELDS])
+                    .where(self.model.id == training_id, *conditions)
+                    .cte("current_training")
+                )
+
+            def value(field: str):
+                if field in checked:
+                    return literal(checked[field], type_=self.model.__table__.c[field].type)
+                return select(current.c[field]).scalar_subquery()
+
+            whens = []
+            if current is not None:
+                whens.append((~exists(select(current.c.room_id)), ScheduleConflict.NOT_FOUND))
+                # Новая граница сравнивается с сохраненной второй границей
+                if {"start_time", "end_time"} & checked.keys():
+                    whens.append((value("start_time") >= value("end_time"), ScheduleConflict.TIME_ORDER))
+            if "trainer_id" in checked:
+                trainer_exists = exists().where(
+                    User.id == value("trainer_id"), User.role_id == Role.id, Role.name == "trainer")
+                whens.append((~trainer_exists, ScheduleConflict.TRAINER_NOT_FOUND))
+            if "room_id" in checked:
+                whens.append((~exists().where(Room.id == value("room_id")), ScheduleConflict.ROOM_NOT_FOUND))
+            # Новой тренировке нужны все поля расписания; проверка только тренера и помещения (серии) - без них
+            if current is not None or {"date", "start_time", "end_time"} <= checked.keys():
+                room_id = value("room_id")
+                overlaps = select(self.model.room_id).where(
+                    self.model.date == value("date"),
+                    or_(self.model.room_id == room_id, self.model.trainer_id == value("trainer_id")),
+                    # Полуоткрытые интервалы пересекаются, если каждый начинается раньше конца другого
+                    self.model.start_time < value("end_time"),
+                    self.model.end_time > value("start_time"),
+                )
+                if training_id is not None:
+                    overlaps = overlaps.where(self.model.id != training_id)
+                overlaps = overlaps.cte("overlaps")
+                # Конфликт по помещению важнее конфликта по тренеру
+                whens.append((exists().where(overlaps.c.room_id == room_id), ScheduleConflict.ROOM))
+                whens.append((exists(select(overlaps.c.room_id)), ScheduleConflict.TRAINER))
+
+            query = select(case(*whens, else_=null()))
+            conflict = (await self._session.execute(query)).scalar()
+            if conflict:
+                logger.warning(f"Проверка расписания не пройдена: {conflict}")
+            return conflict
+        except Exception as e:
+            logger.error(f"Ошибка при проверке расписания: {e}")
+            raise
+
+    async def add_validated(self, values: BaseModel) -> tuple[Training | None, str | None]:
+        """
+        Создает тренировку: одна проверка validate_schedule и один INSERT ... RETURNING,
+        связи room и trainer для ответа подгружаются сразу.
+        Возвращает кортеж: (тренировка | None, код ScheduleConflict | None)
+
+        В Postgres гонку между проверкой и вставкой ловят ограничения-исключения;
+        после такого конфликта транзакция прервана - вызывающий код должен ее откатить.
+        """
+        conflict = await self.validate_schedule(values.model_dump())
+        if conflict:
+            return None, conflict
+        options = [selectinload(self.model.room), selectinload(self.model.trainer)]
+        try:
+            return await self.add_returning(values, options=options), None
+        except IntegrityError as e:
+            conflict_type = self._conflict_from_error(e)
+            if conflict_type is None:
+                raise
+            logger.warning(f"Конфликт по ограничению БД: {conflict_type}")
+            return None, conflict_type
+
+    @staticmethod
+    def _conflict_from_error(error: IntegrityError) -> str | None:
+        """Определяет тип конфликта по имени нарушенного ограничения-исключения или CHECK."""
+        message = str(error.orig)
+        if TIME_ORDER_CONSTRAINT in message:
+            return ScheduleConflict.TIME_ORDER
+        if ROOM_PERIOD_CONSTRAINT in message:
+            return ScheduleConflict.ROOM
+        if TRAINER_PERIOD_CONSTRAINT in message:
+            return ScheduleConflict.TRAINER
+        return None
+
+    async def update_returning_without_conflicts(self, training_id: int, values: BaseModel,
+                                                 conditions: Sequence = ()) -> tuple[Training | None, str | None]:
+        """
+        Обновляет тренировку одним UPDATE ... RETURNING и возвращает ее вместе с помещением и тренером.
+        Возвращает кортеж: (тренировка | None, код ScheduleConflict | None).
+        None без конфликта - тренировки нет или она не прошла conditions (например, чужая для тренера).
+
+        Тренер, помещение, порядок времени и пересечения проверяет validate_schedule (тот же запрос,
+        что при создании), и только если меняются поля расписания. В Postgres гонку между проверкой
+        и обновлением ловят ограничения-исключения; после такого конфликта транзакция прервана.
+        """
+        conflict = await self.validate_schedule(values.model_dump(exclude_unset=True), training_id=training_id,
+                                                conditions=conditions)
+        if conflict == ScheduleConflict.NOT_FOUND:
+            return None, None
+        if conflict:
+            return None, conflict
+        filters = STrainingFilter(id=training_id)
+        options = [selectinload(self.model.room), selectinload(self.model.trainer)]
+        try:
+            updated = await self.update_returning(filters, values, conditions=conditions, options=options)
+        except IntegrityError as e:
+            conflict_type = self._conflict_from_error(e)
+            if conflict_type is None:
+                raise
+            logger.warning(f"Конфликт по ограничению БД: {conflict_type}")
+            return None, conflict_type
+        return (updated[0] if updated else None), None
+
+    async def find_series_conflicts(
         self,
         room_id: int,
         trainer_id: int,
-        training_date: date,
+        dates: list[date],
         start_time: time,
-        end_time: time,
-        exclude_training_id: int = None
-    ) -> tuple[bool, str | None]:
+        end_time: time
+    ) -> dict[date, str]:
         """
-        Проверяет конфликты времени для помещения И тренера одним запросом.
-        Возвращает кортеж: (есть_конфликт: bool, тип_конфликта: str | None)
-
-        Типы конфликтов:
-        - "room" - помещение занято
-        - "trainer" - тренер занят
-        - None - конфликтов нет
+        Проверяет все даты серии одним запросом.
+        Возвращает словарь {дата: "room" | "trainer"} только для дат с конфликтом.
         """
         logger.info(
-            f"Проверка конфликтов для помещения {room_id} и тренера {trainer_id} "
-            f"на {training_date} с {start_time} до {end_time}"
+            f"Проверка конфликтов серии: помещение {room_id}, тренер {trainer_id}, "
+            f"{len(dates)} дат с {start_time} до {end_time}"
         )
+        if not dates:
+            return {}
         try:
-            # Создаем условие пересечения временных интервалов
-            time_overlap = or_(
-                # Новая тренировка начинается во время существующей
-                and_(
-                    self.model.start_time <= start_time,
-                    self.model.end_time > start_time
-                ),
-                # Новая тренировка заканчивается во время существующей
-                and_(
-                    self.model.start_time < end_time,
-                    self.model.end_time >= end_time
+            query = select(self.model.date, self.model.room_id).where(
+                self.model.date.in_(dates),
+                or_(
+                    self.model.room_id == room_id,
+                    self.model.trainer_id == trainer_id
                 ),
-                # Новая тренировка полностью покрывает существующую
-                and_(
-                    self.model.start_time >= start_time,
-                    self.model.end_time <= end_time
-                )
+                # Полуоткрытые интервалы пересекаются, если каждый начинается раньше конца другого
+                self.model.start_time < end_time,
+                self.model.end_time > start_time
             )
+            result = await self._session.execute(query)
+            conflicts: dict[date, str] = {}
+            for training_date, training_room_id in result.all():
+                # Конфликт по помещению важнее конфликта по тренеру
+                if training_room_id == room_id:
+                    conflicts[training_date] = "room"
+                else:
+                    conflicts.setdefault(training_date, "trainer")
+            logger.info(f"Конфликтов в серии: {len(conflicts)}")
+            return conflicts
+        except Exception as e:
+            logger.error(f"Ошибка при проверке конфликтов серии: {e}")
+            raise
 
-            # Ищем конфликты по помещению ИЛИ тренеру одним запросом
-            query = select(self.model).where(
-                and_(
-                    self.model.date == training_date,
-                    or_(
-                        self.model.room_id == room_id,
-                        self.model.trainer_id == trainer_id
-                    ),
-                    time_overlap
-                )
-            )
+    async def add_series(self, series: STrainingSeriesAdd) -> tuple[list[STrainingOccurrence], str | None]:
+        """
+        Создает серию тренировок: одна проверка конфликтов на все даты и одна пачка INSERT
+        для свободных дат.
+        Возвращает кортеж: (результат по каждой дате, тип_конфликта при гонке с другой записью | None)
+        """
+        occurrences = series.occurrences()
+        conflicts = await self.find_series_conflicts(
+            room_id=series.room_id,
+            trainer_id=series.trainer_id,
+            dates=[item.date for item in occurrences],
+            start_time=series.start_time,
+            end_time=series.end_time
+        )
+        free = [item for item in occurrences if item.date not in conflicts]
+        try:
+            created = await self.add_many(free) if free else []
+        except IntegrityError as e:
+            # Между проверкой и вставкой кто-то занял время - сработало ограничение-исключение
+            conflict_type = self._conflict_from_error(e)
+            if conflict_type is None:
+                raise
+            return [], conflict_type
 
-            # Если редактируем существующую тренировку, исключаем её из проверки
-            if exclude_training_id:
-                query = query.where(self.model.id != exclude_training_id)
+        created_by_date = {training.date: training.id for training in created}
+        report = []
+        for item in occurrences:
+            if item.date in conflicts:
+                report.append(STrainingOccurrence(date=item.date, status=f"{conflicts[item.date]}_conflict"))
+            else:
+                report.append(STrainingOccurrence(
+                    date=item.date, status="created", training_id=created_by_date[item.date]))
+        return report, None
 
-            result = await self._session.execute(query)
-            conflicting_trainings = result.scalars().all()
-
-            if not conflicting_trainings:
-                logger.info("Конфликтов не обнаружено")
-                return False, None
-
-            # Проверяем приоритет конфликтов: сначала помещение, потом тренер
-            for training in conflicting_trainings:
-                if training.room_id == room_id:
-                    logger.warning(
-                        f"Конфликт помещения: тренировка '{training.title}' "
-                        f"уже занимает помещение {room_id} на {training_date} "
-                        f"с {training.start_time} до {training.end_time}"
-                    )
-                    return True, "room"
-
-            # Если конфликта по помещению нет, проверяем тренера
-            for training in conflicting_trainings:
-                if training.trainer_id == trainer_id:
-                    logger.warning(
-                        f"Конфликт тренера: тренер {trainer_id} уже ведет тренировку '{training.title}' "
-                        f"на {training_date} с {training.start_time} до {training.end_time}"
-                    )
-                    return True, "trainer"
-
-            # Не должны сюда попасть, но на всякий случай
-            logger.info("Конфликтов не обнаружено")
-            return False, None
+    async def archive_past(self, before: date, batch_size: int = 1000) -> tuple[int, int]:
+        """
+        Переносит пачку тренировок с датой раньше before и их записи в trainings_archive
+        и bookings_archive. Строки копируются как есть (id, счетчик мест, даты создания),
+        затем удаляются из рабочих таблиц - все в транзакции вызывающего кода.
 
+        Returns:
+            tuple[int, int]: (перенесено тренировок, перенесено записей)
+        """
+        logger.info(f"Архивация тренировок раньше {before}, пачка {batch_size}")
+        try:
+            ids = (await self._session.execute(
+                select(self.model.id).where(self.model.date < before).order_by(self.model.id).limit(batch_size)
+            )).scalars().all()
+            if not ids:
+                return 0, 0
+            await self._invalidate(extra_tags=(Booking.__tablename__,))
+            trainings, bookings = self.model.__table__, Booking.__table__
+            # Сначала копии: триггер на удаление записей меняет booking_count, а в архив идет исходный
+            await self._session.execute(
+                insert(TrainingArchive.__table__).from_select(
+                    [column.name for column in trainings.c], select(trainings).where(trainings.c.id.in_(ids)))
+            )
+            moved_bookings = await self._session.execute(
+                insert(BookingArchive.__table__).from_select(
+                    [column.name for column in bookings.c], select(bookings).where(bookings.c.training_id.in_(ids)))
+            )
+            await self._session.execute(delete(bookings).where(bookings.c.training_id.in_(ids)))
+            await self._session.execute(delete(trainings).where(trainings.c.id.in_(ids)))
+            logger.info(f"В архив перенесено {len(ids)} тренировок и {moved_bookings.rowcount} записей")
+            return len(ids), moved_bookings.rowcount
+        except Exception as e:
+            logger.error(f"Ошибка при архивации тренировок: {e}")
+            raise
+
+    async def find_history(self, date_from: date, date_to: date, trainer_id: int | None = None) -> list:
+        """
+        Тренировки за период вместе с архивом - для отчетов: рабочая таблица и trainings_archive
+        читаются отдельными запросами, каждый по своим индексам.
+
+        Returns:
+            list: Объекты Training и TrainingArchive с room и trainer, по дате и времени начала
+        """
+        logger.info(f"Поиск тренировок с архивом за период {date_from} - {date_to}, тренер {trainer_id}")
+        try:
+            records = []
+            for model in (TrainingArchive, self.model):
+                query = (
+                    select(model)
+                    .where(model.date >= date_from, model.date <= date_to)
+                    .options(selectinload(model.room), selectinload(model.trainer))
+                )
+                if trainer_id is not None:
+                    query = query.where(model.trainer_id == trainer_id)
+                records.extend((await self._session.execute(query)).scalars().all())
+            records.sort(key=lambda training: (training.date, training.start_time, training.id))
+            logger.info(f"Найдено {len(records)} тренировок.")
+            return records
         except Exception as e:
-            logger.error(f"Ошибка при проверке конфликтов: {e}")
+            logger.error(f"Ошибка при поиске тренировок с архивом: {e}")
             raise
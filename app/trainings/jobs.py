@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import settings
+from app.dao.database import async_session_maker
+from app.trainings.dao import TrainingDAO
+from app.scheduler import PeriodicJob
+
+
+async def archive_trainings(session_maker: async_sessionmaker = async_session_maker,
+                            after_days: int = settings.TRAINING_ARCHIVE_AFTER_DAYS,
+                            batch_size: int = settings.TRAINING_ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Переносит тренировки старше after_days дней вместе с записями в архивные таблицы
+    пачками, каждая в своей короткой транзакции.
+    Возвращает общее количество перенесенных тренировок.
+    """
+    before = date.today() - timedelta(days=after_days)
+    total = 0
+    while True:
+        async with session_maker() as session:
+            count, _ = await TrainingDAO(session).archive_past(before, batch_size=batch_size)
+            await session.commit()
+        total += count
+        if count < batch_size:
+            break
+    logger.info(f"Всего в архив перенесено {total} тренировок раньше {before}")
+    return total
+
+
+training_archive_job = PeriodicJob(
+    name="archive_trainings",
+    interval_s=settings.TRAINING_ARCHIVE_INTERVAL_S,
+    func=archive_trainings,
+)
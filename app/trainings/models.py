@@ -1,9 +1,17 @@
-from sqlalchemy import ForeignKey, Text
+from sqlalchemy import ForeignKey, Text, Index, CheckConstraint, text
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import time, date
 from app.dao.database import Base
 
 
+ROOM_PERIOD_CONSTRAINT = "ex_trainings_room_period"
+TRAINER_PERIOD_CONSTRAINT = "ex_trainings_trainer_period"
+TIME_ORDER_CONSTRAINT = "ck_trainings_time_order"
+# Полуоткрытый интервал [начало, конец): тренировки "встык" не пересекаются
+TRAINING_PERIOD = text("tsrange(date + start_time, date + end_time)")
+
+
 class Training(Base):
     __tablename__ = "trainings"
 
@@ -14,11 +22,68 @@ class Training(Base):
     end_time: Mapped[time]
     trainer_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     room_id: Mapped[int] = mapped_column(ForeignKey("rooms.id", ondelete="CASCADE"))
-    
+    # Счетчик занятых мест. Поддерживается триггерами на bookings (см. app/bookings/models.py)
+    booking_count: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+
+    __table_args__ = (
+        # Список предстоящих тренировок: WHERE date >= today ORDER BY date, start_time, id
+        Index("ix_trainings_date_start_time", "date", "start_time", "id"),
+        # Проверка пересечений по помещению и тренеру в конкретный день
+        Index("ix_trainings_room_id_date", "room_id", "date"),
+        Index("ix_trainings_trainer_id_date", "trainer_id", "date"),
+        # Поиск подстроки (ILIKE '%...%') в названии и описании: GIN-индексы по триграммам (pg_trgm)
+        Index("ix_trainings_title_trgm", "title", postgresql_using="gin",
+              postgresql_ops={"title": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_trainings_description_trgm", "description", postgresql_using="gin",
+              postgresql_ops={"description": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        # Пустой или перевернутый интервал: tsrange упал бы с ошибкой данных, а пустой ни с чем не пересекается.
+        # CHECK проверяется раньше ограничений-исключений
+        CheckConstraint("start_time < end_time", name=TIME_ORDER_CONSTRAINT),
+        # Запрет пересечений на уровне БД (GiST, расширение btree_gist). В SQLite их нет,
+        # там пересечения проверяет TrainingDAO.validate_schedule
+        ExcludeConstraint(
+            ("room_id", "="), (TRAINING_PERIOD, "&&"),
+            name=ROOM_PERIOD_CONSTRAINT, using="gist",
+        ).ddl_if(dialect="postgresql"),
+        ExcludeConstraint(
+            ("trainer_id", "="), (TRAINING_PERIOD, "&&"),
+            name=TRAINER_PERIOD_CONSTRAINT, using="gist",
+        ).ddl_if(dialect="postgresql"),
+    )
+
     room: Mapped["Room"] = relationship(back_populates="trainings") # type: ignore
     trainer: Mapped["User"] = relationship(back_populates="trainings") # type: ignore
     bookings: Mapped[list["Booking"]] = relationship(back_populates="training", cascade="all, delete-orphan") # type: ignore
 
     def __repr__(self):
         return (f"{self.__class__.__name__}(id={self.id}, title={self.title}, description={self.description}, "
-                f"date={self.date}, start_time={self.start_time}, end_time={self.end_time})")
\ No newline at end of file
+                f"date={self.date}, start_time={self.start_time}, end_time={self.end_time})")
+
+class TrainingArchive(Base):
+    """
+    Прошедшие тренировки старше горизонта архивации (см. app/trainings/jobs.py).
+    Те же колонки, что у trainings, но без ограничений-исключений и индексов расписания:
+    прошлое не бронируется и не пересекается, а рабочая таблица и ее индексы остаются маленькими.
+    """
+    __tablename__ = "trainings_archive"
+
+    title: Mapped[str]
+    description: Mapped[str] = mapped_column(Text)
+    date: Mapped[date]
+    start_time: Mapped[time]
+    end_time: Mapped[time]
+    trainer_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.id", ondelete="CASCADE"))
+    booking_count: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+
+    __table_args__ = (
+        # Отчеты по тренеру и периоду
+        Index("ix_trainings_archive_trainer_id_date", "trainer_id", "date"),
+        Index("ix_trainings_archive_date", "date"),
+    )
+
+    room: Mapped["Room"] = relationship() # type: ignore
+    trainer: Mapped["User"] = relationship() # type: ignore
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(id={self.id}, title={self.title}, date={self.date})"
@@ -1,90 +1,137 @@
+from fastapi import APIRouter, Depends, Query, Request, Response
 from datetime import date
-
-from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.trainings.dao import TrainingDAO
+from app.trainings.dao import TrainingDAO, ScheduleConflict
+from app.trainings.models import Training
 from app.trainings.schemas import (STrainingInfo, STrainingAdd, STrainingFilter, STrainingUpd, 
-                                   STrainingWithBookings)
-from app.dependencies.dao_dep import get_session_with_commit, get_session_without_commit
+                                   STrainingWithBookings, STrainingSeriesAdd, STrainingSeriesResult,
+                                   STrainingSearch)
+from app.dependencies.dao_dep import get_session
 from app.dependencies.auth_dep import get_current_trainer_admin_user, get_current_trainer_user
+from app.dependencies.pagination_dep import get_page_params
+from app.dependencies.fields_dep import get_fields_schema
+from app.dependencies.search_dep import get_training_search
+from app.dao.pagination import SPageParams, NEXT_CURSOR_HEADER
+from app.responses import make_etag, not_modified, json_response, raw_json_response
+from app.config import settings
 from app.exceptions import (TrainingNotFound, TrainingForbiddenException, TrainerNotFound,
-                            RoomNotFound, RoomTimeConflictException, TrainerTimeConflictException)
-from app.users.models import User
-from app.users.dao import UsersDAO
-from app.rooms.dao import RoomDAO
+                            RoomNotFound, RoomTimeConflictException, TrainerTimeConflictException,
+                            TrainingTimeOrderException)
+from app.users.schemas import SPrincipal
 
 
 router = APIRouter(prefix="/trainings", tags=["Trainings"])
 
-@router.get("/", summary="Получить все тренировки")
-async def get_all_trainings(session: AsyncSession = Depends(get_session_without_commit)
-                            ) -> list[STrainingInfo]:
+
+# Код проверки расписания -> ответ клиенту
+SCHEDULE_EXCEPTIONS = {
+    ScheduleConflict.TRAINER_NOT_FOUND: TrainerNotFound,
+    ScheduleConflict.ROOM_NOT_FOUND: RoomNotFound,
+    ScheduleConflict.ROOM: RoomTimeConflictException,
+    ScheduleConflict.TRAINER: TrainerTimeConflictException,
+    ScheduleConflict.TIME_ORDER: TrainingTimeOrderException,
+}
+
+
+def _owner_conditions(user_data: SPrincipal) -> list:
+    """Условия на изменение тренировки: админу доступна любая, тренеру - только своя."""
+    if user_data.role.name == "admin":
+        return []
+    return [Training.trainer_id == user_data.id]
+
+@router.get("/", summary="Получить все тренировки", response_model=list[STrainingInfo])
+async def get_all_trainings(request: Request,
+                            response: Response,
+                            page: SPageParams = Depends(get_page_params),
+                            schema: type[STrainingInfo] = Depends(get_fields_schema(STrainingInfo)),
+                            session: AsyncSession = Depends(get_session)
+                            ) -> Response:
+    """
+    Возвращает список будущих и сегодняшних тренировок.
+    Поддерживает постраничную выдачу: limit/after, курсор следующей страницы в заголовке X-Next-Cursor.
+    Поддерживает выбор полей: fields=id,title,date,start_time,booking_count - из БД читаются только они.
+    Поддерживает условный GET: ETag и If-None-Match -> 304.
+    Доступ у всех
     """
-    Возвращает список всех существующих тренировок.
+    training_dao = TrainingDAO(session)
+    etag = make_etag(await training_dao.upcoming_version_stamp(), request.url.query)
+    if cached := not_modified(request, response, etag):
+        return cached
+    if settings.DB_JSON_RENDERING:
+        body, next_cursor = await training_dao.find_upcoming_page_json(limit=page.limit, after=page.after,
+                                                                       schema=schema)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return raw_json_response(body, response)
+    trainings, next_cursor = await training_dao.find_upcoming_page(limit=page.limit, after=page.after, schema=schema)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    # booking_count - счетчик в самой тренировке, записи не загружаются
+    return json_response(trainings, list[schema], response)
+
+@router.get("/search/", summary="Поиск тренировок", response_model=list[STrainingInfo])
+async def search_trainings(response: Response,
+                           search: STrainingSearch = Depends(get_training_search),
+                           page: SPageParams = Depends(get_page_params),
+                           schema: type[STrainingInfo] = Depends(get_fields_schema(STrainingInfo)),
+                           session: AsyncSession = Depends(get_session)
+                           ) -> Response:
+    """
+    Тренировки по фильтрам: период (по умолчанию с сегодняшнего дня), помещение, тренер,
+    окно времени дня, наличие свободных мест и подстрока в названии, описании или имени тренера (q).
+    Фильтрация выполняется в БД по индексам; постраничная выдача и выбор полей - как у GET /trainings/.
     Доступ у всех
     """
-    trainings = await TrainingDAO(session).find_all()
-    today = date.today()
-
-    # Фильтруем тренировки: показываем только будущие и сегодняшние
-    # Добавляем booking_count для каждой тренировки
-    result = []
-    for training in trainings:
-        if training.date >= today:  # Только будущие тренировки
-            training_dict = STrainingInfo.model_validate(training).model_dump()
-            training_dict['booking_count'] = len(training.bookings)
-            result.append(STrainingInfo(**training_dict))
-    return result
-
-@router.post("/", summary="Создать тренировку")
+    trainings, next_cursor = await TrainingDAO(session).search_page(search, limit=page.limit, after=page.after,
+                                                                    schema=schema)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return json_response(trainings, list[schema], response)
+
+@router.post("/", summary="Создать тренировку", response_model=STrainingInfo)
 async def create_training(training_data: STrainingAdd,
-                          session: AsyncSession = Depends(get_session_with_commit),
-                          user_data: User = Depends(get_current_trainer_admin_user)
-                          ) -> STrainingInfo | dict:
+                          response: Response,
+                          session: AsyncSession = Depends(get_session),
+                          user_data: SPrincipal = Depends(get_current_trainer_admin_user)
+                          ) -> Response:
     """
     Создает новую тренировку.
     Доступ только у администратора и тренера
     """
+    # Тренер, помещение и пересечения проверяются одним запросом, затем один INSERT ... RETURNING
+    new_training, conflict_type = await TrainingDAO(session).add_validated(values=training_data)
+    if conflict_type:
+        raise SCHEDULE_EXCEPTIONS[conflict_type]
+    return json_response(new_training, STrainingInfo, response)
+
+@router.post("/series/", summary="Создать серию тренировок")
+async def create_training_series(series_data: STrainingSeriesAdd,
+                                 session: AsyncSession = Depends(get_session),
+                                 user_data: SPrincipal = Depends(get_current_trainer_admin_user)
+                                 ) -> STrainingSeriesResult:
+    """
+    Создает повторяющиеся тренировки по дням недели на несколько недель вперед.
+    Занятые даты пропускаются и попадают в отчет с типом конфликта.
+    Доступ только у администратора и тренера
+    """
     training_dao = TrainingDAO(session)
-    user_dao = UsersDAO(session)
-    room_dao = RoomDAO(session)
-    # Проверка, существует ли тренер
-    trainer = await user_dao.find_one_or_none_by_id(training_data.trainer_id)
-    if not trainer or trainer.role.name != "trainer":
-        raise TrainerNotFound
-    # Проверка, существует ли помещение
-    room = await room_dao.find_one_or_none_by_id(training_data.room_id)
-    if not room:
-        raise RoomNotFound
-
-    # Проверка конфликтов времени для помещения И тренера (один запрос)
-    has_conflict, conflict_type = await training_dao.check_time_conflicts(
-        room_id=training_data.room_id,
-        trainer_id=training_data.trainer_id,
-        training_date=training_data.date,
-        start_time=training_data.start_time,
-        end_time=training_data.end_time
-    )
-    if has_conflict:
-        if conflict_type == "room":
-            raise RoomTimeConflictException
-        elif conflict_type == "trainer":
-            raise TrainerTimeConflictException
-    # Добавление тренировки
-    new_training = await training_dao.add(values=training_data)
-    if new_training:
-        # Перезагружаем тренировку с relationships
-        training_full = await training_dao.find_one_or_none_by_id(new_training.id)
-        training_dict = STrainingInfo.model_validate(training_full).model_dump()
-        training_dict['booking_count'] = len(training_full.bookings)
-        return STrainingInfo(**training_dict)
-    return {"message": "Ошибка при добавлении тренировки"}
+    # Тренер и помещение проверяются одним запросом; пересечения по датам проверит add_series
+    conflict_type = await training_dao.validate_schedule(
+        {"trainer_id": series_data.trainer_id, "room_id": series_data.room_id})
+    if conflict_type:
+        raise SCHEDULE_EXCEPTIONS[conflict_type]
+
+    occurrences, conflict_type = await training_dao.add_series(series_data)
+    if conflict_type:
+        raise SCHEDULE_EXCEPTIONS[conflict_type]
+    created = sum(1 for item in occurrences if item.status == "created")
+    return STrainingSeriesResult(created=created, occurrences=occurrences)
 
 @router.delete("/{training_id}/", summary="Удалить тренировку по ID")
 async def delete_training(training_id: int,
-                          session: AsyncSession = Depends(get_session_with_commit),
-                          user_data: User = Depends(get_current_trainer_admin_user)
+                          session: AsyncSession = Depends(get_session),
+                          user_data: SPrincipal = Depends(get_current_trainer_admin_user)
                           ) -> dict:
     """
     Удаление конкретной тренировки по ID.
@@ -92,91 +139,67 @@ async def delete_training(training_id: int,
     """
     training_dao = TrainingDAO(session)
 
-    # Проверка существования тренировки
-    training = await training_dao.find_one_or_none_by_id(training_id)
-    if not training:
-        raise TrainingNotFound
-    # Проверка: удалить может админ или тренер, которому принадлежит тренировка
-    if user_data.role.name != "admin" and training.trainer_id != user_data.id:
-        raise TrainingForbiddenException
-    # Удаление тренировки
+    # Удаление одним запросом: тренер может удалить только свою тренировку
     filters = STrainingFilter(id=training_id)
-    deleted_count = await training_dao.delete(filters=filters)
-    if deleted_count:
-        return {"message": f"Тренировка {training.title} успешно удалена",
-                "deleted_count": deleted_count,
-                "deleted_training":{
-                    "id": training.id,
-                    "title": training.title,
-                    "date": training.date
-                }
+    deleted = await training_dao.delete_returning(filters, conditions=_owner_conditions(user_data))
+    if not deleted:
+        # Повторный запрос нужен только для выбора ошибки: тренировки нет или она чужая
+        if await training_dao.find_one_or_none_by_id(training_id):
+            raise TrainingForbiddenException
+        raise TrainingNotFound
+    training = deleted[0]
+    return {"message": f"Тренировка {training.title} успешно удалена",
+            "deleted_count": len(deleted),
+            "deleted_training":{
+                "id": training.id,
+                "title": training.title,
+                "date": training.date
             }
-    return {"message": "Ошибка при удалении тренировки"}
+        }
 
-@router.patch("/{training_id}/", summary="Редактировать тренировку")
+@router.patch("/{training_id}/", summary="Редактировать тренировку", response_model=STrainingInfo)
 async def update_training(training_id: int,
                           data: STrainingUpd,
-                          session: AsyncSession = Depends(get_session_with_commit),
-                          user_data: User = Depends(get_current_trainer_admin_user)
-                          ) -> STrainingInfo:
+                          response: Response,
+                          session: AsyncSession = Depends(get_session),
+                          user_data: SPrincipal = Depends(get_current_trainer_admin_user)
+                          ) -> Response:
     """
     Изменение информации о тренировке по ID.
     Доступ только у администратора и тренера
     """
     training_dao = TrainingDAO(session)
 
-    # Проверка существования тренировки
-    training = await training_dao.find_one_or_none_by_id(training_id)
-    if not training:
+    # Проверка расписания тем же запросом, что при создании, затем один UPDATE ... RETURNING;
+    # тренер может изменить только свою тренировку
+    update_values = STrainingUpd(**data.model_dump(exclude_unset=True))
+    updated, conflict_type = await training_dao.update_returning_without_conflicts(
+        training_id, update_values, conditions=_owner_conditions(user_data))
+    if conflict_type:
+        raise SCHEDULE_EXCEPTIONS[conflict_type]
+    if updated is None:
+        if await training_dao.find_one_or_none_by_id(training_id):
+            raise TrainingForbiddenException
         raise TrainingNotFound
-    # Проверка: редактировать может админ или тренер, которому принадлежит тренировка
-    if user_data.role.name != "admin" and training.trainer_id != user_data.id:
-        raise TrainingForbiddenException
-
-    # Проверка конфликта времени, если изменяются дата, время, помещение или тренер
-    update_data = data.model_dump(exclude_unset=True)
-    if any(field in update_data for field in ['date', 'start_time', 'end_time', 'room_id', 'trainer_id']):
-        # Используем новые значения или старые, если не изменялись
-        check_room_id = update_data.get('room_id', training.room_id)
-        check_trainer_id = update_data.get('trainer_id', training.trainer_id)
-        check_date = update_data.get('date', training.date)
-        check_start_time = update_data.get('start_time', training.start_time)
-        check_end_time = update_data.get('end_time', training.end_time)
-
-        # Проверка конфликтов времени для помещения И тренера (один запрос)
-        has_conflict, conflict_type = await training_dao.check_time_conflicts(
-            room_id=check_room_id,
-            trainer_id=check_trainer_id,
-            training_date=check_date,
-            start_time=check_start_time,
-            end_time=check_end_time,
-            exclude_training_id=training_id  # Исключаем текущую тренировку
-        )
-        if has_conflict:
-            if conflict_type == "room":
-                raise RoomTimeConflictException
-            elif conflict_type == "trainer":
-                raise TrainerTimeConflictException
-
-    # Обновление информации о тренировке
-    filters = STrainingFilter(id=training_id)
-    update_values = STrainingUpd(**update_data)
-    updated_count = await training_dao.update(
-        filters=filters,
-        values=update_values
-    )
-
-    if updated_count == 0:
-        raise HTTPException(status_code=400, detail="Обновление не выполнено")
-    updated = await training_dao.find_one_or_none_by_id(training_id)
-    # Добавляем booking_count
-    updated_dict = STrainingInfo.model_validate(updated).model_dump()
-    updated_dict['booking_count'] = len(updated.bookings)
-    return STrainingInfo(**updated_dict)
+    return json_response(updated, STrainingInfo, response)
 
 @router.get("/my/", summary="Мои тренировки с участниками", response_model=list[STrainingWithBookings])
-async def get_my_trainings(session: AsyncSession = Depends(get_session_without_commit),
-                           user_data: User = Depends(get_current_trainer_user)):
+async def get_my_trainings(session: AsyncSession = Depends(get_session),
+                           user_data: SPrincipal = Depends(get_current_trainer_user)):
     trainer_id = user_data.id
     trainings = await TrainingDAO(session).find_by_trainer_with_clients(trainer_id)
     return trainings
+
+@router.get("/history/", summary="Тренировки за период вместе с архивом", response_model=list[STrainingInfo])
+async def get_trainings_history(response: Response,
+                                date_from: date = Query(description="Начало периода"),
+                                date_to: date = Query(description="Конец периода"),
+                                session: AsyncSession = Depends(get_session),
+                                user_data: SPrincipal = Depends(get_current_trainer_admin_user)) -> Response:
+    """
+    Отчет по тренировкам за период, включая перенесенные в архив.
+    Администратор видит все тренировки, тренер - только свои.
+    """
+    trainer_id = None if user_data.role.name == "admin" else user_data.id
+    trainings = await TrainingDAO(session).find_history(date_from, date_to, trainer_id=trainer_id)
+    return json_response(trainings, list[STrainingInfo], response)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field, ConfigDict
-from datetime import time, date as dt
+from typing import Literal, Self
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from datetime import time, timedelta, date as dt
 
 from app.users.schemas import SUserShort
 from app.rooms.schemas import SRoomInfo
@@ -18,6 +19,12 @@ class STrainingAdd(TrainingBase):
     trainer_id: int = Field(description="ID тренера")
     room_id: int = Field(description="ID помещения")
 
+    @model_validator(mode="after")
+    def check_time(self) -> Self:
+        if self.start_time >= self.end_time:
+            raise ValueError("Время окончания должно быть позже времени начала")
+        return self
+
 class STrainingInfo(TrainingBase):
     id: int = Field(description="ID тренировки")
     trainer_id: int = Field(description="ID тренера")
@@ -42,6 +49,13 @@ class STrainingUpd(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+    @model_validator(mode="after")
+    def check_time(self) -> Self:
+        # Если меняется только одна граница, порядок с сохраненной проверяет TrainingDAO.validate_schedule
+        if self.start_time and self.end_time and self.start_time >= self.end_time:
+            raise ValueError("Время окончания должно быть позже времени начала")
+        return self
+
 class STrainingShort(BaseModel):
     id: int = Field(description="ID тренировки")
     title: str = Field(min_length=2, max_length=50, description="Название тренировки, от 2 до 50 символов")
@@ -60,3 +74,71 @@ class SBookingWithUser(BaseModel):
 
 class STrainingWithBookings(STrainingShort):
     bookings: list[SBookingWithUser] = Field(default=[], description="Список бронирований")
+
+class STrainingSeriesAdd(BaseModel):
+    title: str = Field(min_length=2, max_length=50, description="Название тренировки, от 2 до 50 символов")
+    description: str = Field(min_length=5, max_length=256, description="Описание тренировки, от 5 до 256 символов")
+    start_time: time = Field(description="Время начала тренировки")
+    end_time: time = Field(description="Время окончания тренировки")
+    trainer_id: int = Field(description="ID тренера")
+    room_id: int = Field(description="ID помещения")
+    start_date: dt = Field(description="Дата, с которой начинается расписание")
+    weekdays: list[int] = Field(min_length=1, max_length=7,
+                                description="Дни недели: 0 - понедельник, ..., 6 - воскресенье")
+    weeks: int = Field(ge=1, le=52, description="Количество недель, от 1 до 52")
+
+    @model_validator(mode="after")
+    def check_series(self) -> Self:
+        if any(day < 0 or day > 6 for day in self.weekdays):
+            raise ValueError("Дни недели задаются числами от 0 до 6")
+        if self.start_time >= self.end_time:
+            raise ValueError("Время окончания должно быть позже времени начала")
+        return self
+
+    def occurrence_dates(self) -> list[dt]:
+        """Даты всех занятий серии по возрастанию: weeks недель начиная со start_date."""
+        days = (self.start_date + timedelta(days=offset) for offset in range(self.weeks * 7))
+        return [day for day in days if day.weekday() in self.weekdays]
+
+    def occurrences(self) -> list[STrainingAdd]:
+        return [
+            STrainingAdd(
+                title=self.title,
+                description=self.description,
+                date=day,
+                start_time=self.start_time,
+                end_time=self.end_time,
+                trainer_id=self.trainer_id,
+                room_id=self.room_id,
+            )
+            for day in self.occurrence_dates()
+        ]
+
+class STrainingOccurrence(BaseModel):
+    date: dt = Field(description="Дата занятия")
+    status: Literal["created", "room_conflict", "trainer_conflict"] = Field(description="Результат")
+    training_id: int | None = Field(default=None, description="ID созданной тренировки")
+
+class STrainingSeriesResult(BaseModel):
+    created: int = Field(description="Количество созданных тренировок")
+    occurrences: list[STrainingOccurrence] = Field(description="Результат по каждому занятию серии")
+
+class STrainingSearch(BaseModel):
+    q: str | None = Field(default=None, min_length=3, max_length=100,
+                          description="Подстрока в названии, описании или имени тренера, от 3 символов "
+                                      "(триграммный индекс)")
+    date_from: dt | None = Field(default=None, description="С какой даты, по умолчанию - с сегодняшней")
+    date_to: dt | None = Field(default=None, description="По какую дату включительно")
+    room_id: int | None = Field(default=None, description="ID помещения")
+    trainer_id: int | None = Field(default=None, description="ID тренера")
+    time_from: time | None = Field(default=None, description="Начало не раньше")
+    time_to: time | None = Field(default=None, description="Окончание не позже")
+    has_free_spots: bool | None = Field(default=None, description="true - только со свободными местами, false - только заполненные")
+
+    @model_validator(mode="after")
+    def check_ranges(self) -> Self:
+        if self.date_from and self.date_to and self.date_from > self.date_to:
+            raise ValueError("Начало периода должно быть не позже конца")
+        if self.time_from and self.time_to and self.time_from >= self.time_to:
+            raise ValueError("Время окончания должно быть позже времени начала")
+        return self
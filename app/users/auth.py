@@ -1,8 +1,15 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from passlib.context import CryptContext
-from jose import jwt
+from jose import jwt, ExpiredSignatureError
 from datetime import datetime, timedelta, timezone
 from fastapi.responses import Response
 from app.config import settings
+from app.exceptions import PasswordHashBusyException
+from app.users.schemas import SPrincipal
 
 
 def create_tokens(data: dict) -> dict:
@@ -32,13 +39,14 @@ def create_tokens(data: dict) -> dict:
 
 
 async def authenticate_user(user, password):
-    if not user or verify_password(plain_password=password, hashed_password=user.password) is False:
+    if not user or await verify_password_async(plain_password=password, hashed_password=user.password) is False:
         return None
     return user
 
 
-def set_tokens(response: Response, user_id: int):
-    new_tokens = create_tokens(data={"sub": str(user_id)})
+def set_tokens(response: Response, principal: SPrincipal):
+    # Версия пользователя в claims: при ее смене токены перевыпускаются, роль берется из БД
+    new_tokens = create_tokens(data={"sub": str(principal.id), "ver": principal.version})
     access_token = new_tokens.get('access_token')
     refresh_token = new_tokens.get("refresh_token")
 
@@ -73,4 +81,119 @@ def get_password_hash(password: str) -> str:
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHashPool:
+    """
+    Пул для bcrypt вне цикла событий. Одновременно принимается не больше max_pending задач
+    (выполняемых и ожидающих); при переполнении запрос сразу получает 503, а не ждет в очереди.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 4, max_pending: int = 64):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Неизвестный тип пула: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        # Создается при первом вызове: процессы не должны стартовать при импорте модуля
+        if self._executor is None:
+            executor_cls = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+            self._executor = executor_cls(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHashBusyException
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+
+password_pool = PasswordHashPool(
+    kind=settings.PASSWORD_HASH_POOL,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_pool.run(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+
+class VerifiedTokenCache:
+    """
+    LRU уже проверенных JWT: sha256 токена -> payload. Запись живет до exp токена,
+    поэтому повторные запросы с той же кукой не проверяют подпись и не разбирают claims.
+    Возвращаемый payload общий для всех запросов - изменять его нельзя.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def decode(self, token: str) -> dict:
+        """Как jwt.decode с обязательным exp: JWTError при неверном токене, ExpiredSignatureError при истекшем."""
+        key = hashlib.sha256(token.encode()).digest()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expire, payload = entry
+            if expire > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payload
+            del self._entries[key]
+            raise ExpiredSignatureError("Signature has expired.")
+
+        self.misses += 1
+        payload = jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            algorithms=[settings.ALGORITHM],
+            options={"require_exp": True}
+        )
+        if self.max_entries > 0:
+            self._entries[key] = (float(payload["exp"]), payload)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return payload
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+token_cache = VerifiedTokenCache(max_entries=settings.TOKEN_CACHE_MAX_ENTRIES)
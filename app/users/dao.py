@@ -1,10 +1,45 @@
 from app.dao.base import BaseDAO
 from app.users.models import User, Role
+from app.users.schemas import SPrincipal, RoleModel
+
+from sqlalchemy import select, or_
+from loguru import logger
 
 
 class UsersDAO(BaseDAO):
     model = User
 
+    async def find_principal(self, user_id: int) -> SPrincipal | None:
+        """Id, роль и версия пользователя одним запросом по первичному ключу, без загрузки профиля."""
+        logger.info(f"Загрузка данных авторизации пользователя ID={user_id}")
+        try:
+            query = (
+                select(self.model.id, self.model.revision,
+                       Role.id.label("role_id"), Role.name.label("role_name"))
+                .join(Role, Role.id == self.model.role_id)
+                .where(self.model.id == user_id)
+            )
+            row = (await self._session.execute(query)).one_or_none()
+            if row is None:
+                return None
+            return SPrincipal(id=row.id, revision=row.revision, role=RoleModel(id=row.role_id, name=row.role_name))
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке данных авторизации пользователя {user_id}: {e}")
+            raise
+
+    async def find_taken_contacts(self, emails: list[str], phones: list[str]) -> tuple[set[str], set[str]]:
+        """Какие из переданных email и телефонов уже заняты - одним запросом на всю пачку."""
+        logger.info(f"Проверка занятых контактов: {len(emails)} email, {len(phones)} телефонов")
+        try:
+            query = select(self.model.email, self.model.phone_number).where(
+                or_(self.model.email.in_(emails), self.model.phone_number.in_(phones))
+            )
+            rows = (await self._session.execute(query)).all()
+            return {row.email for row in rows}, {row.phone_number for row in rows}
+        except Exception as e:
+            logger.error(f"Ошибка при проверке занятых контактов: {e}")
+            raise
+
 
 class RoleDAO(BaseDAO):
     model = Role
\ No newline at end of file
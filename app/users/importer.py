@@ -0,0 +1,164 @@
+import asyncio
+import csv
+import json
+import os
+import time
+from typing import AsyncIterator
+
+from loguru import logger
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.users.auth import PasswordHashPool, get_password_hash
+from app.users.dao import UsersDAO
+from app.users.schemas import ImportFormat, SUserAddDB, SUserImport, SUserImportResult, SUserImportRow
+
+
+# Отдельный пул процессов: импорт тысяч паролей не должен занимать пул логина
+import_hash_pool = PasswordHashPool(
+    kind="process",
+    workers=settings.USER_IMPORT_HASH_WORKERS or os.cpu_count() or 1,
+    max_pending=settings.USER_IMPORT_BATCH_SIZE * 4,
+)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, str]]:
+    """Режет поток байтов на непустые строки (номер строки, текст), не читая его целиком."""
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            number += 1
+            line = raw.decode("utf-8-sig" if number == 1 else "utf-8").rstrip("\r")
+            if line.strip():
+                yield number, line
+    if buffer.strip():
+        yield number + 1, buffer.decode("utf-8-sig" if number == 0 else "utf-8").rstrip("\r")
+
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: ImportFormat) -> AsyncIterator[tuple[int, dict | str]]:
+    """Строки файла как словари полей; для нераспознанной строки вместо словаря - текст ошибки."""
+    header = None
+    async for number, line in iter_lines(chunks):
+        if fmt == ImportFormat.NDJSON:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, f"Некорректный JSON: {e.msg}"
+                continue
+            yield number, record if isinstance(record, dict) else "Ожидается JSON-объект"
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield number, f"Ожидается {len(header)} полей, получено {len(values)}"
+            continue
+        yield number, dict(zip(header, values))
+
+
+class UserImporter:
+    """
+    Массовый импорт клиентов пачками по batch_size строк. На каждую пачку: проверка занятых
+    email и телефонов одним запросом, параллельное хеширование паролей в пуле процессов
+    и один INSERT ... ON CONFLICT DO NOTHING с коммитом.
+    """
+
+    def __init__(self, session: AsyncSession, batch_size: int = settings.USER_IMPORT_BATCH_SIZE,
+                 hash_pool: PasswordHashPool = import_hash_pool):
+        self.session = session
+        self.dao = UsersDAO(session)
+        self.batch_size = batch_size
+        self.hash_pool = hash_pool
+        self.rows: list[SUserImportRow] = []
+        # Контакты, уже встреченные в этом файле
+        self._seen_emails: set[str] = set()
+        self._seen_phones: set[str] = set()
+
+    async def run(self, records: AsyncIterator[tuple[int, dict | str]]) -> SUserImportResult:
+        started = time.perf_counter()
+        batch: list[tuple[int, SUserImport]] = []
+        async for number, record in records:
+            if isinstance(record, str):
+                self.rows.append(SUserImportRow(line=number, status="invalid", error=record))
+                continue
+            try:
+                user = SUserImport.model_validate(record)
+            except ValidationError as e:
+                error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                self.rows.append(self._invalid_row(number, record, error))
+                continue
+            except TypeError as e:
+                self.rows.append(self._invalid_row(number, record, f"Некорректные данные: {e}"))
+                continue
+            batch.append((number, user))
+            if len(batch) >= self.batch_size:
+                await self._import_batch(batch)
+                batch = []
+        if batch:
+            await self._import_batch(batch)
+
+        elapsed = time.perf_counter() - started
+        self.rows.sort(key=lambda row: row.line)
+        counts = {status: sum(row.status == status for row in self.rows) for status in ("created", "duplicate", "invalid")}
+        rate = len(self.rows) / elapsed if elapsed else 0.0
+        logger.info(f"Импорт пользователей: {len(self.rows)} строк за {elapsed:.2f} с ({rate:.0f} строк/с), {counts}")
+        return SUserImportResult(
+            total=len(self.rows),
+            created=counts["created"],
+            duplicates=counts["duplicate"],
+            invalid=counts["invalid"],
+            elapsed_s=round(elapsed, 3),
+            rows_per_second=round(rate, 1),
+            rows=self.rows,
+        )
+
+    @staticmethod
+    def _invalid_row(number: int, record: dict, error: str) -> SUserImportRow:
+        """Отклоненная строка. Email в отчет попадает, только если это строка: в NDJSON там может быть что угодно."""
+        email = record.get("email")
+        return SUserImportRow(line=number, email=email if isinstance(email, str) else None,
+                              status="invalid", error=error)
+
+    async def _import_batch(self, batch: list[tuple[int, SUserImport]]):
+        taken_emails, taken_phones = await self.dao.find_taken_contacts(
+            emails=[user.email for _, user in batch],
+            phones=[user.phone_number for _, user in batch],
+        )
+        fresh: list[tuple[int, SUserImport]] = []
+        for number, user in batch:
+            if user.email in taken_emails or user.email in self._seen_emails:
+                self.rows.append(SUserImportRow(line=number, email=user.email, status="duplicate",
+                                                error="Email уже зарегистрирован"))
+            elif user.phone_number in taken_phones or user.phone_number in self._seen_phones:
+                self.rows.append(SUserImportRow(line=number, email=user.email, status="duplicate",
+                                                error="Телефон уже зарегистрирован"))
+            else:
+                fresh.append((number, user))
+                self._seen_emails.add(user.email)
+                self._seen_phones.add(user.phone_number)
+        if not fresh:
+            return
+
+        hashes = await asyncio.gather(
+            *(self.hash_pool.run(get_password_hash, user.password) for _, user in fresh)
+        )
+        values = [
+            SUserAddDB(**user.model_dump(exclude={"password"}), password=hashed)
+            for (_, user), hashed in zip(fresh, hashes)
+        ]
+        inserted = await self.dao.add_many_skip_conflicts(values, returning=("email",))
+        await self.session.commit()
+
+        inserted_emails = {row.email for row in inserted}
+        for number, user in fresh:
+            if user.email in inserted_emails:
+                self.rows.append(SUserImportRow(line=number, email=user.email, status="created"))
+            else:
+                # Контакт заняли параллельно, между проверкой и вставкой
+                self.rows.append(SUserImportRow(line=number, email=user.email, status="duplicate",
+                                                error="Email или телефон уже зарегистрирован"))
@@ -1,4 +1,4 @@
-from sqlalchemy import text, ForeignKey
+from sqlalchemy import text, ForeignKey, Index, String, literal_column
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.dao.database import Base, str_uniq
 
@@ -23,6 +23,14 @@ class User(Base):
     password: Mapped[str]
     role_id: Mapped[int] = mapped_column(ForeignKey('roles.id'), default=1, server_default=text("1"))
 
+    __table_args__ = (
+        # Поиск тренировок по имени тренера (ILIKE '%...%'): GIN-индекс по триграммам полного имени
+        Index("ix_users_full_name_trgm",
+              (literal_column("first_name", String) + literal_column("' '") + literal_column("last_name", String))
+              .label("full_name"),
+              postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
     role: Mapped["Role"] = relationship("Role", back_populates="users", lazy="joined")
     trainings: Mapped[list["Training"]] = relationship(back_populates="trainer", cascade="all, delete-orphan") # type: ignore
     bookings: Mapped[list["Booking"]] = relationship(back_populates="user", cascade="all, delete-orphan") # type: ignore
@@ -30,4 +38,8 @@ class User(Base):
     sub_requests: Mapped["SubRequest"] = relationship(back_populates="user", cascade="all, delete-orphan") # type: ignore
 
     def __repr__(self):
-        return f"{self.__class__.__name__}(id={self.id}, email={self.email})"
\ No newline at end of file
+        return f"{self.__class__.__name__}(id={self.id}, email={self.email})"
+
+# Полное имя "Имя Фамилия" - то же выражение, что в индексе ix_users_full_name_trgm,
+# иначе планировщик не сможет его использовать
+user_full_name = User.first_name + literal_column("' '") + User.last_name
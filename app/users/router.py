@@ -1,21 +1,26 @@
 from typing import List
-from fastapi import APIRouter, Response, Depends
+from fastapi import APIRouter, Request, Response, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.users.models import User
-from app.users.auth import authenticate_user, set_tokens
+from app.users.auth import authenticate_user, set_tokens, token_cache, password_pool, get_password_hash_async
 from app.dependencies.auth_dep import (get_current_user, get_current_admin_user, check_refresh_token,
-                                       get_current_trainer_admin_user)
-from app.dependencies.dao_dep import get_session_with_commit, get_session_without_commit
-from app.exceptions import UserAlreadyExistsException, IncorrectEmailOrPasswordException
+                                       get_current_trainer_admin_user, principal_cache)
+from app.dependencies.dao_dep import get_session
+from app.dependencies.pagination_dep import get_page_params
+from app.dao.pagination import SPageParams, NEXT_CURSOR_HEADER
+from app.responses import StreamFormat, stream_response
+from app.exceptions import UserAlreadyExistsException, IncorrectEmailOrPasswordException, UserNotFoundException
 from app.users.dao import UsersDAO
-from app.users.schemas import SUserRegister, SUserAuth, EmailModel, SUserAddDB, SUserInfo
+from app.users.schemas import (SUserRegister, SUserAuth, EmailModel, SUserAddDB, SUserInfo, SPrincipal,
+                               ImportFormat, SUserImportResult)
+from app.users.importer import UserImporter, iter_records
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 @router.post("/register/")
 async def register_user(user_data: SUserRegister,
-                        session: AsyncSession = Depends(get_session_with_commit)) -> dict:
+                        session: AsyncSession = Depends(get_session)) -> dict:
     # Проверка существования пользователя
     user_dao = UsersDAO(session)
 
@@ -26,6 +31,7 @@ async def register_user(user_data: SUserRegister,
     # Подготовка данных для добавления
     user_data_dict = user_data.model_dump()
     user_data_dict.pop('confirm_password', None)
+    user_data_dict['password'] = await get_password_hash_async(user_data.password)
 
     # Добавление пользователя
     await user_dao.add(values=SUserAddDB(**user_data_dict))
@@ -36,7 +42,7 @@ async def register_user(user_data: SUserRegister,
 async def auth_user(
         response: Response,
         user_data: SUserAuth,
-        session: AsyncSession = Depends(get_session_without_commit)
+        session: AsyncSession = Depends(get_session)
 ) -> dict:
     users_dao = UsersDAO(session)
     user = await users_dao.find_one_or_none(
@@ -45,7 +51,7 @@ async def auth_user(
 
     if not (user and await authenticate_user(user=user, password=user_data.password)):
         raise IncorrectEmailOrPasswordException
-    set_tokens(response, user.id)
+    set_tokens(response, SPrincipal.model_validate(user))
     return {
         'ok': True,
         'message': 'Авторизация успешна!'
@@ -58,19 +64,60 @@ async def logout(response: Response):
     return {'message': 'Пользователь успешно вышел из системы'}
 
 @router.get("/me/")
-async def get_me(user_data: User = Depends(get_current_user)) -> SUserInfo:
-    return SUserInfo.model_validate(user_data)
+async def get_me(user_data: SPrincipal = Depends(get_current_user),
+                 session: AsyncSession = Depends(get_session)) -> SUserInfo:
+    # Авторизация не загружает профиль, поэтому здесь он читается явно
+    user = await UsersDAO(session).find_one_or_none_by_id(user_data.id)
+    if not user:
+        raise UserNotFoundException
+    return SUserInfo.model_validate(user)
+
+@router.get("/auth_stats/", summary="Статистика авторизации")
+async def get_auth_stats(user_data: SPrincipal = Depends(get_current_admin_user)) -> dict:
+    """
+    Попадания и промахи кэша проверенных токенов и кэша пользователей,
+    очередь пула bcrypt в текущем воркере.
+    Доступ только у администратора
+    """
+    return {
+        "tokens": token_cache.stats(),
+        "principals": principal_cache.stats() if principal_cache.enabled else None,
+        "password_pool": password_pool.stats(),
+    }
 
 @router.get("/all_users/")
-async def get_all_users(session: AsyncSession = Depends(get_session_with_commit),
-                        user_data: User = Depends(get_current_trainer_admin_user)
+async def get_all_users(response: Response,
+                        page: SPageParams = Depends(get_page_params),
+                        stream: StreamFormat | None = Query(default=None, description="Потоковая выдача"),
+                        session: AsyncSession = Depends(get_session),
+                        user_data: SPrincipal = Depends(get_current_trainer_admin_user)
                         ) -> List[SUserInfo]:
-    return await UsersDAO(session).find_all()
+    if stream:
+        return stream_response(lambda s: UsersDAO(s).stream_all(), SUserInfo, stream)
+    users, next_cursor = await UsersDAO(session).find_page(limit=page.limit, after=page.after)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return users
 
 @router.post("/refresh")
 async def process_refresh_token(
         response: Response,
         user: User = Depends(check_refresh_token)
 ):
-    set_tokens(response, user.id)
-    return {"message": "Токены успешно обновлены"}
\ No newline at end of file
+    set_tokens(response, SPrincipal.model_validate(user))
+    return {"message": "Токены успешно обновлены"}
+
+@router.post("/import/", summary="Массовый импорт клиентов")
+async def import_users(request: Request,
+                       fmt: ImportFormat = Query(default=ImportFormat.CSV, alias="format",
+                                                 description="Формат тела: csv с заголовком или ndjson"),
+                       session: AsyncSession = Depends(get_session),
+                       user_data: SPrincipal = Depends(get_current_admin_user)
+                       ) -> SUserImportResult:
+    """
+    Регистрирует клиентов из файла в теле запроса. Поля: email, phone_number, first_name, last_name, password.
+    Тело читается потоком, каждая пачка строк коммитится отдельно.
+    Возвращает результат по каждой строке и скорость импорта.
+    Доступ только у администратора
+    """
+    return await UserImporter(session).run(iter_records(request.stream(), fmt))
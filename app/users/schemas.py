@@ -1,7 +1,7 @@
 import re
-from typing import Self
+from enum import Enum
+from typing import Literal, Self
 from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator, model_validator, computed_field
-from app.users.auth import get_password_hash
 
 
 class EmailModel(BaseModel):
@@ -29,7 +29,7 @@ class SUserRegister(UserBase):
     def check_password(self) -> Self:
         if self.password != self.confirm_password:
             raise ValueError("Пароли не совпадают")
-        self.password = get_password_hash(self.password)  # хешируем пароль до сохранения в базе данных
+        # Пароль хешируется в роутере через пул, чтобы bcrypt не блокировал цикл событий
         return self
 
 
@@ -37,6 +37,33 @@ class SUserAddDB(UserBase):
     password: str = Field(min_length=5, description="Пароль в формате HASH-строки")
 
 
+class ImportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class SUserImport(UserBase):
+    """Строка массового импорта: те же поля, что при регистрации, без подтверждения пароля."""
+    password: str = Field(min_length=5, max_length=50, description="Пароль, от 5 до 50 знаков")
+
+
+class SUserImportRow(BaseModel):
+    line: int = Field(description="Номер строки в файле")
+    email: str | None = Field(default=None, description="Электронная почта из строки")
+    status: Literal["created", "duplicate", "invalid"] = Field(description="Результат импорта строки")
+    error: str | None = Field(default=None, description="Причина отказа")
+
+
+class SUserImportResult(BaseModel):
+    total: int = Field(description="Всего строк")
+    created: int = Field(description="Создано пользователей")
+    duplicates: int = Field(description="Пропущено: email или телефон уже заняты")
+    invalid: int = Field(description="Пропущено: ошибки в данных")
+    elapsed_s: float = Field(description="Время импорта, с")
+    rows_per_second: float = Field(description="Скорость импорта, строк в секунду")
+    rows: list[SUserImportRow] = Field(description="Результат по каждой строке")
+
+
 class SUserAuth(EmailModel):
     password: str = Field(min_length=5, max_length=50, description="Пароль, от 5 до 50 знаков")
 
@@ -47,6 +74,19 @@ class RoleModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class SPrincipal(BaseModel):
+    """Авторизованный пользователь: только то, что нужно проверкам доступа."""
+    id: int = Field(description="Идентификатор пользователя")
+    role: RoleModel = Field(description="Роль")
+    revision: int = Field(description="Счетчик изменений пользователя")
+    model_config = ConfigDict(from_attributes=True)
+
+    @property
+    def version(self) -> str:
+        """Версия пользователя для claim ver: меняется при любом изменении, в том числе роли."""
+        return str(self.revision)
+
+
 class SUserInfo(UserBase):
     id: int = Field(description="Идентификатор пользователя")
     role: RoleModel = Field(exclude=True)
@@ -59,5 +99,16 @@ class SUserInfo(UserBase):
     def role_id(self) -> int:
         return self.role.id
     
-class SUserShort(UserBase):
-    id: int = Field(description="Идентификатор пользователя")
\ No newline at end of file
+class SUserShort(BaseModel):
+    """
+    Пользователь внутри других ответов (тренер, клиент). Схема только для вывода: данные
+    проверены при регистрации, поэтому email не проходит дорогую проверку EmailStr
+    на каждой строке списка.
+    """
+    email: str = Field(description="Электронная почта", json_schema_extra={"format": "email"})
+    phone_number: str = Field(description="Номер телефона в международном формате, начинающийся с '+'")
+    first_name: str = Field(description="Имя")
+    last_name: str = Field(description="Фамилия")
+    id: int = Field(description="Идентификатор пользователя")
+
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+Бенчмарк горячих запросов до и после вторичных индексов.
+
+Создает отдельную схему, заполняет ее синтетическими данными, выполняет
+EXPLAIN ANALYZE каждого запроса без индексов и с индексами из моделей
+(те же, что создает миграция 3c9d2e7f1a4b), после чего удаляет схему.
+
+Запуск (нужен доступ к PostgreSQL из .env):
+    python -m benchmarks.indexes --trainings 200000 --users 50000
+"""
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import settings
+from app.dao.database import Base
+from app.users.models import *  # noqa: F401,F403 - регистрация моделей в metadata
+from app.trainings.models import *  # noqa: F401,F403
+from app.bookings.models import *  # noqa: F401,F403
+from app.rooms.models import *  # noqa: F401,F403
+from app.memberships.models import *  # noqa: F401,F403
+from app.subscriptions.models import *  # noqa: F401,F403
+
+
+SCHEMA = "bench_indexes"
+REPEATS = 20
+# Слоты тренировок: помещение x день x час. Ограничения-исключения не допускают пересечений,
+# поэтому каждой тренировке - свой слот, а тренеры в одном часе не повторяются
+ROOMS = 20
+DAYS = 1000
+HOURS = 12
+MAX_TRAININGS = ROOMS * DAYS * HOURS
+# Тренер - каждый 50-й пользователь; в одном часе заняты все ROOMS помещений
+MIN_USERS = 50 * ROOMS
+
+SECONDARY_INDEXES = [
+    index
+    for table in Base.metadata.sorted_tables
+    for index in table.indexes
+]
+
+TODAY = date.today()
+
+HOT_QUERIES = {
+    "Предстоящие тренировки (GET /trainings/)": (
+        "SELECT * FROM trainings WHERE date >= :today ORDER BY date, start_time, id LIMIT 50",
+        {"today": TODAY},
+    ),
+    "Пересечения (validate_schedule)": (
+        "SELECT * FROM trainings WHERE date = :day AND (room_id = 3 OR trainer_id = 7) "
+        "AND start_time < '12:00' AND end_time > '11:00'",
+        {"day": TODAY + timedelta(days=10)},
+    ),
+    "Занятые места (create_booking)": (
+        "SELECT count(*) FROM bookings WHERE training_id = :training_id",
+        {"training_id": 4242},
+    ),
+    "Записи клиента (find_by_user)": (
+        "SELECT * FROM bookings WHERE user_id = :user_id",
+        {"user_id": 777},
+    ),
+    "Истекшие абонементы (deactivate_expired_memberships)": (
+        "SELECT id FROM memberships WHERE status = 'active' AND end_date < :today",
+        {"today": TODAY},
+    ),
+    "Заявка в ожидании (create_sub_request)": (
+        "SELECT * FROM sub_requests WHERE user_id = :user_id AND status = 'pending'",
+        {"user_id": 777},
+    ),
+}
+
+
+SEED_SQL = [
+    "INSERT INTO roles (id, name) VALUES (1, 'client'), (2, 'trainer'), (3, 'admin')",
+    """INSERT INTO users (id, phone_number, first_name, last_name, email, password, role_id)
+       SELECT g, '+7' || lpad(g::text, 10, '0'), 'Имя', 'Фамилия', 'user' || g || '@example.com', 'hash',
+              CASE WHEN g % 50 = 0 THEN 2 ELSE 1 END
+       FROM generate_series(1, :users) g""",
+    """INSERT INTO rooms (id, title, capacity)
+       SELECT g, 'Зал ' || g, 20 FROM generate_series(1, :rooms) g""",
+    """INSERT INTO subscriptions (id, title, price, duration_days)
+       SELECT g, 'Абонемент ' || g, 3000 * g, 30 * g FROM generate_series(1, 3) g""",
+    # k = g - 1: помещение k % rooms, день (k / rooms) % days, час k / (rooms * days) - слоты не повторяются.
+    # Тренер зависит от помещения (k % rooms), так что в одном часе у всех помещений разные тренеры
+    """INSERT INTO trainings (id, title, description, date, start_time, end_time, trainer_id, room_id)
+       SELECT k + 1, 'Тренировка ' || (k + 1), 'Описание',
+              CURRENT_DATE - 730 + (k / :rooms) % :days,
+              make_time(8 + k / (:rooms * :days), 0, 0), make_time(9 + k / (:rooms * :days), 0, 0),
+              (k % :rooms + :rooms * ((k / :rooms) % (:users / (50 * :rooms))) + 1) * 50, k % :rooms + 1
+       FROM generate_series(0, :trainings - 1) k""",
+    """INSERT INTO bookings (user_id, training_id)
+       SELECT DISTINCT ON (u, t) u, t FROM (
+           SELECT (random() * (:users - 1))::int + 1 AS u, (random() * (:trainings - 1))::int + 1 AS t
+           FROM generate_series(1, :trainings * 5)
+       ) s""",
+    """INSERT INTO memberships (user_id, subscription_id, start_date, end_date, status)
+       SELECT g, g % 3 + 1, CURRENT_DATE - (g % 120), CURRENT_DATE - (g % 120) + 60,
+              CASE WHEN g % 120 > 60 THEN 'expired' ELSE 'active' END
+       FROM generate_series(1, :users) g""",
+    """INSERT INTO sub_requests (user_id, subscription_id, status)
+       SELECT (g % :users) + 1, g % 3 + 1, CASE WHEN g % 10 = 0 THEN 'pending' ELSE 'approved' END
+       FROM generate_series(1, :users * 2) g""",
+]
+
+
+async def measure(conn, sql: str, params: dict) -> tuple[str, float]:
+    plan_rows = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params)
+    plan = "\n".join(row[0] for row in plan_rows)
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        await conn.execute(text(sql), params)
+    return plan, (time.perf_counter() - started) / REPEATS * 1000
+
+
+async def run_queries(conn, label: str) -> dict[str, float]:
+    print(f"\n===== {label} =====")
+    timings = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan, latency = await measure(conn, sql, params)
+        timings[name] = latency
+        print(f"\n--- {name}: {latency:.3f} мс\n{plan}")
+    return timings
+
+
+async def main(trainings: int, users: int):
+    engine = create_async_engine(settings.get_db_url)
+    async with engine.connect() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        # Расширения ставятся в public: btree_gist нужен ограничениям-исключениям, pg_trgm - GIN-индексам поиска
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist SCHEMA public"))
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public"))
+        # public остается в пути: без него не найти операторы и классы операторов расширений
+        await conn.execute(text(f"SET search_path TO {SCHEMA}, public"))
+        try:
+            await conn.run_sync(Base.metadata.create_all)
+            for index in SECONDARY_INDEXES:
+                await conn.execute(text(f"DROP INDEX {index.name}"))
+            print(f"Заполнение: {trainings} тренировок, {users} пользователей...")
+            for sql in SEED_SQL:
+                await conn.execute(text(sql), {"users": users, "trainings": trainings,
+                                               "rooms": ROOMS, "days": DAYS})
+            await conn.execute(text("ANALYZE"))
+            before = await run_queries(conn, "Без вторичных индексов")
+
+            for index in SECONDARY_INDEXES:
+                await conn.run_sync(lambda sync_conn, index=index: index.create(sync_conn))
+            await conn.execute(text("ANALYZE"))
+            after = await run_queries(conn, "С индексами")
+
+            print("\n===== Итог (среднее по %d запускам) =====" % REPEATS)
+            for name in HOT_QUERIES:
+                speedup = before[name] / after[name] if after[name] else float("inf")
+                print(f"{name:<55} {before[name]:>9.3f} мс -> {after[name]:>9.3f} мс  (x{speedup:.1f})")
+        finally:
+            await conn.rollback()
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trainings", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    args = parser.parse_args()
+    if args.trainings > MAX_TRAININGS:
+        parser.error(f"--trainings не больше {MAX_TRAININGS}: столько непересекающихся слотов")
+    if args.users < MIN_USERS:
+        parser.error(f"--users не меньше {MIN_USERS}: нужно хотя бы {ROOMS} тренеров")
+    asyncio.run(main(args.trainings, args.users))
@@ -0,0 +1,89 @@
+"""
+Бенчмарк сериализации списка тренировок: процессорное время на 1000 тренировок.
+
+Сравнивает прежний путь GET /trainings/ (model_validate каждой строки в эндпоинте,
+затем проверка возвращенного значения по response_model и jsonable_encoder + json.dumps
+внутри FastAPI) с json_response: одна валидация ORM-объектов через кэшированный
+TypeAdapter и сериализация сразу в байты. БД не нужна, объекты создаются в памяти.
+
+Запуск:
+    python -m benchmarks.serialization --trainings 1000 --repeats 50
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import date, time as dt_time, timedelta
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.responses import json_response
+from app.rooms.models import Room
+from app.trainings.models import Training
+from app.trainings.schemas import STrainingInfo
+from app.users.models import User
+# Регистрация остальных моделей, на которые ссылаются relationship
+from app.bookings.models import Booking  # noqa: F401
+from app.memberships.models import Membership, SubRequest  # noqa: F401
+from app.subscriptions.models import Subscription  # noqa: F401
+
+
+def make_trainings(count: int) -> list[Training]:
+    rooms = [Room(id=i, title=f"Зал {i}", capacity=20) for i in range(1, 21)]
+    trainers = [
+        User(id=i, email=f"trainer{i}@example.com", phone_number=f"+7900000{i:04d}",
+             first_name="Тренер", last_name=f"Номер{i}")
+        for i in range(1, 51)
+    ]
+    today = date.today()
+    trainings = []
+    for i in range(1, count + 1):
+        room, trainer = rooms[i % len(rooms)], trainers[i % len(trainers)]
+        trainings.append(Training(
+            id=i, title=f"Тренировка {i}", description="Описание тренировки",
+            date=today + timedelta(days=i % 30), start_time=dt_time(8 + i % 12), end_time=dt_time(9 + i % 12),
+            room_id=room.id, trainer_id=trainer.id, room=room, trainer=trainer, booking_count=i % 20,
+        ))
+    return trainings
+
+
+async def fastapi_path(trainings: list[Training], field) -> bytes:
+    content = [STrainingInfo.model_validate(training) for training in trainings]
+    serialized = await serialize_response(field=field, response_content=content)
+    return JSONResponse(serialized).body
+
+
+async def direct_path(trainings: list[Training], field) -> bytes:
+    return json_response(trainings, list[STrainingInfo]).body
+
+
+async def measure(path, trainings: list[Training], field, repeats: int) -> float:
+    await path(trainings, field)  # прогрев: сборка валидаторов и TypeAdapter
+    started = time.process_time()
+    for _ in range(repeats):
+        await path(trainings, field)
+    return (time.process_time() - started) / repeats * 1000
+
+
+async def main(count: int, repeats: int):
+    trainings = make_trainings(count)
+    field = create_model_field(name="response", type_=list[STrainingInfo], mode="serialization")
+    # Оба пути отдают одинаковые данные
+    assert json.loads(await fastapi_path(trainings, field)) == json.loads(await direct_path(trainings, field))
+    before = await measure(fastapi_path, trainings, field, repeats)
+    after = await measure(direct_path, trainings, field, repeats)
+    per_thousand = 1000 / count
+    print(f"Тренировок: {count}, повторов: {repeats}")
+    print(f"{'Через response_model FastAPI':<32} {before * per_thousand:>8.2f} мс CPU на 1000 тренировок")
+    print(f"{'json_response (TypeAdapter)':<32} {after * per_thousand:>8.2f} мс CPU на 1000 тренировок")
+    print(f"Ускорение: x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trainings", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.trainings, args.repeats))
@@ -8,7 +8,7 @@ from datetime import date, time
 
 from app.main import app
 from app.dao.database import Base
-from app.dependencies.dao_dep import get_session_with_commit, get_session_without_commit
+from app.dependencies.dao_dep import get_session
 from app.users.dao import UsersDAO
 from app.users.schemas import SUserAddDB
 from app.users.auth import get_password_hash
@@ -130,20 +130,17 @@ async def subscription_fixture(db_session):
 """
 @pytest_asyncio.fixture(scope="function")
 async def client(db_session):
-    # Переопределяем зависимости
-    async def override_get_session_without_commit():
-        return db_session
-    
-    async def override_get_session_with_commit():
+    # Переопределяем зависимость
+    async def override_get_session():
         try:
             yield db_session
-            await db_session.commit()
+            if db_session.in_transaction():
+                await db_session.commit()
         except Exception:
             await db_session.rollback()
             raise
     
-    app.dependency_overrides[get_session_without_commit] = override_get_session_without_commit
-    app.dependency_overrides[get_session_with_commit] = override_get_session_with_commit
+    app.dependency_overrides[get_session] = override_get_session
 
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as test_client:
         yield test_client
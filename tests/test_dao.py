@@ -1,21 +1,49 @@
+import asyncio
+import gzip
+import json
+import os
+import sys
 import pytest
-from datetime import date, timedelta
-from pydantic import BaseModel
+from datetime import date, datetime, time, timedelta
+from pydantic import BaseModel, ValidationError
+from fastapi import HTTPException, Response
 
-from app.trainings.dao import TrainingDAO
-from app.trainings.schemas import STrainingAdd, STrainingUpd, STrainingFilter
+from app.trainings.dao import TrainingDAO, ScheduleConflict
+from app.trainings.schemas import (STrainingAdd, STrainingUpd, STrainingFilter, STrainingSeriesAdd, STrainingInfo,
+                                   STrainingSearch)
 from app.rooms.dao import RoomDAO
-from app.rooms.schemas import SRoomAdd, SRoomFilter, SRoomUpd
+from app.rooms.schemas import SRoomAdd, SRoomFilter, SRoomUpd, SRoomInfo
 from app.subscriptions.dao import SubscriptionDAO
 from app.subscriptions.schemas import SSubAdd, SSubFilter, SSubUpd
-from app.bookings.dao import BookingDAO
-from app.bookings.schemas import SBookingAddFull
+from app.bookings.dao import BookingDAO, AdmissionStatus
+from app.bookings.admission import AdmissionCoordinator
+from app.bookings.schemas import SBookingAddFull, SBookingInfo
 from app.memberships.dao import SubRequestDAO, MembershipDAO
 from app.memberships.schemas import (SSubReqAdd, SSubReqUpdate, SSubReqFilter, SMembershipCreate,
-                                     SMembershipInfo, SMembershipUpd, SMembershipFilter)
+                                     SMembershipInfo, SMembershipUpd, SMembershipFilter, SMembershipInfoFull)
+from app.memberships.jobs import expire_memberships
+from app.trainings.jobs import archive_trainings
 from app.users.dao import UsersDAO
 from app.users.schemas import SUserAddDB
-from app.users.auth import get_password_hash
+from app.users.auth import get_password_hash, verify_password, create_tokens, VerifiedTokenCache, PasswordHashPool
+from app.users.importer import UserImporter, iter_records
+from app.users.schemas import ImportFormat, EmailModel
+from app.config import settings
+from jose import jwt, JWTError, ExpiredSignatureError
+from app.dependencies import auth_dep, dao_dep
+from app.dependencies.auth_dep import get_current_user
+from app.responses import StreamFormat, stream_response, json_response
+from app.dao import cache as dao_cache
+from app.dao.cache import MemoryCacheBackend
+from app.dao.projection import partial_schema
+from app.static_assets import StaticAssets, IMMUTABLE_CACHE_CONTROL
+from starlette.requests import Request
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.trainings.models import Training
+from app.rooms.models import Room
+from tests.conftest import TestingSessionLocal
 
 @pytest.mark.asyncio
 class TestTrainingDAO:
@@ -36,6 +64,238 @@ class TestTrainingDAO:
             room_id=room_fixture.id,
         )
 
+    async def test_find_upcoming_page(self, dao, sample_training_data):
+        past = sample_training_data.model_copy(update={"date": date.today() - timedelta(days=1)})
+        await dao.add(past)
+        for hour in (18, 9, 12):
+            await dao.add(sample_training_data.model_copy(
+                update={"start_time": time(hour, 0), "end_time": time(hour, 30)}))
+        first, cursor = await dao.find_upcoming_page(limit=2)
+        assert [t.start_time.hour for t in first] == [9, 12]
+        assert [t.booking_count for t in first] == [0, 0]
+        rest, cursor = await dao.find_upcoming_page(limit=2, after=cursor)
+        assert [t.start_time.hour for t in rest] == [18]
+        assert cursor is None
+
+    async def test_search_page(self, dao, sample_training_data, room_fixture):
+        today = date.today()
+        evening = await dao.add(sample_training_data.model_copy(update={
+            "title": "Stretching 100%", "start_time": time(19, 0), "end_time": time(20, 0)}))
+        later = await dao.add(sample_training_data.model_copy(update={"date": today + timedelta(days=40)}))
+        morning = await dao.add(sample_training_data)
+        await dao.add(sample_training_data.model_copy(update={"date": today - timedelta(days=1)}))
+        await RoomDAO(dao._session).update(SRoomFilter(id=room_fixture.id), SRoomUpd(title=room_fixture.title, capacity=1))
+        stamp = await dao.upcoming_version_stamp()
+        await BookingDAO(dao._session).add(SBookingAddFull(user_id=sample_training_data.trainer_id, training_id=morning.id))
+        # Триггер счетчика мест тоже увеличивает revision тренировки
+        assert await dao.upcoming_version_stamp() != stamp
+
+        async def search(**filters):
+            trainings, _ = await dao.search_page(STrainingSearch(**filters))
+            return [training.id for training in trainings]
+
+        # По умолчанию - с сегодняшнего дня, в порядке даты и времени
+        assert await search() == [morning.id, evening.id, later.id]
+        assert await search(date_to=today + timedelta(days=7)) == [morning.id, evening.id]
+        assert await search(time_from=time(18, 0)) == [evening.id]
+        assert await search(has_free_spots=True) == [evening.id, later.id]
+        assert await search(has_free_spots=False) == [morning.id]
+        # % в запросе ищется как символ, а не как шаблон
+        assert await search(q="stretching 100%") == [evening.id]
+        assert await search(q="0%x") == []
+        # Полное имя тренера, в том числе через пробел
+        assert await search(q="trainer trai") == [morning.id, evening.id, later.id]
+        assert await search(q="Petrov") == []
+        assert await search(room_id=room_fixture.id + 1) == []
+        page, cursor = await dao.search_page(STrainingSearch(), limit=2)
+        assert [training.id for training in page] == [morning.id, evening.id] and cursor
+        page, _ = await dao.search_page(STrainingSearch(), limit=2, after=cursor)
+        assert [training.id for training in page] == [later.id]
+        with pytest.raises(ValueError):
+            STrainingSearch(time_from=time(10, 0), time_to=time(9, 0))
+
+    async def test_json_response(self, dao, sample_training_data):
+        await dao.add(sample_training_data)
+        trainings, _ = await dao.find_upcoming_page()
+        response = Response()
+        response.headers["ETag"] = '"v1"'
+        response.set_cookie("users_access_token", "a")
+        response.set_cookie("users_refresh_token", "r")
+        direct = json_response(trainings, list[STrainingInfo], response)
+        assert direct.headers["etag"] == '"v1"'
+        # Оба перевыпущенных токена доходят до клиента
+        cookies = direct.headers.getlist("set-cookie")
+        assert [cookie.split("=")[0] for cookie in cookies] == ["users_access_token", "users_refresh_token"]
+        assert direct.headers.getlist("content-length") == [str(len(direct.body))]
+        assert direct.media_type == "application/json"
+        expected = [STrainingInfo.model_validate(training).model_dump(mode="json") for training in trainings]
+        assert json.loads(direct.body) == expected
+        assert expected[0]["trainer"]["email"] == "trainer@example.com"
+
+    async def test_json_rendering_contract(self, dao, sample_training_data, monkeypatch):
+        monkeypatch.setattr(dao_cache, "query_cache", MemoryCacheBackend())
+        await dao.add(sample_training_data.model_copy(update={"date": date.today() - timedelta(days=1)}))
+        for hour in (18, 9, 12):
+            await dao.add(sample_training_data.model_copy(
+                update={"start_time": time(hour, 0), "end_time": time(hour, 45)}))
+        await dao._session.commit()
+        # Страницы из БД совпадают с ORM-путем, в том числе курсоры; второй проход - из кэша запросов
+        for _ in range(2):
+            orm_cursor = json_cursor = None
+            for _ in range(2):
+                orm_page, orm_cursor = await dao.find_upcoming_page(limit=2, after=orm_cursor)
+                body, json_cursor = await dao.find_upcoming_page_json(limit=2, after=json_cursor)
+                assert json.loads(body) == json.loads(json_response(orm_page, list[STrainingInfo]).body)
+                assert json_cursor == orm_cursor
+        assert json_cursor is None
+
+    async def test_sparse_fields(self, dao, sample_training_data):
+        await dao.add(sample_training_data)
+        await dao._session.commit()
+        schema = partial_schema(STrainingInfo, "title, start_time,booking_count,id")
+        assert list(schema.model_fields) == ["title", "start_time", "id", "booking_count"]
+        assert partial_schema(STrainingInfo, "id,title,start_time,booking_count") is schema
+        with pytest.raises(HTTPException) as exc:
+            partial_schema(STrainingInfo, "title,password")
+        assert exc.value.status_code == 400
+
+        async with TestingSessionLocal() as session:
+            trainings, _ = await TrainingDAO(session).find_upcoming_page(schema=schema)
+            # Не запрошенные колонки и связи не читаются из БД
+            assert "description" not in trainings[0].__dict__
+            assert "trainer" not in trainings[0].__dict__
+            body = json.loads(json_response(trainings, list[schema]).body)
+            assert body == [{"title": "Йога", "start_time": "15:00:00", "id": trainings[0].id, "booking_count": 0}]
+            db_body, _ = await TrainingDAO(session).find_upcoming_page_json(schema=schema)
+            assert json.loads(db_body) == body
+        async with TestingSessionLocal() as session:
+            trainings, _ = await TrainingDAO(session).find_upcoming_page()
+            # Полный ответ: тренер загружается без хеша пароля
+            assert trainings[0].trainer.email == "trainer@example.com"
+            assert "password" not in trainings[0].trainer.__dict__
+
+    async def test_add_validated_conflicts(self, dao, sample_training_data):
+        first, conflict = await dao.add_validated(sample_training_data)
+        assert first is not None and conflict is None
+        # Та же комната и тот же тренер с пересечением по времени
+        overlapping = sample_training_data.model_copy(update={"start_time": time(15, 30), "end_time": time(16, 30)})
+        training, conflict = await dao.add_validated(overlapping)
+        assert training is None
+        assert conflict == ScheduleConflict.ROOM
+        # Встык к существующей - не конфликт
+        adjacent = sample_training_data.model_copy(update={"start_time": time(16, 0), "end_time": time(17, 0)})
+        training, conflict = await dao.add_validated(adjacent)
+        assert conflict is None
+
+        updated, conflict = await dao.update_returning_without_conflicts(
+            training.id, STrainingUpd(start_time=time(15, 45)))
+        assert updated is None
+        assert conflict == ScheduleConflict.ROOM
+
+    async def test_validate_schedule(self, dao, sample_training_data, client_fixture, room_fixture):
+        training, conflict = await dao.add_validated(sample_training_data)
+        assert conflict is None
+        assert json.loads(json_response(training, STrainingInfo).body)["trainer"]["email"] == "trainer@example.com"
+        other_room = await RoomDAO(dao._session).add(SRoomAdd(title="Малый зал", capacity=5))
+        values = sample_training_data.model_dump()
+        assert await dao.validate_schedule({**values, "trainer_id": client_fixture.id}) == ScheduleConflict.TRAINER_NOT_FOUND
+        assert await dao.validate_schedule({**values, "room_id": other_room.id + 1}) == ScheduleConflict.ROOM_NOT_FOUND
+        assert await dao.validate_schedule(values) == ScheduleConflict.ROOM
+        assert await dao.validate_schedule({**values, "room_id": other_room.id}) == ScheduleConflict.TRAINER
+        assert await dao.validate_schedule({**values, "start_time": time(16, 0), "end_time": time(17, 0)}) is None
+        # Без времени проверяются только тренер и помещение
+        assert await dao.validate_schedule({"trainer_id": values["trainer_id"], "room_id": room_fixture.id}) is None
+        # При обновлении сама тренировка не конфликтует, остальные поля берутся из ее строки
+        assert await dao.validate_schedule({"start_time": time(15, 30)}, training_id=training.id) is None
+        assert await dao.validate_schedule({"title": "Нога"}, training_id=training.id) is None
+        assert await dao.validate_schedule({"start_time": time(15, 30)}, training_id=training.id + 1) == \
+            ScheduleConflict.NOT_FOUND
+        # Новая граница проверяется вместе с сохраненной второй
+        assert await dao.validate_schedule({"end_time": time(15, 0)}, training_id=training.id) == \
+            ScheduleConflict.TIME_ORDER
+        assert await dao.validate_schedule({"start_time": time(17, 0)}, training_id=training.id) == \
+            ScheduleConflict.TIME_ORDER
+        created, conflict = await dao.add_validated(sample_training_data.model_copy(update={"room_id": other_room.id}))
+        assert created is None and conflict == ScheduleConflict.TRAINER
+
+    async def test_add_series(self, dao, sample_training_data, trainer_fixture, room_fixture):
+        start = date.today()
+        # Занимаем помещение на вторую неделю серии
+        await dao.add(sample_training_data.model_copy(update={"date": start + timedelta(days=7)}))
+        series = STrainingSeriesAdd(
+            title="Пилатес",
+            description="Серия занятий",
+            start_time=time(15, 30),
+            end_time=time(16, 30),
+            trainer_id=trainer_fixture.id,
+            room_id=room_fixture.id,
+            start_date=start,
+            weekdays=[start.weekday()],
+            weeks=3,
+        )
+        report, conflict = await dao.add_series(series)
+        assert conflict is None
+        assert [item.status for item in report] == ["created", "room_conflict", "created"]
+        assert all(item.training_id for item in report if item.status == "created")
+
+    async def test_update_returning_without_conflicts(self, dao, sample_training_data, trainer_fixture,
+                                                      client_fixture):
+        training = await dao.add(sample_training_data)
+        # Чужому тренеру условие не дает изменить тренировку, в том числе расписание
+        for values in (STrainingUpd(title="Нога"), STrainingUpd(start_time=time(10, 0))):
+            updated, conflict = await dao.update_returning_without_conflicts(
+                training.id, values, conditions=[dao.model.trainer_id == trainer_fixture.id + 1])
+            assert updated is None and conflict is None
+        # Тренер и помещение проверяются так же, как при создании
+        assert await dao.update_returning_without_conflicts(training.id, STrainingUpd(trainer_id=client_fixture.id)) \
+            == (None, ScheduleConflict.TRAINER_NOT_FOUND)
+        assert await dao.update_returning_without_conflicts(training.id, STrainingUpd(room_id=training.room_id + 1)) \
+            == (None, ScheduleConflict.ROOM_NOT_FOUND)
+        updated, conflict = await dao.update_returning_without_conflicts(
+            training.id, STrainingUpd(title="Нога", end_time=time(17, 0)),
+            conditions=[dao.model.trainer_id == trainer_fixture.id])
+        assert conflict is None
+        assert updated is training and updated.end_time == time(17, 0)
+        # Связи загружены для ответа сразу вместе с обновлением
+        assert json.loads(json_response(updated, STrainingInfo).body)["room"]["title"] == "Большой зал"
+        assert (await dao.update_returning_without_conflicts(training.id + 1, STrainingUpd(title="Нет"))) == (None, None)
+        updated, conflict = await dao.update_returning_without_conflicts(training.id, STrainingUpd(end_time=time(15, 0)))
+        assert updated is None and conflict == ScheduleConflict.TIME_ORDER
+
+    async def test_training_time_order(self, dao, sample_training_data):
+        values = sample_training_data.model_dump()
+        for end_time in (time(15, 0), time(14, 0)):
+            with pytest.raises(ValidationError):
+                STrainingAdd(**{**values, "end_time": end_time})
+        with pytest.raises(ValidationError):
+            STrainingUpd(start_time=time(16, 0), end_time=time(16, 0))
+        # Одну границу проверяет validate_schedule вместе с сохраненной
+        assert STrainingUpd(start_time=time(18, 0)).start_time == time(18, 0)
+        # В обход схемы запись не пропускает CHECK-ограничение
+        created, conflict = await dao.add_validated(STrainingAdd.model_construct(**{**values, "end_time": time(15, 0)}))
+        assert created is None and conflict == ScheduleConflict.TIME_ORDER
+
+    async def test_archive_trainings(self, dao, sample_training_data, client_fixture, db_session):
+        old = await dao.add(sample_training_data.model_copy(update={"date": date.today() - timedelta(days=100)}))
+        recent = await dao.add(sample_training_data.model_copy(update={"date": date.today() - timedelta(days=1)}))
+        booking_dao = BookingDAO(db_session)
+        for training in (old, recent):
+            await booking_dao.add(SBookingAddFull(user_id=client_fixture.id, training_id=training.id))
+        await db_session.commit()
+        assert await archive_trainings(TestingSessionLocal, after_days=90, batch_size=1) == 1
+        async with TestingSessionLocal() as session:
+            training_dao = TrainingDAO(session)
+            assert await training_dao.find_one_or_none_by_id(old.id) is None
+            # История за период собирается из рабочей и архивной таблиц, счетчик мест сохранен
+            history = await training_dao.find_history(date.today() - timedelta(days=365), date.today())
+            assert [(type(item).__name__, item.id, item.booking_count) for item in history] == [
+                ("TrainingArchive", old.id, 1), ("Training", recent.id, 1)]
+            assert json.loads(json_response(history, list[STrainingInfo]).body)[0]["room"]["title"] == "Большой зал"
+            bookings = await BookingDAO(session).find_user_history(client_fixture.id)
+            assert [item["training"]["id"] for item in json.loads(json_response(bookings, list[SBookingInfo]).body)] \
+                == [recent.id, old.id]
+        assert await archive_trainings(TestingSessionLocal, after_days=90) == 0
+
     async def test_create_training(self, dao, sample_training_data, trainer_fixture):
         new_training = await dao.add(sample_training_data)
         assert new_training.id is not None
@@ -133,6 +393,200 @@ class TestRoomDAO:
         assert deleted_count == 1
         assert await dao.find_one_or_none_by_id(room.id) is None
 
+    async def test_update_delete_returning(self, dao, room_data):
+        room = await dao.add(room_data)
+        updated = await dao.update_returning(SRoomFilter(id=room.id), SRoomUpd(capacity=33))
+        # RETURNING обновляет и объект, уже загруженный в сессию
+        assert updated == [room] and room.capacity == 33
+        assert await dao.update_returning(SRoomFilter(id=room.id), SRoomUpd(capacity=1),
+                                          conditions=[dao.model.capacity > 100]) == []
+        assert await dao.delete_returning(SRoomFilter(id=room.id), conditions=[dao.model.capacity > 100]) == []
+        deleted = await dao.delete_returning(SRoomFilter(id=room.id))
+        assert [(item.id, item.title, item.capacity) for item in deleted] == [(room.id, "Зал", 33)]
+        assert await dao.find_one_or_none_by_id(room.id) is None
+        with pytest.raises(ValueError):
+            await dao.delete_returning(SRoomFilter.model_construct())
+
+    async def test_find_page(self, dao):
+        for i in range(5):
+            await dao.add(SRoomAdd(title=f"Зал {i}", capacity=10 + i))
+        first, cursor = await dao.find_page(limit=2)
+        assert [r.title for r in first] == ["Зал 0", "Зал 1"]
+        assert cursor is not None
+        second, cursor = await dao.find_page(limit=2, after=cursor)
+        assert [r.title for r in second] == ["Зал 2", "Зал 3"]
+        last, cursor = await dao.find_page(limit=2, after=cursor)
+        assert [r.title for r in last] == ["Зал 4"]
+        assert cursor is None
+        everything, cursor = await dao.find_page()
+        assert len(everything) == 5
+        assert cursor is None
+
+    async def test_bulk_update(self, dao, room_data):
+        rooms = [await dao.add(SRoomAdd(title=f"Зал {i}", capacity=10)) for i in range(3)]
+        updated_count = await dao.bulk_update([
+            SRoomUpdWithId(id=rooms[2].id, capacity=30),
+            SRoomUpdWithId(id=rooms[0].id, capacity=11),
+            SRoomUpdWithId(id=rooms[1].id, title="Малый зал"),
+            SRoomUpdWithId(id=9999, capacity=1),
+        ])
+        assert updated_count == 3
+        capacities = {r.id: r.capacity for r in await dao.find_all()}
+        assert capacities[rooms[0].id] == 11
+        assert capacities[rooms[2].id] == 30
+        # Несуществующие id не попадают в счетчик
+        assert await dao.bulk_update([SRoomUpdWithId(id=9998, capacity=1), SRoomUpdWithId(id=9999, title="Нет")]) == 0
+        assert await dao.bulk_update([SRoomUpdWithId(id=9999, capacity=1),
+                                      SRoomUpdWithId(id=rooms[1].id, capacity=12)]) == 1
+        capacities = {r.id: r.capacity for r in await dao.find_all()}
+        assert capacities[rooms[1].id] == 12
+
+    async def test_upsert_many(self, dao, room_data):
+        room = await dao.add(room_data)
+        ids = await dao.upsert_many([
+            SRoomInfo(id=room.id, title="Зал", capacity=50),
+            SRoomInfo(id=room.id + 1, title="Новый зал", capacity=5),
+        ])
+        assert sorted(ids) == [room.id, room.id + 1]
+        rooms = {r.id: r for r in await dao.find_all()}
+        assert rooms[room.id].capacity == 50
+        assert rooms[room.id + 1].title == "Новый зал"
+
+    async def test_upsert_many_new_rows(self, dao):
+        ids = await dao.upsert_many([
+            SRoomAdd(title="Зал B", capacity=10),
+            SRoomAdd(title="Зал C", capacity=20),
+        ])
+        assert len(ids) == 2
+        assert sorted(r.title for r in await dao.find_all()) == ["Зал B", "Зал C"]
+
+    async def test_upsert_many_mixed_rows(self, dao, room_data):
+        room = await dao.add(room_data)
+        ids = await dao.upsert_many([
+            SRoomAdd(title="Зал B", capacity=10),
+            SRoomInfo(id=room.id, title="Зал", capacity=70),
+            SRoomAdd(title="Зал C", capacity=20),
+        ])
+        assert len(ids) == 3 and room.id in ids
+        rooms = {r.title: r.capacity for r in await dao.find_all()}
+        assert rooms == {"Зал": 70, "Зал B": 10, "Зал C": 20}
+
+    async def test_query_cache(self, dao, room_data, monkeypatch):
+        cache = MemoryCacheBackend()
+        monkeypatch.setattr(dao_cache, "query_cache", cache)
+        room = await dao.add(room_data)
+        await dao._session.commit()
+        async with TestingSessionLocal() as session:
+            rooms = await RoomDAO(session).find_all()
+            assert [r.id for r in rooms] == [room.id]
+            assert cache.misses == 1
+            assert not session.info.get("has_writes")
+        async with TestingSessionLocal() as session:
+            rooms = await RoomDAO(session).find_all()
+            assert cache.hits == 1
+            assert rooms[0] in session
+            assert rooms[0].title == room_data.title
+        # Запись сбрасывает кэш, и следующее чтение идет в БД
+        await dao.update(SRoomFilter(id=room.id), SRoomUpd(capacity=99))
+        await dao._session.commit()
+        async with TestingSessionLocal() as session:
+            rooms = await RoomDAO(session).find_all()
+            assert rooms[0].capacity == 99
+            assert cache.misses == 2
+
+    async def test_request_session(self, dao, room_data, monkeypatch):
+        makers = {"write": TestingSessionLocal, "read": TestingSessionLocal}
+        monkeypatch.setattr(dao_dep, "async_session_maker", lambda: makers["write"]())
+        monkeypatch.setattr(dao_dep, "read_only_session_maker", lambda: makers["read"]())
+
+        async def run(method: str, write: bool, raw: bool = False) -> AsyncSession:
+            dependency = dao_dep.get_session(Request({"type": "http", "method": method, "headers": []}))
+            session = await anext(dependency)
+            if raw:
+                session.add(Room(title="Малый зал", capacity=5))
+            elif write:
+                await RoomDAO(session).add(room_data)
+            with pytest.raises(StopAsyncIteration):
+                await anext(dependency)
+            return session
+
+        makers["read"] = lambda: pytest.fail("POST не должен открывать сессию только для чтения")
+        await run("POST", write=True)
+        async with TestingSessionLocal() as session:
+            assert len(await RoomDAO(session).find_all()) == 1
+        # Запись в обход DAO тоже коммитится
+        await run("POST", write=True, raw=True)
+        async with TestingSessionLocal() as session:
+            assert len(await RoomDAO(session).find_all()) == 2
+        # Без записи коммита нет
+        makers["write"] = lambda: pytest.fail("GET не должен открывать сессию для записи")
+        makers["read"] = TestingSessionLocal
+        session = await run("GET", write=False)
+        assert not session.info.get("has_writes")
+
+    async def test_invalidation_only_watched_tags(self, dao, room_data, monkeypatch):
+        monkeypatch.setattr(dao_cache, "query_cache", dao_cache.NullCacheBackend())
+        monkeypatch.setattr(dao_cache, "_subscribed_caches", [(MemoryCacheBackend(), ("users",))])
+        # Помещения не читает ни один включенный кэш - сбрасывать и рассылать нечего
+        await dao.add(room_data)
+        assert dao._session.info["has_writes"]
+        assert "cache_tags" not in dao._session.info
+        await dao._invalidate(extra_tags=("users", "bookings"))
+        assert dao._session.info["cache_tags"] == {"users"}
+
+    async def test_stable_cache_key(self):
+        query = select(Training).where(Training.id == 3).options(selectinload(Training.room))
+        digest = dao_cache.statement_digest(query._generate_cache_key().key)
+        plain = select(Training).where(Training.id == 3)
+        assert dao_cache.statement_digest(plain._generate_cache_key().key) != digest
+        # Другой процесс с другим PYTHONHASHSEED получает тот же ключ
+        script = (
+            "from sqlalchemy import select; from sqlalchemy.orm import selectinload; import app.main; "
+            "from app.trainings.models import Training; from app.dao import cache; "
+            "q = select(Training).where(Training.id == 3).options(selectinload(Training.room)); "
+            "print(cache.statement_digest(q._generate_cache_key().key))"
+        )
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", script, stdout=asyncio.subprocess.PIPE,
+            env={**os.environ, "PYTHONHASHSEED": "12345"})
+        stdout, _ = await process.communicate()
+        assert stdout.decode().strip() == digest
+
+    async def test_cache_tag_invalidation(self):
+        cache = MemoryCacheBackend(max_entries=2, ttl_s=60)
+        cache.set("a", "A", ["rooms"])
+        cache.set("b", "B", ["rooms", "trainings"])
+        cache.invalidate_tags(["trainings"])
+        assert cache.get("a") == "A"
+        assert cache.get("b") is None
+        cache.set("c", "C", ["users"])
+        cache.set("d", "D", ["users"])
+        assert cache.get("a") is None
+
+    async def test_version_stamp(self, dao, room_data):
+        empty = await dao.version_stamp()
+        room = await dao.add(room_data)
+        added = await dao.version_stamp()
+        assert added != empty
+        assert await dao.version_stamp() == added
+        # Изменение без смены количества строк, причем с более ранним updated_at,
+        # как у транзакции, начатой раньше, но закоммиченной позже
+        await dao._session.execute(
+            update(Room).where(Room.id == room.id).values(capacity=99, updated_at=datetime(2000, 1, 1)))
+        changed = await dao.version_stamp()
+        assert changed != added
+        await dao.update(SRoomFilter(id=room.id), SRoomUpd(capacity=98))
+        assert await dao.version_stamp() != changed
+        await dao.upsert_many([SRoomInfo(id=room.id, title="Зал", capacity=97)])
+        upserted = await dao.version_stamp()
+        assert upserted not in (changed, added)
+        await dao.delete(SRoomFilter(id=room.id))
+        assert await dao.version_stamp() != upserted
+
+    async def test_find_page_invalid_cursor(self, dao):
+        with pytest.raises(HTTPException):
+            await dao.find_page(limit=2, after="не-курсор")
+
 @pytest.mark.asyncio
 class TestSubscriptionDAO:
     @pytest.fixture
@@ -209,6 +663,10 @@ class TestBookingDAO:
         assert booking.id is not None
         assert booking.training_id == training_fixture.id
         assert booking.user_id == client_fixture.id
+        await dao._session.commit()
+        async with TestingSessionLocal() as session:
+            upcoming, _ = await TrainingDAO(session).find_upcoming_page()
+        assert upcoming[0].booking_count == 1
         bookings_of_user = await dao.find_by_user(client_fixture.id)
         print(bookings_of_user)
         assert len(bookings_of_user) == 1
@@ -222,6 +680,60 @@ class TestBookingDAO:
                 )
             )
         assert deleted_count == 1
+
+    async def test_json_rendering_contract(self, dao, booking_data, client_fixture):
+        await dao.add(booking_data)
+        await dao._session.commit()
+        orm_page, orm_cursor = await dao.find_by_user_page(client_fixture.id)
+        body, json_cursor = await dao.find_by_user_page_json(client_fixture.id)
+        assert json.loads(body) == json.loads(json_response(orm_page, list[SBookingInfo]).body)
+        assert len(json.loads(body)) == 1
+        assert json_cursor == orm_cursor
+        assert await dao.find_by_user_page_json(client_fixture.id + 100) == (b"[]", None)
+
+    async def test_admit(self, dao, client_fixture, trainer_fixture, training_fixture, room_fixture):
+        booking_id, status = await dao.admit(client_fixture.id, training_fixture.id)
+        assert status == AdmissionStatus.BOOKED
+        assert booking_id is not None
+        _, status = await dao.admit(client_fixture.id, training_fixture.id)
+        assert status == AdmissionStatus.DUPLICATE
+        _, status = await dao.admit(client_fixture.id, training_fixture.id + 100)
+        assert status == AdmissionStatus.NOT_FOUND
+        await dao._session.commit()
+        async with TestingSessionLocal() as session:
+            training = await TrainingDAO(session).find_one_or_none_by_id(training_fixture.id)
+        assert training.booking_count == 1
+
+        # Зал на одно место уже занят клиентом, тренер получает отказ
+        await RoomDAO(dao._session).update(SRoomFilter(id=room_fixture.id), SRoomUpd(title=room_fixture.title, capacity=1))
+        _, status = await dao.admit(trainer_fixture.id, training_fixture.id)
+        assert status == AdmissionStatus.FULL
+
+        await dao.delete(SBookingAddFull(user_id=client_fixture.id, training_id=training_fixture.id))
+        booking_id, status = await dao.admit(trainer_fixture.id, training_fixture.id)
+        assert status == AdmissionStatus.BOOKED
+        await dao._session.commit()
+        async with TestingSessionLocal() as session:
+            training = await TrainingDAO(session).find_one_or_none_by_id(training_fixture.id)
+        assert training.booking_count == 1
+
+    async def test_admission_coordinator(self, dao, client_fixture, trainer_fixture, training_fixture, room_fixture):
+        await RoomDAO(dao._session).update(SRoomFilter(id=room_fixture.id), SRoomUpd(title=room_fixture.title, capacity=1))
+        await dao._session.commit()
+        coordinator = AdmissionCoordinator(window_ms=5, session_maker=TestingSessionLocal)
+        results = await asyncio.gather(
+            coordinator.admit(client_fixture.id, training_fixture.id),
+            coordinator.admit(trainer_fixture.id, training_fixture.id),
+            coordinator.admit(client_fixture.id, training_fixture.id),
+            coordinator.admit(client_fixture.id, training_fixture.id + 100),
+        )
+        assert [status for _, status in results] == [
+            AdmissionStatus.BOOKED, AdmissionStatus.FULL, AdmissionStatus.DUPLICATE, AdmissionStatus.NOT_FOUND
+        ]
+        assert results[0][0] is not None
+        async with TestingSessionLocal() as session:
+            training = await TrainingDAO(session).find_one_or_none_by_id(training_fixture.id)
+        assert training.booking_count == 1
     
 @pytest.mark.asyncio
 class TestSubRequestDAO:
@@ -283,9 +795,47 @@ class TestMembershipDAO:
         assert updated_count == 1
         assert updated_membership.status == "inactive"
 
+    async def test_expire_memberships(self, dao, membership_data, client_fixture, db_session):
+        expired = membership_data.model_copy(update={"end_date": date.today() - timedelta(days=1)})
+        membership = await dao.add(expired)
+        await db_session.commit()
+        # Истекший по дате абонемент не считается действующим еще до фоновой задачи
+        assert await dao.find_active_by_user(client_fixture.id) is None
+        assert await expire_memberships(TestingSessionLocal, batch_size=1) == 1
+        async with TestingSessionLocal() as session:
+            stored = await MembershipDAO(session).find_one_or_none_by_id(membership.id)
+        assert stored.status == "expired"
+
+    async def test_find_active_by_user(self, dao, membership_data, client_fixture):
+        membership = await dao.add(membership_data)
+        found = await dao.find_active_by_user(client_fixture.id)
+        assert found.id == membership.id
+
+    async def test_stream_memberships(self, dao, membership_data, db_session):
+        await dao.add(membership_data)
+        await db_session.commit()
+        streamed = [m async for m in dao.stream_memberships_with_data(chunk_size=1)]
+        assert len(streamed) == 1
+        assert streamed[0].user.email == "client@example.com"
+
+        response = stream_response(
+            lambda s: MembershipDAO(s).stream_memberships_with_data(), SMembershipInfoFull,
+            StreamFormat.JSON, session_maker=TestingSessionLocal
+        )
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        data = json.loads(body)
+        assert len(data) == 1
+        assert data[0]["subscription"]["title"] == "Абонемент №1"
+
 class SUserFilter(BaseModel):
     id: int
 
+class SRoomUpdWithId(SRoomUpd):
+    id: int
+
+class SUserRoleUpd(BaseModel):
+    role_id: int
+
 @pytest.mark.asyncio
 class TestUserDAO:
     @pytest.fixture
@@ -312,4 +862,143 @@ class TestUserDAO:
         assert deleted_count == 1
         assert await dao.find_one_or_none_by_id(user.id) is None
         found = await dao.find_all()
-        print(found)
\ No newline at end of file
+        print(found)
+
+    async def test_current_user_from_cache(self, dao, client_fixture, roles_fixture, monkeypatch):
+        cache = MemoryCacheBackend()
+        monkeypatch.setattr(auth_dep, "principal_cache", cache)
+        monkeypatch.setattr(dao_cache, "_subscribed_caches", [(cache, auth_dep.PRINCIPAL_TAGS)])
+        principal = await dao.find_principal(client_fixture.id)
+        assert principal.role.name == "client"
+        token = create_tokens({"sub": str(principal.id), "ver": principal.version})["access_token"]
+
+        response = Response()
+        first = await get_current_user(response, token, dao._session)
+        second = await get_current_user(response, token, dao._session)
+        assert first == second == principal
+        assert (cache.misses, cache.hits) == (1, 1)
+        assert "set-cookie" not in response.headers
+
+        # Смена роли сбрасывает кэш, права проверяются по новой роли, токены перевыпускаются
+        await dao.update(SUserFilter(id=client_fixture.id), SUserRoleUpd(role_id=roles_fixture["trainer"].id))
+        current = await get_current_user(response, token, dao._session)
+        assert current.role.name == "trainer"
+        assert current.version == str(principal.revision + 1)
+        assert cache.misses == 2
+        # Перевыпущенный токен несет новую версию, роль в claims не кладется
+        access_token = response.headers["set-cookie"].split(";")[0].split("=", 1)[1]
+        claims = jwt.get_unverified_claims(access_token)
+        assert claims["ver"] == current.version
+        assert "role" not in claims and "role_name" not in claims
+
+    async def test_verified_token_cache(self):
+        cache = VerifiedTokenCache(max_entries=1)
+        tokens = create_tokens({"sub": "1"})
+        payload = cache.decode(tokens["access_token"])
+        assert cache.decode(tokens["access_token"]) is payload
+        assert (cache.misses, cache.hits) == (1, 1)
+        # Вытеснение: в кэше помещается один токен
+        cache.decode(tokens["refresh_token"])
+        cache.decode(tokens["access_token"])
+        assert cache.stats()["misses"] == 3
+        with pytest.raises(JWTError):
+            cache.decode(tokens["access_token"][:-2] + "xx")
+        expired = jwt.encode({"sub": "1", "exp": 1}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        with pytest.raises(ExpiredSignatureError):
+            cache.decode(expired)
+
+    async def test_import_users(self, dao, client_fixture):
+        async def chunks():
+            body = (
+                "email,phone_number,first_name,last_name,password\r\n"
+                "new1@example.com,+71111111111,Ivan,Ivanov,12345\r\n"
+                "client@example.com,+72222222222,Petr,Petrov,12345\r\n"
+                "new2@example.com,+73333333333,Anna,Smirnova,12345\r\n"
+                "new1@example.com,+74444444444,Ivan,Ivanov,12345\r\n"
+                "bad-email,+75555555555,Oleg,Olegov,12345\r\n"
+                "new3@example.com,+76666666666,Olga\r\n"
+            ).encode()
+            # Границы чанков не совпадают с границами строк
+            for i in range(0, len(body), 7):
+                yield body[i:i + 7]
+
+        pool = PasswordHashPool(kind="thread", workers=2, max_pending=100)
+        try:
+            result = await UserImporter(dao._session, batch_size=2, hash_pool=pool).run(
+                iter_records(chunks(), ImportFormat.CSV)
+            )
+        finally:
+            pool.shutdown()
+        assert (result.total, result.created, result.duplicates, result.invalid) == (6, 2, 2, 2)
+        assert [row.status for row in result.rows] == ["created", "duplicate", "created", "duplicate", "invalid", "invalid"]
+        assert [row.line for row in result.rows] == [2, 3, 4, 5, 6, 7]
+        created = await dao.find_one_or_none(EmailModel(email="new2@example.com"))
+        assert verify_password("12345", created.password)
+
+    async def test_import_users_ndjson_invalid_rows(self, dao):
+        async def chunks():
+            rows = [
+                {"email": 12345, "phone_number": "+71111111111", "first_name": "Ivan", "last_name": "Ivanov",
+                 "password": "12345"},
+                {"email": "new1@example.com", "first_name": "Ivan", "last_name": "Ivanov", "password": "12345"},
+                ["не", "объект"],
+                {"email": "new2@example.com", "phone_number": "+72222222222", "first_name": "Anna",
+                 "last_name": "Smirnova", "password": "12345"},
+            ]
+            yield "\n".join(json.dumps(row) for row in rows).encode()
+
+        pool = PasswordHashPool(kind="thread", workers=1, max_pending=10)
+        try:
+            result = await UserImporter(dao._session, hash_pool=pool).run(iter_records(chunks(), ImportFormat.NDJSON))
+        finally:
+            pool.shutdown()
+        # Ошибки в данных отклоняют только свою строку, а не весь импорт
+        assert [row.status for row in result.rows] == ["invalid", "invalid", "invalid", "created"]
+        assert result.rows[0].email is None and "email" in result.rows[0].error
+        assert result.rows[1].email == "new1@example.com" and "phone_number" in result.rows[1].error
+
+    async def test_password_hash_pool(self):
+        pool = PasswordHashPool(workers=1, max_pending=1)
+        try:
+            hashed, busy = await asyncio.gather(
+                pool.run(get_password_hash, "12345"),
+                pool.run(get_password_hash, "12345"),
+                return_exceptions=True
+            )
+            assert await pool.run(verify_password, "12345", hashed)
+            assert isinstance(busy, HTTPException) and busy.status_code == 503
+            assert pool.stats()["rejected"] == 1
+            assert pool.stats()["pending"] == 0
+        finally:
+            pool.shutdown()
+
+
+class TestStaticAssets:
+    @staticmethod
+    def request(**headers) -> Request:
+        raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+        return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+    def test_static_assets(self, tmp_path):
+        (tmp_path / "js").mkdir()
+        (tmp_path / "js" / "main.js").write_text("console.log('sportclub');" * 100)
+        (tmp_path / "index.html").write_text('<script src="/static/js/main.js"></script>')
+        assets = StaticAssets(str(tmp_path))
+        assets.build()
+        hashed = assets.manifest["js/main.js"]
+        assert hashed.startswith("js/main.") and hashed.endswith(".js")
+
+        index = assets.index_response(self.request(accept_encoding="identity"))
+        assert index.body.decode() == f'<script src="/static/{hashed}"></script>'
+        # Файлы больше не читаются с диска
+        (tmp_path / "js" / "main.js").unlink()
+        response = assets.asset_response(self.request(accept_encoding="gzip, deflate"), hashed)
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert gzip.decompress(response.body) == b"console.log('sportclub');" * 100
+        not_modified = assets.asset_response(
+            self.request(accept_encoding="gzip", if_none_match=response.headers["etag"]), hashed
+        )
+        assert not_modified.status_code == 304 and not_modified.body == b""
+        assert assets.asset_response(self.request(), "js/main.js").headers["cache-control"] == "no-cache"
+        assert assets.asset_response(self.request(), "js/other.js").status_code == 404